@@ -0,0 +1,189 @@
+# Computer opponent for the memory card game.
+#
+# The computer remembers seen cards by slot and by card type id. Every lookup it
+# needs during a turn (a known pair, the partner of a flipped card, a random
+# unseen card) is O(1), so choosing a move never depends on the board size.
+# It is driven by update(engine, dt) from the frame loop and only waits out
+# its pick delay there, so it never blocks rendering.
+import random
+
+from game_engine import (
+    PLAYER_2, STATE_PLAYING,
+    EVENT_FLIP, EVENT_MATCH, EVENT_MISMATCH, EVENT_TIMEOUT,
+    difficulty_settings,
+)
+
+# Time the computer waits before each pick so players can follow it (ms)
+AI_PICK_DELAY = 800
+
+# Time kept in reserve before the turn time limit runs out (ms)
+AI_TIME_RESERVE = 1000
+
+
+# Set with O(1) add, remove and random choice
+class IndexedSet:
+    def __init__(self, items=()):
+        self.items = []
+        self.positions = {}
+        for item in items:
+            self.add(item)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, item):
+        return item in self.positions
+
+    def add(self, item):
+        if item not in self.positions:
+            self.positions[item] = len(self.items)
+            self.items.append(item)
+
+    def discard(self, item):
+        pos = self.positions.pop(item, None)
+        if pos is None:
+            return
+        # Move the last item into the hole
+        last = self.items.pop()
+        if pos < len(self.items):
+            self.items[pos] = last
+            self.positions[last] = pos
+
+    def choice(self, rng):
+        return self.items[rng.randrange(len(self.items))]
+
+
+# What the computer remembers about the board
+class MemoryModel:
+    def __init__(self, num_cards, forget=0.0, rng=None):
+        self.forget = forget
+        self.rng = rng or random.Random()
+        self.slot_type = {}     # slot -> card type
+        self.type_slots = {}    # card type -> set of remembered slots
+        self.known_pairs = {}   # card types with both cards remembered (ordered set)
+        self.unknown = IndexedSet(range(num_cards))  # Unmatched slots not remembered
+
+    def see(self, slot, card_type):
+        if slot in self.slot_type or slot not in self.unknown:
+            return
+        self.unknown.discard(slot)
+        self.slot_type[slot] = card_type
+        slots = self.type_slots.setdefault(card_type, set())
+        slots.add(slot)
+        if len(slots) == 2:
+            self.known_pairs[card_type] = True
+
+    def forget_slot(self, slot):
+        card_type = self.slot_type.pop(slot, None)
+        if card_type is None:
+            return
+        self.type_slots[card_type].discard(slot)
+        self.known_pairs.pop(card_type, None)
+        self.unknown.add(slot)
+
+    # A matched card leaves the board for good
+    def remove(self, slot):
+        self.forget_slot(slot)
+        self.unknown.discard(slot)
+
+    # Forget each remembered card with the configured probability
+    def decay(self):
+        if self.forget <= 0:
+            return
+        for slot in [slot for slot in self.slot_type if self.rng.random() < self.forget]:
+            self.forget_slot(slot)
+
+    # Both slots of some remembered pair, or None
+    def known_pair(self):
+        for card_type in self.known_pairs:
+            return tuple(self.type_slots[card_type])
+        return None
+
+    # Remembered slot holding the same card type as `slot`, or None
+    def partner(self, slot, card_type):
+        for other in self.type_slots.get(card_type, ()):
+            if other != slot:
+                return other
+        return None
+
+    # Random unmatched slot that is not remembered, other than `exclude`
+    def random_unknown(self, exclude=None):
+        if not self.unknown or (len(self.unknown) == 1 and exclude in self.unknown):
+            return None
+        while True:
+            slot = self.unknown.choice(self.rng)
+            if slot != exclude:
+                return slot
+
+
+class ComputerPlayer:
+    def __init__(self, engine, player=PLAYER_2, seed=None):
+        settings = difficulty_settings[engine.difficulty]
+        self.player = player
+        self.rng = random.Random(seed)
+        self.memory = MemoryModel(engine.num_cards, settings.get("ai_forget", 0.0), self.rng)
+        self.pick_delay = AI_PICK_DELAY
+        self.wait = None  # Time left before the next pick, None when not waiting
+
+        # Memorize the cards shown at the start of the game
+        recall = settings.get("ai_recall", 1.0)
+        for slot, type_id in enumerate(engine.board.type_ids):
+            if self.rng.random() < recall:
+                self.memory.see(slot, type_id)
+
+    # Learn from what happened on the board
+    def observe(self, engine, events):
+        for event in events:
+            kind = event[0]
+            if kind == EVENT_FLIP:
+                self.memory.see(event[1], engine.board.type_ids[event[1]])
+            elif kind == EVENT_MATCH:
+                self.memory.remove(event[2])
+                self.memory.remove(event[3])
+            elif kind == EVENT_MISMATCH or kind == EVENT_TIMEOUT:
+                self.memory.decay()
+
+    def is_my_move(self, engine):
+        return engine.state == STATE_PLAYING and engine.current_player == self.player and not engine.is_revealing
+
+    # Delay before the next pick, shortened to fit in the turn time limit
+    def next_delay(self, engine):
+        delay = self.pick_delay
+        if engine.turn_time_limit is not None:
+            picks_left = 2 - len(engine.selected)
+            budget = (engine.turn_time_limit - engine.turn_timer - AI_TIME_RESERVE) / picks_left
+            delay = max(0, min(delay, budget))
+        return delay
+
+    # Advance by dt ms; returns the slot to pick now, or None
+    def update(self, engine, dt):
+        if not self.is_my_move(engine):
+            self.wait = None
+            return None
+        if self.wait is None:
+            self.wait = self.next_delay(engine)
+        self.wait -= dt
+        if self.wait > 0:
+            return None
+        self.wait = None
+        return self.choose(engine)
+
+    # Pick a slot for the current state of the board
+    def choose(self, engine):
+        slot = None
+        if engine.selected:
+            # Second pick: the partner of the first card if remembered, else an unseen card
+            first = engine.selected[0]
+            slot = self.memory.partner(first, engine.board.type_ids[first])
+            if slot is None:
+                slot = self.memory.random_unknown(exclude=first)
+        else:
+            # First pick: one card of a remembered pair, else an unseen card
+            pair = self.memory.known_pair()
+            slot = pair[0] if pair else self.memory.random_unknown()
+
+        if slot is None or not engine.can_select(slot):
+            # Memory out of sync with the board; fall back to any card
+            slots = [s for s in range(engine.num_cards) if engine.can_select(s)]
+            slot = self.rng.choice(slots) if slots else None
+        return slot
@@ -0,0 +1,145 @@
+# Card flip and collect animations.
+#
+# A flip turns a card over in FLIP_FRAMES steps: the face it leaves is
+# squashed horizontally down to an edge, then the face it turns to grows back
+# to full width. A collect animation flies a matched card from the board to
+# its thumbnail in the player's territory, shrinking it to the thumbnail size
+# and turning it upright on the way.
+#
+# The frames are made once per (card image, size, rotation) and kept in a
+# FrameCache, so a running animation costs one blit per card and frame, no
+# matter how many cards animate at once. Animations run on elapsed time
+# (advance(dt)), not on frame counts, so they take as long at 30 fps as at
+# 60 fps.
+import math
+import pygame
+from collections import OrderedDict
+
+from assets import scale_image
+
+# Flip animation: duration (ms) and frames (half show the old face, half the new one)
+FLIP = "flip"
+FLIP_TIME = 240
+FLIP_FRAMES = 12
+
+# Collect animation: duration (ms) and frames from card size to thumbnail size
+COLLECT = "collect"
+COLLECT_TIME = 450
+COLLECT_FRAMES = 12
+
+# Maximum number of frame sequences kept. An Ultra Hard board flips up to
+# 26 different (image, rotation) fronts and one card back; matched cards add
+# a collect sequence each while they fly.
+FRAME_CACHE_SIZE = 64
+
+
+# Smooth start and stop for movement (t from 0 to 1)
+def ease(t):
+    return t * t * (3 - 2 * t)
+
+
+def lerp(a, b, t):
+    return a + (b - a) * t
+
+
+# One running animation of a card
+class CardAnimation:
+    __slots__ = ("kind", "duration", "elapsed", "reverse")
+
+    # reverse plays the frames backwards (a flip from face up to face down)
+    def __init__(self, kind, duration, reverse=False):
+        self.kind = kind
+        self.duration = duration
+        self.elapsed = 0
+        self.reverse = reverse
+
+    def advance(self, dt):
+        self.elapsed = min(self.elapsed + dt, self.duration)
+
+    @property
+    def done(self):
+        return self.elapsed >= self.duration
+
+    def progress(self):
+        return self.elapsed / self.duration if self.duration else 1.0
+
+    # Frame to show out of `count`: flips step evenly, collects follow the easing
+    def frame_index(self, count):
+        if self.kind == COLLECT:
+            return round(ease(self.progress()) * (count - 1))
+        index = min(count - 1, int(self.progress() * count))
+        return count - 1 - index if self.reverse else index
+
+
+# Width of a flip frame: the card seen edge-on halfway through
+def flip_frame_width(index, count, width):
+    return max(1, round(width * abs(math.cos((index + 0.5) / count * math.pi))))
+
+
+# Whether a flip frame shows the front (the second half) or the back
+def flip_shows_front(index, count):
+    return index >= count // 2
+
+
+# Squashed copies of a face for its half of a flip (the back for the first
+# half of the frames, the front for the second half)
+def make_flip_frames(face, count, front):
+    width, height = face.get_size()
+    half = count // 2
+    indices = range(half, count) if front else range(half)
+    return [scale_image(face, (flip_frame_width(i, count, width), height)) for i in indices]
+
+
+# Scale of a collect frame, from the card size to end_size pixels wide
+def collect_frame_scale(index, count, width, end_size):
+    return lerp(1.0, end_size / width, index / (count - 1))
+
+
+# Counterclockwise rotation of a collect frame, from the card's rotation back
+# to upright the short way round
+def collect_frame_angle(index, count, rotation):
+    start = (rotation + 180) % 360 - 180
+    return start * (1 - index / (count - 1))
+
+
+# Frames of an upright face flying into a territory: scaled down to end_size
+# and turned from the card's rotation to upright
+def make_collect_frames(face, rotation, end_size, count):
+    # rotozoom leaves the corners of a turned frame transparent only with per-pixel alpha
+    source = pygame.Surface(face.get_size(), pygame.SRCALPHA)
+    source.blit(face, (0, 0))
+    width = face.get_width()
+    return [pygame.transform.rotozoom(source, collect_frame_angle(i, count, rotation),
+                                      collect_frame_scale(i, count, width, end_size))
+            for i in range(count)]
+
+
+# Frame sequences by key, least recently used first
+class FrameCache:
+    def __init__(self, max_size=FRAME_CACHE_SIZE):
+        self.max_size = max_size
+        self.sequences = OrderedDict()  # key -> list of Surfaces
+        self.hits = 0
+        self.misses = 0
+
+    # Sequence cached under key, made by make_frames() the first time
+    def get(self, key, make_frames):
+        frames = self.sequences.get(key)
+        if frames is not None:
+            self.sequences.move_to_end(key)
+            self.hits += 1
+            return frames
+        self.misses += 1
+        frames = make_frames()
+        self.sequences[key] = frames
+        while len(self.sequences) > self.max_size:
+            self.sequences.popitem(last=False)
+        return frames
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+
+    def clear(self):
+        self.sequences.clear()
+        self.reset_stats()
@@ -0,0 +1,161 @@
+# Packed asset bundle for the card images.
+#
+# Packs card_back.png, the regular icons and the hard mode icons into a
+# single file of pre-decoded pixels plus pre-scaled copies at the sizes the
+# game draws cards at. The game maps the file with mmap and creates surfaces
+# straight from views into the mapping, so a cold start is one sequential
+# read instead of two directory listings and a PNG decode per icon.
+#
+# Pixels are stored in BGRA order, which is the layout of display format
+# surfaces with alpha on little-endian machines, so on those machines the
+# surfaces are blitted as they are without a conversion copy.
+#
+# File layout:
+#   header: magic, format version (u16), index length (u32)
+#   index:  JSON {set name: [{"name", "size", "offset", "variants": {size: offset}}]}
+#   pixels: one block per image and variant, each aligned to 16 bytes
+#
+# Usage (rebuild after changing the images):
+#   python asset_bundle.py [--images DIR] [--out FILE]
+import argparse
+import json
+import mmap
+import os
+import struct
+
+import pygame
+
+BUNDLE_FILE = "cards.bundle"
+BUNDLE_MAGIC = b"MCGB"
+BUNDLE_VERSION = 1
+HEADER_FORMAT = "<4sHI"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+PIXEL_FORMAT = "BGRA"
+BLOCK_ALIGN = 16
+
+# Pre-scaled copies: card sizes on Easy and on Normal/Hard, and territory thumbnails
+VARIANT_SIZES = (70, 62, 32)
+
+
+def _align(offset):
+    return (offset + BLOCK_ALIGN - 1) // BLOCK_ALIGN * BLOCK_ALIGN
+
+
+# Pixels of a surface in bundle order, as a 32-bit surface
+def _normalize(surface):
+    pixels = bytearray(pygame.image.tobytes(surface, PIXEL_FORMAT))
+    return pygame.image.frombuffer(pixels, surface.get_size(), PIXEL_FORMAT)
+
+
+# Pack every image set of an image directory into one bundle file
+def build_bundle(image_dir, out_path, sets=None, variant_sizes=VARIANT_SIZES):
+    from assets import AssetManager, SET_CARD_BACK, SET_REGULAR, SET_HARD_MODE
+
+    scanner = AssetManager(image_dir, bundle_path=False)
+    blocks = []  # (offset, bytes)
+    offset = 0
+    index = {}
+    try:
+        for set_name in sets or (SET_CARD_BACK, SET_REGULAR, SET_HARD_MODE):
+            entries = []
+            for name, path in sorted(scanner.list_set(set_name)):
+                image = _normalize(pygame.image.load(path))
+                entry = {"name": name, "size": list(image.get_size()), "variants": {}}
+                for size in (None,) + tuple(variant_sizes):
+                    surface = image if size is None else pygame.transform.smoothscale(image, (size, size))
+                    pixels = pygame.image.tobytes(surface, PIXEL_FORMAT)
+                    if size is None:
+                        entry["offset"] = offset
+                    else:
+                        entry["variants"][str(size)] = offset
+                    blocks.append((offset, pixels))
+                    offset = _align(offset + len(pixels))
+                entries.append(entry)
+            index[set_name] = entries
+    finally:
+        scanner.shutdown()
+
+    index_bytes = json.dumps(index, separators=(",", ":")).encode("utf-8")
+    data_start = _align(HEADER_SIZE + len(index_bytes))
+
+    # Write to a temporary file first so a running game never maps a half-written bundle
+    tmp_path = out_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(struct.pack(HEADER_FORMAT, BUNDLE_MAGIC, BUNDLE_VERSION, len(index_bytes)))
+        f.write(index_bytes)
+        for block_offset, pixels in blocks:
+            f.seek(data_start + block_offset)
+            f.write(pixels)
+        f.truncate(data_start + offset)
+    os.replace(tmp_path, out_path)
+    return index
+
+
+# Read-side view of a bundle file
+class AssetBundle:
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            # Copy-on-write mapping: pages are shared with the page cache until written
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+        if hasattr(self.data, "madvise"):
+            self.data.madvise(mmap.MADV_SEQUENTIAL)
+            self.data.madvise(mmap.MADV_WILLNEED)
+
+        magic, version, index_length = struct.unpack_from(HEADER_FORMAT, self.data, 0)
+        if magic != BUNDLE_MAGIC or version != BUNDLE_VERSION:
+            raise ValueError(f"not a version {BUNDLE_VERSION} asset bundle: {path}")
+        self.index = json.loads(self.data[HEADER_SIZE:HEADER_SIZE + index_length])
+        self.data_start = _align(HEADER_SIZE + index_length)
+        self.view = memoryview(self.data)
+        self.entries = {entry["name"]: entry for entries in self.index.values() for entry in entries}
+
+    def has_set(self, set_name):
+        return set_name in self.index
+
+    def names(self, set_name):
+        return [entry["name"] for entry in self.index[set_name]]
+
+    # Surface backed by the mapped pixels (no copy); size picks a pre-scaled variant
+    def surface(self, name, size=None):
+        entry = self.entries.get(name)
+        if entry is None:
+            return None
+        if size is None:
+            width, height = entry["size"]
+            offset = entry["offset"]
+        else:
+            offset = entry["variants"].get(str(size))
+            if offset is None:
+                return None
+            width = height = size
+        start = self.data_start + offset
+        return pygame.image.frombuffer(self.view[start:start + width * height * 4], (width, height), PIXEL_FORMAT)
+
+
+# Open a bundle, or None if there is no usable bundle at path
+def open_bundle(path):
+    if not path or not os.path.isfile(path):
+        return None
+    try:
+        return AssetBundle(path)
+    except (OSError, ValueError, struct.error):
+        return None
+
+
+def main(argv=None):
+    from assets import IMAGE_DIR
+
+    parser = argparse.ArgumentParser(description="Pack the card images into one asset bundle file.")
+    parser.add_argument("--images", default=IMAGE_DIR, help="image directory to pack")
+    parser.add_argument("--out", default=None, help=f"bundle file (default: IMAGES/{BUNDLE_FILE})")
+    args = parser.parse_args(argv)
+
+    out_path = args.out or os.path.join(args.images, BUNDLE_FILE)
+    index = build_bundle(args.images, out_path)
+    count = sum(len(entries) for entries in index.values())
+    print(f"Packed {count} images into {out_path} ({os.path.getsize(out_path) // 1024} KiB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+# Asset manager for the card images.
+#
+# Image sets are decoded in a thread pool and only when a set is first
+# requested, so the menu can run while icons are still being decoded and
+# the hard mode icons are never touched unless Ultra Hard is played.
+# Requests return handles right away; a handle blocks only when its surface
+# is actually needed. Surfaces are converted to the display format on first
+# use once the window exists, so blits take the fast path.
+#
+# When the image directory holds a packed bundle (see asset_bundle.py) every
+# set is served from the memory-mapped bundle instead, without listing
+# directories or decoding PNGs.
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import pygame
+
+from asset_bundle import BUNDLE_FILE, open_bundle
+
+# Directory holding the card images, next to this file (not the working directory)
+IMAGE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "images")
+
+# Image sets
+SET_CARD_BACK = "card_back"
+SET_REGULAR = "regular"
+SET_HARD_MODE = "hard_mode"
+
+CARD_BACK_FILE = "card_back.png"
+HARD_MODE_DIR = "hard_mode"
+
+# Decoding threads
+ASSET_WORKERS = 4
+
+# Smallest size tier made of an image (pixels)
+TIER_MIN_SIZE = 8
+
+
+# Masks of display format surfaces with alpha (known once the window exists)
+_display_alpha_masks = None
+
+# Convert a surface to the display format, unless it already is in that format
+def to_display_format(surface):
+    global _display_alpha_masks
+    if _display_alpha_masks is None:
+        _display_alpha_masks = pygame.Surface((1, 1), pygame.SRCALPHA).convert_alpha().get_masks()
+    if surface.get_bitsize() == 32 and surface.get_masks() == _display_alpha_masks:
+        return surface
+    return surface.convert_alpha()
+
+
+# Scale with filtering (smoothscale only takes 24 and 32 bit surfaces)
+def scale_image(surface, size):
+    if surface.get_bitsize() >= 24:
+        return pygame.transform.smoothscale(surface, size)
+    return pygame.transform.scale(surface, size)
+
+
+# Mipmap-style size tiers of the card images. The first tier is the image
+# itself and every further tier is half the size of the one before it,
+# scaled from it when it is first needed. Cards and thumbnails are scaled
+# from the smallest tier that is still at least their size, so small copies
+# never resample the full size image, and a new window size only adds the
+# tiers it had not needed before; no image is loaded again.
+class IconTiers:
+    def __init__(self):
+        self.chains = {}  # name -> [image, half size, quarter size, ...]
+        self.made = 0
+
+    # Closest tier of an image for drawing it `size` pixels wide
+    def get(self, name, image, size):
+        chain = self.chains.get(name)
+        if chain is None or chain[0] is not image:
+            chain = [image]
+            self.chains[name] = chain
+        level = 0
+        while True:
+            width, height = chain[level].get_size()
+            half = ((width + 1) // 2, (height + 1) // 2)
+            if max(half) < max(size, TIER_MIN_SIZE):
+                return chain[level]
+            level += 1
+            if level == len(chain):
+                chain.append(scale_image(chain[level - 1], half))
+                self.made += 1
+
+    def clear(self):
+        self.chains.clear()
+        self.made = 0
+
+
+# Future that is already resolved (surfaces served from the bundle)
+def _done(result):
+    future = Future()
+    future.set_result(result)
+    return future
+
+
+# A surface that may still be decoding
+class AssetHandle:
+    def __init__(self, name, future):
+        self.name = name
+        self.future = future
+        self.converted = None
+
+    def ready(self):
+        return self.future.done()
+
+    # The decoded surface; blocks until decoding has finished
+    def surface(self):
+        if self.converted is not None:
+            return self.converted
+        surface = self.future.result()
+        if pygame.display.get_surface() is None:
+            return surface  # No display yet, convert later
+        self.converted = to_display_format(surface)
+        return self.converted
+
+
+class AssetManager:
+    # bundle_path defaults to the bundle inside image_dir; False disables the bundle
+    def __init__(self, image_dir=IMAGE_DIR, workers=ASSET_WORKERS, bundle_path=None):
+        self.image_dir = image_dir
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="assets")
+        self.sets = {}  # set name -> list of (name, AssetHandle)
+        if bundle_path is None:
+            bundle_path = os.path.join(image_dir, BUNDLE_FILE)
+        self.bundle = open_bundle(bundle_path)
+        self.prescaled_surfaces = {}  # (name, size) -> display format Surface or None
+
+    # (name, path) of every image in a set, without decoding anything
+    def list_set(self, set_name):
+        if set_name == SET_CARD_BACK:
+            return [("card_back", os.path.join(self.image_dir, CARD_BACK_FILE))]
+
+        files = []
+        if set_name == SET_REGULAR:
+            # Get all PNG files from the images directory (excluding card_back.png)
+            for file in os.listdir(self.image_dir):
+                path = os.path.join(self.image_dir, file)
+                if file.lower().endswith('.png') and file != CARD_BACK_FILE and not os.path.isdir(path):
+                    files.append((file.split('.')[0], path))  # Name without extension
+        elif set_name == SET_HARD_MODE:
+            hard_mode_dir = os.path.join(self.image_dir, HARD_MODE_DIR)
+            if os.path.exists(hard_mode_dir):
+                for file in os.listdir(hard_mode_dir):
+                    if file.lower().endswith('.png') and not file.startswith('.'):
+                        files.append((file.split('.')[0], os.path.join(hard_mode_dir, file)))
+        else:
+            raise ValueError(f"unknown image set: {set_name}")
+        return files
+
+    # Start decoding a set in the background; returns its (name, AssetHandle) list
+    def request(self, set_name):
+        handles = self.sets.get(set_name)
+        if handles is None and self.bundle is not None and self.bundle.has_set(set_name):
+            handles = [(name, AssetHandle(name, _done(self.bundle.surface(name))))
+                       for name in self.bundle.names(set_name)]
+            self.sets[set_name] = handles
+        elif handles is None:
+            handles = [(name, AssetHandle(name, self.executor.submit(pygame.image.load, path)))
+                       for name, path in self.list_set(set_name)]
+            self.sets[set_name] = handles
+        return handles
+
+    def is_loaded(self, set_name):
+        handles = self.sets.get(set_name)
+        return handles is not None and all(handle.ready() for _, handle in handles)
+
+    # (name, Surface) list of a set; blocks until the whole set is decoded
+    def load_set(self, set_name):
+        return [(name, handle.surface()) for name, handle in self.request(set_name)]
+
+    def card_back(self):
+        return self.load_set(SET_CARD_BACK)[0][1]
+
+    # Copy of an image pre-scaled to size x size in the bundle, or None
+    def prescaled(self, name, size):
+        key = (name, size)
+        if key not in self.prescaled_surfaces:
+            surface = self.bundle.surface(name, size) if self.bundle is not None else None
+            if surface is not None and pygame.display.get_surface() is not None:
+                surface = to_display_format(surface)
+            self.prescaled_surfaces[key] = surface
+        return self.prescaled_surfaces[key]
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,221 @@
+# Vectorized batch simulator for tuning difficulty.
+#
+# Holds N boards as NumPy arrays and advances all of them with one
+# vectorized step per turn, using the same rules as GameEngine: a match
+# scores 2 points and keeps the turn, a mismatch passes the turn.
+#
+# Usage:
+#   python batch_sim.py --games 100000 --policy perfect --policy2 limited --forget 0.3
+import argparse
+import json
+
+import numpy as np
+
+from game_engine import PLAYER_1, PLAYER_2, difficulty_names, difficulty_settings
+
+# Safety limit on turns per game (a random player needs far fewer)
+MAX_TURNS = 10000
+
+
+# Pick one random True slot per row of mask (rows must have at least one)
+def random_slot(rng, mask):
+    keys = rng.random(mask.shape)
+    keys[~mask] = -1.0
+    return keys.argmax(axis=1)
+
+
+# Selection policy that ignores what has been seen before
+class RandomPolicy:
+    name = "random"
+    forget = 0.0
+
+    def choose(self, rng, partner, available, known):
+        rows = np.arange(len(partner))
+        first = random_slot(rng, available)
+        rest = available.copy()
+        rest[rows, first] = False
+        second = random_slot(rng, rest)
+        return first, second
+
+
+# Selection policy that plays from memory: take a known pair if there is one,
+# otherwise open an unseen card and take its partner if it has been seen.
+# With forget > 0, every remembered card is lost with that probability each turn.
+class MemoryPolicy:
+    def __init__(self, forget=0.0):
+        self.forget = forget
+        self.name = "perfect" if forget == 0 else f"limited({forget:g})"
+
+    def choose(self, rng, partner, available, known):
+        rows = np.arange(len(partner))
+        known = known & available
+        unknown = available & ~known
+
+        # Known pairs: remembered cards whose partner is remembered too
+        pair_slots = known & np.take_along_axis(known, partner, axis=1)
+        has_pair = pair_slots.any(axis=1)
+
+        # First pick: a known pair, else an unseen card (else any card)
+        fallback = np.where(unknown.any(axis=1)[:, None], unknown, available)
+        first = np.where(has_pair, pair_slots.argmax(axis=1), random_slot(rng, fallback))
+
+        # Second pick: the first card's partner if remembered, else an unseen card
+        first_partner = partner[rows, first]
+        partner_known = known[rows, first_partner]
+        rest = available.copy()
+        rest[rows, first] = False
+        unseen_rest = rest & ~known
+        fallback = np.where(unseen_rest.any(axis=1)[:, None], unseen_rest, rest)
+        second = np.where(partner_known, first_partner, random_slot(rng, fallback))
+        return first, second
+
+
+POLICIES = {
+    "random": lambda forget: RandomPolicy(),
+    "perfect": lambda forget: MemoryPolicy(0.0),
+    "limited": lambda forget: MemoryPolicy(forget),
+}
+
+
+class BatchSimulator:
+    def __init__(self, n_boards, pairs, policies, seed=None):
+        self.rng = np.random.default_rng(seed)
+        self.n_boards = n_boards
+        self.pairs = pairs
+        self.slots = pairs * 2
+        self.policies = policies  # One policy per player
+
+        # Shuffled boards: a random permutation of the pair ids per row
+        pair_ids = np.repeat(np.arange(pairs, dtype=np.int16), 2)
+        order = np.argsort(self.rng.random((n_boards, self.slots)), axis=1)
+        self.card_type = pair_ids[order]
+
+        # Slot of the other card of the same pair, for O(1) pair lookups
+        rows = np.arange(n_boards)[:, None]
+        by_type = np.argsort(self.card_type, axis=1, kind="stable")
+        self.partner = np.empty((n_boards, self.slots), dtype=np.intp)
+        self.partner[rows, by_type[:, 0::2]] = by_type[:, 1::2]
+        self.partner[rows, by_type[:, 1::2]] = by_type[:, 0::2]
+
+        self.matched = np.zeros((n_boards, self.slots), dtype=bool)
+        self.known = np.zeros((n_boards, 2, self.slots), dtype=bool)  # Memory of each player
+        self.scores = np.zeros((n_boards, 2), dtype=np.int32)
+        self.current_player = np.full(n_boards, PLAYER_1, dtype=np.int8)
+        self.turns = np.zeros(n_boards, dtype=np.int32)
+        self.done = np.zeros(n_boards, dtype=bool)
+
+    # Play one turn (two picks) on every unfinished board
+    def step(self):
+        active = np.nonzero(~self.done)[0]
+        if len(active) == 0:
+            return False
+
+        types = self.card_type[active]
+        partner = self.partner[active]
+        available = ~self.matched[active]
+        player = self.current_player[active]
+        first = np.empty(len(active), dtype=np.intp)
+        second = np.empty(len(active), dtype=np.intp)
+
+        for p, policy in enumerate(self.policies):
+            sel = player == p
+            if sel.any():
+                known = self.known[active[sel], p]
+                first[sel], second[sel] = policy.choose(self.rng, partner[sel], available[sel], known)
+
+        # Both players see the two revealed cards
+        self.known[active, :, first] = True
+        self.known[active, :, second] = True
+
+        rows = np.arange(len(active))
+        match = types[rows, first] == types[rows, second]
+        hit = active[match]
+        self.matched[hit, first[match]] = True
+        self.matched[hit, second[match]] = True
+        self.scores[hit, player[match]] += 2
+
+        # Mismatch passes the turn
+        miss = active[~match]
+        self.current_player[miss] = 1 - self.current_player[miss]
+        self.turns[active] += 1
+
+        # Forgetting for limited memory players
+        for p, policy in enumerate(self.policies):
+            if policy.forget > 0:
+                keep = self.rng.random((len(active), self.slots)) >= policy.forget
+                self.known[active, p] &= keep
+
+        self.done[active] = self.matched[active].all(axis=1)
+        return True
+
+    def run(self):
+        for _ in range(MAX_TURNS):
+            if not self.step():
+                break
+        return self
+
+
+# Simulate games for one difficulty and summarize the results
+def simulate(difficulty, games, policies, seed=None, batch_size=50000):
+    pairs = difficulty_settings[difficulty]["pairs"]
+    seeds = np.random.SeedSequence(seed).spawn((games + batch_size - 1) // batch_size)
+    scores = []
+    turns = []
+    for i, batch_seed in enumerate(seeds):
+        n = min(batch_size, games - i * batch_size)
+        sim = BatchSimulator(n, pairs, policies, batch_seed).run()
+        scores.append(sim.scores)
+        turns.append(sim.turns)
+    return summarize(difficulty, np.concatenate(scores), np.concatenate(turns), policies)
+
+
+# Score distributions, game lengths and first player advantage
+def summarize(difficulty, scores, turns, policies):
+    pairs = difficulty_settings[difficulty]["pairs"]
+    games = len(scores)
+    p1_wins = np.count_nonzero(scores[:, PLAYER_1] > scores[:, PLAYER_2])
+    p2_wins = np.count_nonzero(scores[:, PLAYER_2] > scores[:, PLAYER_1])
+    return {
+        "difficulty": difficulty_names[difficulty],
+        "policies": [policy.name for policy in policies],
+        "games": games,
+        "player1_win_rate": p1_wins / games,
+        "player2_win_rate": p2_wins / games,
+        "tie_rate": (games - p1_wins - p2_wins) / games,
+        "first_player_advantage": (p1_wins - p2_wins) / games,
+        # Games in which Player 1 won k pairs, for k = 0..pairs
+        "player1_pairs_distribution": np.bincount(scores[:, PLAYER_1] // 2, minlength=pairs + 1).tolist(),
+        "turns_mean": float(turns.mean()),
+        "turns_percentiles": dict(zip(["p50", "p90", "p99"], np.percentile(turns, [50, 90, 99]).tolist())),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate many memory card games at once with NumPy.")
+    parser.add_argument("--games", type=int, default=100000, help="games per difficulty")
+    parser.add_argument("--difficulty", choices=["all"] + [str(d) for d in difficulty_settings], default="all")
+    parser.add_argument("--policy", choices=sorted(POLICIES), default="perfect", help="policy of Player 1")
+    parser.add_argument("--policy2", choices=sorted(POLICIES), default=None, help="policy of Player 2 (default: same as Player 1)")
+    parser.add_argument("--forget", type=float, default=0.2, help="forget probability per turn for the limited policy")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--json", metavar="PATH", help="write the results as JSON")
+    args = parser.parse_args(argv)
+
+    policies = (POLICIES[args.policy](args.forget), POLICIES[args.policy2 or args.policy](args.forget))
+    difficulties = list(difficulty_settings) if args.difficulty == "all" else [int(args.difficulty)]
+
+    results = []
+    for difficulty in difficulties:
+        result = simulate(difficulty, args.games, policies, args.seed)
+        results.append(result)
+        print(f"{result['difficulty']:>10}: P1 {result['player1_win_rate']:.3f}  P2 {result['player2_win_rate']:.3f}  "
+              f"tie {result['tie_rate']:.3f}  advantage {result['first_player_advantage']:+.3f}  "
+              f"turns {result['turns_mean']:.1f} (p90 {result['turns_percentiles']['p90']:.0f})")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
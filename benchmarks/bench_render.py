@@ -0,0 +1,407 @@
+# Headless benchmarks for the rendering and game setup hot paths.
+#
+# Runs with the SDL dummy video driver, so no window or GPU is needed.
+# Every benchmark reports the median and the fastest time per call over
+# several runs. The results can be saved as the baseline and later runs
+# compared against it; the comparison uses the fastest run, which is the
+# least disturbed by other processes, and the script exits with status 1
+# when a benchmark got slower than the baseline by more than the threshold.
+#
+# Timings differ between machines: every run also times a fixed calibration
+# workload, and baseline times are scaled by the ratio of the two runs'
+# calibration times before comparing. Cases of a few microseconds, and a few
+# cases that vary a lot between runs, get a somewhat wider tolerance
+# (SMALL_CASE_THRESHOLD, CASE_THRESHOLDS). A busy spell of the machine can
+# still slow down a whole run, so when cases look slower the suite runs
+# again (--confirm-runs) with a new calibration, and each run is compared
+# with the baseline on its own: the gate passes when one run has no
+# regressions. Every renderer needs its own committed baseline; without
+# one the gate fails.
+#
+# Usage (from the repository root):
+#   python benchmarks/bench_render.py                      # compare with benchmarks/baseline.json
+#   python benchmarks/bench_render.py --save-baseline      # record a new baseline
+#   python benchmarks/bench_render.py --out results.json --threshold 0.3
+#   python benchmarks/bench_render.py --renderer software  # SDL2 texture backend (own baseline file)
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import pygame  # noqa: E402
+
+import memory_game as mg  # noqa: E402
+from animation import CardAnimation, COLLECT, COLLECT_TIME, FLIP_TIME  # noqa: E402
+from asset_bundle import BUNDLE_FILE, build_bundle  # noqa: E402
+from assets import AssetManager  # noqa: E402
+from game_engine import (  # noqa: E402
+    Board, DIFFICULTY_EASY, DIFFICULTY_NORMAL, DIFFICULTY_HARD, DIFFICULTY_ULTRA,
+    difficulty_names,
+)
+from layout import get_layout  # noqa: E402
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+
+# Baseline of a renderer: the Surface renderer's is baseline.json, the others have their own
+def baseline_file(renderer):
+    if renderer == "surface":
+        return BASELINE_FILE
+    return os.path.join(os.path.dirname(BASELINE_FILE), f"baseline_{renderer}.json")
+
+# A benchmark is slower than the baseline when its fastest run grew by more than this fraction
+DEFAULT_THRESHOLD = 0.25
+
+# Changes smaller than this are timer noise, whatever the percentage (microseconds)
+MIN_DELTA_US = 5
+
+# Cases faster than SMALL_CASE_US (in the baseline) may be slower by SMALL_CASE_THRESHOLD
+SMALL_CASE_US = 50
+SMALL_CASE_THRESHOLD = 0.5
+
+# Allowed slowdown of cases whose times vary more from run to run (by name
+# prefix): image loading waits for decoding threads, game setup allocates
+# the cards, and the large boards walk thousands of them
+CASE_THRESHOLDS = {
+    "load_card_images": 0.5,
+    "init_game[": 0.5,
+    "draw_game[large_": 0.5,
+    "slot_at[": 0.5,
+}
+
+# Runs per benchmark (the fastest one is compared)
+REPEAT = 15
+QUICK_REPEAT = 3
+
+# Board seed, so every run measures the same boards
+BENCH_SEED = 1
+
+# Pair counts and shape of the synthetic boards
+SYNTHETIC_PAIRS = (50, 200)
+SYNTHETIC_LAYOUT = {"margin": 4}
+
+# Pair counts of the large boards shown through the viewport (--pairs)
+LARGE_PAIRS = (300, 2000)
+
+
+# Median and fastest time per call (microseconds) of func over `repeat` runs of `number` calls
+def measure(func, setup=None, number=100, repeat=7):
+    times = []
+    gc_was_enabled = gc.isenabled()
+    gc.disable()  # Like timeit, keep collections out of the timings
+    try:
+        for _ in range(repeat):
+            if setup is not None:
+                setup()
+            start = time.perf_counter()
+            for _ in range(number):
+                func()
+            times.append((time.perf_counter() - start) / number * 1e6)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return {"median_us": statistics.median(times), "min_us": min(times), "number": number, "repeat": repeat}
+
+
+# Fastest time (microseconds) of a fixed workload of Python code and
+# blits, the same on every version of the game
+def calibrate(repeat):
+    target = pygame.Surface((256, 256))
+    source = pygame.Surface((64, 64))
+
+    def workload():
+        total = 0
+        for i in range(2000):
+            total += i * i
+        for i in range(100):
+            target.blit(source, (i, i))
+        return total
+    return measure(workload, number=50, repeat=repeat)["min_us"]
+
+
+# Start a game and advance it past the show-all phase
+def start_playing(difficulty):
+    mg.current_difficulty = difficulty
+    mg.init_game(difficulty, BENCH_SEED)
+    mg.apply_engine_events(mg.engine.step(None, mg.engine.display_time))
+    mg.update_game(FLIP_TIME)  # The cards have turned face down
+    mg.draw_game()
+
+
+# Win `pairs` pairs for alternating players, waiting out each reveal
+def win_pairs(pairs):
+    engine = mg.engine
+    by_type = {}
+    for slot, type_id in enumerate(engine.board.type_ids):
+        by_type.setdefault(type_id, []).append(slot)
+    for card_type in list(by_type)[:pairs]:
+        first, second = by_type[card_type]
+        mg.apply_engine_events(engine.step(first))
+        mg.apply_engine_events(engine.step(second))
+        mg.update_game(2000)  # Reveal and success marks are over
+        mg.update_game(COLLECT_TIME)  # The pair has flown to the territory
+        mg.draw_game()
+
+
+# Replace the running game's board with `pairs` pairs laid out in a dense grid
+def make_synthetic_board(pairs):
+    start_playing(DIFFICULTY_NORMAL)
+    engine = mg.engine
+    names = [name for name, _ in mg.CARD_IMAGES]
+    board = [names[i % len(names)] for i in range(pairs) for _ in range(2)]
+    engine.board = Board(board)
+    engine.pairs = pairs
+
+    layout = get_layout(SYNTHETIC_LAYOUT, pairs, mg.SCREEN_WIDTH, mg.SCREEN_HEIGHT)
+    mg.cards = []
+    for slot, card_type in enumerate(board):
+        x, y = layout.positions[slot]
+        card = mg.Card(slot, card_type, x, y, mg.image_index[card_type])
+        card.width = card.height = layout.card_size
+        card.rect = pygame.Rect(layout.rects[slot])
+        mg.cards.append(card)
+    mg.slot_index = layout.slot_index
+    mg.request_full_redraw()
+    mg.draw_game()
+
+
+def run_benchmarks(quick=False, renderer="surface"):
+    repeat = QUICK_REPEAT if quick else REPEAT
+    results = {}
+
+    def bench(name, func, setup=None, number=100):
+        results[name] = measure(func, setup, max(1, number // 5) if quick else number, repeat)
+        print(f"{name:42} {results[name]['median_us']:12.1f} us  (min {results[name]['min_us']:.1f})")
+
+    mg.init_display(renderer)
+    mg.load_assets()
+
+    # Startup: blocking load of every image, from a bundle built for the run
+    # (images/cards.bundle is not in the repository) and from the PNG files
+    def load_images(bundle_path):
+        manager = AssetManager(mg.IMAGE_DIR, bundle_path=bundle_path)
+        mg.load_card_images(manager)
+        manager.shutdown()
+    with tempfile.TemporaryDirectory() as bundle_dir:
+        bundle_path = os.path.join(bundle_dir, BUNDLE_FILE)
+        build_bundle(mg.IMAGE_DIR, bundle_path)
+        bench("load_card_images", lambda: load_images(bundle_path), number=5)
+    bench("load_card_images_png", lambda: load_images(False), number=5)
+
+    # Game setup
+    for difficulty in (DIFFICULTY_EASY, DIFFICULTY_NORMAL, DIFFICULTY_HARD, DIFFICULTY_ULTRA):
+        mg.current_difficulty = difficulty
+        bench(f"init_game[{difficulty_names[difficulty]}]", lambda: mg.init_game(difficulty, BENCH_SEED), number=50)
+
+    # Menu
+    mg.game_state = mg.STATE_MENU
+    bench("draw_menu", mg.draw_menu)
+
+    # Show-all phase: idle frame and full repaint
+    mg.current_difficulty = DIFFICULTY_HARD
+    mg.init_game(DIFFICULTY_HARD, BENCH_SEED)
+    mg.draw_game()
+    bench("draw_game[show_all,idle]", mg.draw_game, number=1000)
+    bench("draw_game[show_all,full]", lambda: (mg.request_full_redraw(), mg.draw_game()))
+
+    # Playing with some pairs won: idle frame, one flipped card, full repaint
+    start_playing(DIFFICULTY_HARD)
+    win_pairs(5)
+    card = next(card for card in mg.cards if not card.is_matched)
+
+    def flip_frame():
+        card.dirty = True
+        mg.draw_game()
+    bench("draw_game[playing,idle]", mg.draw_game, number=1000)
+    bench("draw_game[playing,one_card]", flip_frame, number=500)
+    bench("draw_game[playing,full]", lambda: (mg.request_full_redraw(), mg.draw_game()))
+
+    # Game over with the full-screen overlay
+    start_playing(DIFFICULTY_NORMAL)
+    win_pairs(mg.engine.pairs)
+    assert mg.game_state == mg.STATE_GAME_OVER
+    bench("draw_game[game_over,full]", lambda: (mg.request_full_redraw(), mg.draw_game()))
+
+    # Animations on Ultra Hard: every card flipping at once, and a pair flying to a territory
+    start_playing(DIFFICULTY_ULTRA)
+
+    def flip_all_frame():
+        for card in mg.cards:
+            if not card.is_flipping:
+                card.start_flip(not card.is_flipped)
+                mg.active_cards[card] = None
+        mg.update_game(16)
+        mg.draw_game()
+    bench("draw_game[ultra,flip_all]", flip_all_frame, number=300)
+    mg.update_game(FLIP_TIME)
+    pair = [card for card in mg.cards if card.card_type == mg.cards[0].card_type]
+    for card in pair:
+        mg.select_card(card)
+    mg.update_game(2000)  # Reveal and success mark are over: the pair takes off
+
+    def flight_frame():
+        for card in pair:
+            if not card.is_flying:
+                card.animation = CardAnimation(COLLECT, COLLECT_TIME)
+                mg.active_cards[card] = None
+        mg.update_game(16)
+        mg.draw_game()
+    bench("draw_game[ultra,flight]", flight_frame, number=300)
+
+    # Single card draws, face up, with and without rotation
+    mg.current_difficulty = DIFFICULTY_ULTRA
+    mg.init_game(DIFFICULTY_ULTRA, BENCH_SEED)
+    card = mg.cards[0]
+    card.rotation = 0
+    bench("Card.draw[face_up]", card.draw, number=1000)
+    card.rotation = 90
+    bench("Card.draw[rotated]", card.draw, number=1000)
+    if mg.gpu is not None:
+        card.rotation = 0
+        bench("Card.draw_texture[face_up]", card.draw_texture, number=1000)
+        card.rotation = 90
+        bench("Card.draw_texture[rotated]", card.draw_texture, number=1000)
+    start_playing(DIFFICULTY_HARD)
+    bench("Card.draw[face_down]", mg.cards[0].draw, number=1000)
+    if mg.gpu is not None:
+        bench("Card.draw_texture[face_down]", mg.cards[0].draw_texture, number=1000)
+
+    # Scaled-up synthetic boards
+    for pairs in SYNTHETIC_PAIRS:
+        make_synthetic_board(pairs)
+        card = mg.cards[len(mg.cards) // 2]
+        positions = [card.rect.center for card in mg.cards]
+        bench(f"draw_game[synthetic_{pairs},full]", lambda: (mg.request_full_redraw(), mg.draw_game()), number=20)
+
+        def synthetic_flip():
+            card.dirty = True
+            mg.draw_game()
+        bench(f"draw_game[synthetic_{pairs},one_card]", synthetic_flip, number=500)
+        bench(f"slot_at[synthetic_{pairs},all_cards]", lambda: [mg.slot_at(pos) for pos in positions], number=20)
+    
+    # Large boards: setup, and repainting the viewport after a pan at the widest and closest zoom
+    for pairs in LARGE_PAIRS:
+        mg.board_pairs = pairs
+        bench(f"init_game[large_{pairs}]", lambda: mg.init_game(DIFFICULTY_NORMAL, BENCH_SEED), number=5)
+        start_playing(DIFFICULTY_NORMAL)
+        for zoom, steps in (("min_zoom", 0), ("max_zoom", 100)):
+            mg.viewport_changed(mg.viewport.zoom_at(mg.viewport.center(), steps))
+            mg.draw_game()
+            bench(f"draw_game[large_{pairs},{zoom},pan]", lambda: (mg.viewport_changed(), mg.draw_game()), number=20)
+        bench(f"draw_game[large_{pairs},idle]", mg.draw_game, number=1000)
+    mg.board_pairs = None
+
+    mg.assets.shutdown()
+    if mg.gpu is not None:
+        mg.gpu.close()
+    return results
+
+
+# Allowed slowdown of a case whose baseline time is base_us
+def case_threshold(name, base_us, threshold):
+    allowed = threshold
+    for prefix, prefix_threshold in CASE_THRESHOLDS.items():
+        if name.startswith(prefix):
+            allowed = max(allowed, prefix_threshold)
+    if base_us < SMALL_CASE_US:
+        allowed = max(allowed, SMALL_CASE_THRESHOLD)
+    return allowed
+
+
+# Benchmarks whose fastest run got slower than the baseline by more than
+# threshold, after scaling the baseline to this machine's speed
+def compare(results, baseline, threshold, calibration_us=None):
+    scale = 1.0
+    base_calibration = baseline.get("meta", {}).get("calibration_us")
+    if calibration_us and base_calibration:
+        scale = calibration_us / base_calibration
+        print(f"Calibration: {base_calibration:.1f} -> {calibration_us:.1f} us, baseline times scaled by {scale:.2f}")
+    regressions = []
+    for name, result in sorted(results.items()):
+        base = baseline.get("results", {}).get(name)
+        if base is None:
+            print(f"{name:42} (not in baseline)")
+            continue
+        base_us = base["min_us"] * scale
+        change = result["min_us"] / base_us - 1 if base_us else 0
+        regressed = change > case_threshold(name, base_us, threshold) and result["min_us"] - base_us > MIN_DELTA_US
+        flag = "REGRESSION" if regressed else ""
+        print(f"{name:42} {base_us:12.1f} -> {result['min_us']:12.1f} us  {change:+7.1%} {flag}")
+        if regressed:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark rendering and game setup under the SDL dummy driver.")
+    parser.add_argument("--baseline", help="baseline results file (default: benchmarks/baseline.json, or baseline_<renderer>.json)")
+    parser.add_argument("--save-baseline", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="allowed slowdown (0.25 = 25%%)")
+    parser.add_argument("--out", help="also write the results to this JSON file")
+    parser.add_argument("--quick", action="store_true", help="fewer iterations (smoke test)")
+    parser.add_argument("--confirm-runs", type=int, default=2,
+                        help="runs of the whole suite to confirm regressions (0: report the first run)")
+    parser.add_argument("--renderer", choices=("surface", "texture", "software"), default="surface",
+                        help="drawing backend to measure (like memory_game.py --renderer)")
+    args = parser.parse_args(argv)
+    if args.baseline is None:
+        args.baseline = baseline_file(args.renderer)
+
+    repeat = QUICK_REPEAT if args.quick else REPEAT
+    data = {
+        "meta": {
+            "calibration_us": calibrate(repeat),
+            "python": platform.python_version(),
+            "pygame": pygame.version.ver,
+            "sdl": ".".join(map(str, pygame.get_sdl_version())),
+            "machine": platform.machine(),
+            "driver": os.environ.get("SDL_VIDEODRIVER"),
+            "renderer": args.renderer,
+        },
+        "results": run_benchmarks(args.quick, args.renderer),
+    }
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(data, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(data, f, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline first")
+        return 1
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    print()
+    regressions = compare(data["results"], baseline, args.threshold, data["meta"]["calibration_us"])
+    for _ in range(args.confirm_runs):
+        if not regressions:
+            break
+        print(f"\n{len(regressions)} benchmark(s) look slower; running the suite again to confirm")
+        calibration_us = calibrate(repeat)
+        results = run_benchmarks(args.quick, args.renderer)
+        print()
+        regressions = compare(results, baseline, args.threshold, calibration_us)
+    if regressions:
+        print(f"{len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    print("No regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
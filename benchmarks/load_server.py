@@ -0,0 +1,282 @@
+# Load generator for the match server (net_server.py).
+#
+# Starts the server in a subprocess, then ramps up the number of concurrent
+# games with bot clients that all run on one asyncio event loop. Each bot
+# mirrors its game's engine from the server's events and picks a random
+# face-down card after a random think time; now and then a bot lets its turn
+# run out so the server's turn timers fire as well. For every step the
+# script reports the move latency seen by the clients (pick sent until the
+# server's flip or rejection arrived) next to the server's own metrics, so a
+# p99 that stays flat as the session count grows shows the server scales.
+# The script exits with status 1 when a step's client p99 is over --max-p99.
+#
+# Usage (from the repository root):
+#   python benchmarks/load_server.py                          # 100, 500, 1000, 2000 sessions
+#   python benchmarks/load_server.py --sessions 250,1000 --duration 20 --out load.json
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from game_engine import (  # noqa: E402
+    GameEngine, DIFFICULTY_ULTRA, STATE_PLAYING, STATE_GAME_OVER, EVENT_FLIP, EVENT_STATE,
+    difficulty_settings,
+)
+from net_protocol import (  # noqa: E402
+    START, WELCOME, REJECT, OPPONENT_LEFT, BUSY, ProtocolError,
+    encode_hello, encode_pick, encode_restart, read_message,
+)
+
+# Connections opened at once while ramping up, and the pause between batches
+CONNECT_BATCH = 200
+CONNECT_PAUSE = 0.05
+
+# Seconds a bot thinks before a pick
+THINK_TIME = (0.3, 1.5)
+
+
+# Value at fraction q of a sorted list
+def percentile(values, q):
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0
+
+
+# Allow as many open sockets as the hard limit permits (the server inherits it)
+def raise_file_limit():
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if hard == resource.RLIM_INFINITY or soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    return resource.getrlimit(resource.RLIMIT_NOFILE)[0]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+# Wait until the server accepts connections
+def wait_for_server(port, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            sys.exit("the server exited")
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    sys.exit("the server did not start")
+
+
+class LoadStats:
+    def __init__(self):
+        self.latencies = []  # Seconds from pick sent to the server's answer
+        self.picks = 0
+        self.games = 0
+        self.errors = 0
+        self.busy = 0
+
+
+# One client: joins a game, plays random picks and restarts after each game
+class Bot:
+    def __init__(self, host, port, stats, rng, idle_rate):
+        self.host = host
+        self.port = port
+        self.stats = stats
+        self.rng = rng
+        self.idle_rate = idle_rate
+        self.writer = None
+        self.engine = None
+        self.player = None
+        self.pending = {}  # Slot -> time the pick was sent
+        self.thinking = False
+        self.running = True
+
+    async def run(self):
+        try:
+            reader, self.writer = await asyncio.open_connection(self.host, self.port)
+            self.writer.write(encode_hello())
+            while self.running:
+                self.handle(await read_message(reader))
+        except (asyncio.IncompleteReadError, ConnectionError, ProtocolError, OSError):
+            if self.running:
+                self.stats.errors += 1
+        finally:
+            if self.writer is not None:
+                self.writer.close()
+
+    def stop(self):
+        self.running = False
+        if self.writer is not None:
+            self.writer.transport.abort()
+
+    def handle(self, message):
+        kind = message[0]
+        if kind == WELCOME:
+            self.player = message[1]
+        elif kind == START:
+            self.engine = GameEngine(message[1], board=message[2])
+            self.pending.clear()
+        elif kind == BUSY:
+            self.stats.busy += 1
+            self.running = False
+        elif kind == OPPONENT_LEFT:
+            self.engine = None  # The server pairs this bot again
+        elif self.engine is not None:
+            if kind == REJECT or kind == EVENT_FLIP:
+                sent = self.pending.pop(message[1], None)
+                if sent is not None:
+                    self.stats.latencies.append(time.perf_counter() - sent)
+            if kind != REJECT:
+                self.engine.apply_events([message])
+            if kind == EVENT_STATE and message[1] == STATE_GAME_OVER:
+                self.stats.games += 1
+                self.writer.write(encode_restart())
+        self.maybe_pick()
+
+    # Start thinking about a pick when it is this bot's turn
+    def maybe_pick(self):
+        engine = self.engine
+        if (self.thinking or self.pending or engine is None or engine.state != STATE_PLAYING
+                or engine.current_player != self.player or engine.reveal_timer > 0 or len(engine.selected) >= 2):
+            return
+        if not engine.selected and engine.turn_time_limit is not None and self.rng.random() < self.idle_rate:
+            return  # Let this turn time out
+        self.thinking = True
+        asyncio.get_running_loop().call_later(self.rng.uniform(*THINK_TIME), self.pick, engine)
+
+    def pick(self, engine):
+        self.thinking = False
+        if not self.running or engine is not self.engine:
+            return
+        if engine.state == STATE_PLAYING and engine.current_player == self.player and len(engine.selected) < 2:
+            choices = [slot for slot in range(len(engine.board)) if engine.can_select(slot)]
+            if choices:
+                slot = self.rng.choice(choices)
+                self.pending[slot] = time.perf_counter()
+                self.writer.write(encode_pick(slot))
+                self.stats.picks += 1
+                return
+        self.maybe_pick()
+
+
+# Connect bots in batches so the server's listen backlog does not overflow
+async def open_bots(bots):
+    tasks = []
+    for start in range(0, len(bots), CONNECT_BATCH):
+        tasks += [asyncio.ensure_future(bot.run()) for bot in bots[start:start + CONNECT_BATCH]]
+        await asyncio.sleep(CONNECT_PAUSE)
+    return tasks
+
+
+def read_metrics(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+async def run_load(args, port, metrics_path):
+    rng = random.Random(args.seed)
+    bots = []
+    tasks = []
+    results = []
+    for sessions in args.sessions:
+        new_bots = [Bot("127.0.0.1", port, None, random.Random(rng.random()), args.idle_rate)
+                    for _ in range(2 * sessions - len(bots))]
+        stats = LoadStats()
+        for bot in bots + new_bots:
+            bot.stats = stats
+        bots += new_bots
+        tasks += await open_bots(new_bots)
+        await asyncio.sleep(args.warmup)
+
+        # Measure from here on
+        stats = LoadStats()
+        for bot in bots:
+            bot.stats = stats
+        cpu = time.process_time()
+        await asyncio.sleep(args.duration)
+        cpu = time.process_time() - cpu
+        latencies = sorted(stats.latencies)
+        server = read_metrics(metrics_path)
+        result = {
+            "sessions": sessions,
+            "picks_per_s": stats.picks / args.duration,
+            "client_p50_ms": percentile(latencies, 0.50) * 1000,
+            "client_p99_ms": percentile(latencies, 0.99) * 1000,
+            "client_max_ms": (latencies[-1] if latencies else 0) * 1000,
+            "games": stats.games,
+            "errors": stats.errors,
+            "busy": stats.busy,
+            "client_cpu_s": cpu,
+            "server": server,
+        }
+        results.append(result)
+        print(f"{sessions:>6} sessions  {result['picks_per_s']:8.0f} picks/s  "
+              f"client p50 {result['client_p50_ms']:7.2f} ms  p99 {result['client_p99_ms']:7.2f} ms  "
+              f"server p99 {server.get('move_latency_p99_ms', 0):6.3f} ms  "
+              f"{server.get('sessions', 0):>6} live  {server.get('session_bytes', 0):6.0f} B/session  "
+              f"rss {server.get('max_rss_kib', 0) / 1024:6.1f} MiB  errors {stats.errors}", flush=True)
+    for bot in bots:
+        bot.stop()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ramp up concurrent games against net_server.py.")
+    parser.add_argument("--sessions", default="100,500,1000,2000", help="comma-separated session counts to ramp through")
+    parser.add_argument("--duration", type=float, default=10, help="seconds measured per step")
+    parser.add_argument("--warmup", type=float, default=None, help="seconds before measuring (default: the show-all time)")
+    parser.add_argument("--difficulty", type=int, choices=list(difficulty_settings), default=DIFFICULTY_ULTRA)
+    parser.add_argument("--idle-rate", type=float, default=0.05, help="fraction of turns left to time out")
+    parser.add_argument("--max-p99", type=float, default=50, help="fail when a step's client p99 (ms) is higher")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="write the results to this JSON file")
+    args = parser.parse_args(argv)
+    args.sessions = [int(count) for count in args.sessions.split(",")]
+    if args.warmup is None:
+        args.warmup = difficulty_settings[args.difficulty]["display_time"] / 1000 + 1
+
+    limit = raise_file_limit()
+    needed = 4 * max(args.sessions) + 100  # Both ends of every connection
+    if limit < needed:
+        sys.exit(f"open file limit {limit} is too low for {max(args.sessions)} sessions (need {needed})")
+
+    port = free_port()
+    metrics_path = os.path.join(tempfile.mkdtemp(), "metrics.json")
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "net_server.py"), "--port", str(port),
+         "--difficulty", str(args.difficulty), "--max-sessions", str(max(args.sessions)),
+         "--metrics-interval", "1", "--metrics-out", metrics_path],
+        stdout=subprocess.DEVNULL)
+    try:
+        wait_for_server(port, server)
+        results = asyncio.run(run_load(args, port, metrics_path))
+    finally:
+        server.terminate()
+        server.wait()
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"difficulty": args.difficulty, "results": results}, f, indent=2)
+    slow = [result["sessions"] for result in results if result["client_p99_ms"] > args.max_p99]
+    if slow:
+        print(f"p99 over {args.max_p99} ms at {', '.join(map(str, slow))} sessions")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
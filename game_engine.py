@@ -0,0 +1,415 @@
+# Headless rules engine for the memory card game.
+#
+# The engine owns the board and every rule of the game: card selection,
+# match resolution, turn switching, the turn timer and game over detection.
+# It does not import pygame and knows nothing about pixels or images, so it
+# can run simulations and servers on machines without a display.
+import random
+from array import array
+
+# Players
+PLAYER_1 = 0
+PLAYER_2 = 1
+
+# Difficulty levels
+DIFFICULTY_EASY = 0
+DIFFICULTY_NORMAL = 1
+DIFFICULTY_HARD = 2
+DIFFICULTY_ULTRA = 3
+difficulty_names = ["Easy", "Normal", "Hard", "Ultra Hard"]
+
+# Difficulty settings
+# layout: board shape for layout.get_layout (cards per row; margin, area and
+#         max_card may be given too)
+# ai_forget: chance per turn that the computer forgets each remembered card
+# ai_recall: chance that the computer memorizes each card shown at the start
+difficulty_settings = {
+    DIFFICULTY_EASY: {"layout": {"rows": [5, 5]}, "pairs": 5, "time_limit": None, "display_time": 10000, "rotate": False, "ai_forget": 0.3, "ai_recall": 0.3},
+    DIFFICULTY_NORMAL: {"layout": {"rows": [6, 6, 6]}, "pairs": 9, "time_limit": None, "display_time": 10000, "rotate": False, "ai_forget": 0.2, "ai_recall": 0.4},
+    DIFFICULTY_HARD: {"layout": {"rows": [4, 6, 6, 6, 4]}, "pairs": 13, "time_limit": 15000, "display_time": 10000, "rotate": False, "ai_forget": 0.1, "ai_recall": 0.5},
+    DIFFICULTY_ULTRA: {"layout": {"rows": [4, 6, 6, 6, 4]}, "pairs": 13, "time_limit": 15000, "display_time": 5000, "rotate": True, "ai_forget": 0.1, "ai_recall": 0.3}
+}
+
+# Card types used when no image names are given (headless games)
+CARD_TYPES = ["A", "B", "C", "D", "E", "F", "G", "H", "I", "J", "K", "L", "M"]
+
+# Separates a card type from its copy number when a board has more pairs
+# than card types (see expand_card_types)
+VARIANT_SEPARATOR = "#"
+
+# Possible card rotations in Ultra Hard mode (degrees)
+ROTATIONS = [0, 90, 180, 270]
+
+# Game states
+STATE_SHOW_ALL = "show_all"
+STATE_PLAYING = "playing"
+STATE_GAME_OVER = "game_over"
+
+# Time the two selected cards stay face up before the turn continues (ms)
+REVEAL_TIME = 1000
+
+# Events returned by GameEngine.step
+EVENT_FLIP = "flip"          # (EVENT_FLIP, slot) card turned face up
+EVENT_HIDE = "hide"          # (EVENT_HIDE, slot) card turned face down
+EVENT_MATCH = "match"        # (EVENT_MATCH, player, slot_a, slot_b)
+EVENT_MISMATCH = "mismatch"  # (EVENT_MISMATCH, player, slot_a, slot_b)
+EVENT_TURN = "turn"          # (EVENT_TURN, player) player whose turn it is now
+EVENT_TIMEOUT = "timeout"    # (EVENT_TIMEOUT, player) player ran out of time
+EVENT_STATE = "state"        # (EVENT_STATE, state) game state changed
+EVENT_REVEAL_END = "reveal_end"  # (EVENT_REVEAL_END,) the selected pair is done, the next pick may follow
+
+
+# Board state as slot-indexed arrays: a type id and a rotation per slot, and
+# face up/matched bitmasks. Counters of the remaining pairs and face-up cards
+# make game over and "any card face up" checks O(1), and copying a board is
+# a few flat copies.
+class Board:
+    def __init__(self, card_types, rotations=None):
+        self.type_names = []  # Type id -> card type name
+        ids = {}
+        self.type_ids = array("H")
+        for card_type in card_types:
+            if card_type not in ids:
+                ids[card_type] = len(self.type_names)
+                self.type_names.append(card_type)
+            self.type_ids.append(ids[card_type])
+        self.rotations = array("H", rotations if rotations is not None else [0] * len(self.type_ids))
+        self.matched_by = array("b", [-1] * len(self.type_ids))  # Player who matched each slot, -1 if none
+        self.flipped_mask = 0
+        self.matched_mask = 0
+        self.face_up = 0  # Unmatched cards that are face up
+        self.remaining_pairs = len(self.type_ids) // 2
+
+    def __len__(self):
+        return len(self.type_ids)
+
+    def card_type(self, slot):
+        return self.type_names[self.type_ids[slot]]
+
+    # Card type name of every slot
+    def card_types(self):
+        return [self.type_names[type_id] for type_id in self.type_ids]
+
+    def is_flipped(self, slot):
+        return (self.flipped_mask >> slot) & 1 == 1
+
+    def is_matched(self, slot):
+        return (self.matched_mask >> slot) & 1 == 1
+
+    # Player who matched a slot, or None
+    def matched_player(self, slot):
+        player = self.matched_by[slot]
+        return None if player < 0 else player
+
+    # Neither face up nor matched
+    def is_hidden(self, slot):
+        return ((self.flipped_mask | self.matched_mask) >> slot) & 1 == 0
+
+    @property
+    def any_face_up(self):
+        return self.face_up > 0
+
+    @property
+    def is_complete(self):
+        return self.remaining_pairs == 0
+
+    def flip(self, slot):
+        if not self.is_flipped(slot):
+            self.flipped_mask |= 1 << slot
+            if not self.is_matched(slot):
+                self.face_up += 1
+
+    def hide(self, slot):
+        if self.is_flipped(slot):
+            self.flipped_mask &= ~(1 << slot)
+            if not self.is_matched(slot):
+                self.face_up -= 1
+
+    # Turn every card face up
+    def show_all(self):
+        for slot in range(len(self.type_ids)):
+            self.flip(slot)
+
+    # Two face-up cards of the same type were matched by player
+    def match(self, first, second, player):
+        for slot in (first, second):
+            if self.is_flipped(slot):
+                self.face_up -= 1
+            self.matched_mask |= 1 << slot
+            self.matched_by[slot] = player
+        self.remaining_pairs -= 1
+
+    def copy(self):
+        other = Board.__new__(Board)
+        other.type_names = self.type_names  # Never changes after construction
+        other.type_ids = array("H", self.type_ids)
+        other.rotations = array("H", self.rotations)
+        other.matched_by = array("b", self.matched_by)
+        other.flipped_mask = self.flipped_mask
+        other.matched_mask = self.matched_mask
+        other.face_up = self.face_up
+        other.remaining_pairs = self.remaining_pairs
+        return other
+
+
+# Card types for at least `pairs` pairs: the types themselves, followed by
+# numbered copies ("EC2#2", "EC2#3", ...) when there are fewer types than pairs
+def expand_card_types(card_types, pairs):
+    card_types = list(card_types)
+    if not card_types:
+        raise ValueError("no card types")
+    copy = 2
+    expanded = list(card_types)
+    while len(expanded) < pairs:
+        expanded.extend(f"{card_type}{VARIANT_SEPARATOR}{copy}" for card_type in card_types)
+        copy += 1
+    return expanded
+
+
+# Base card type of a type made by expand_card_types, and its copy number (1 for the original)
+def split_card_type(card_type):
+    base, _, copy = card_type.partition(VARIANT_SEPARATOR)
+    return base, int(copy) if copy else 1
+
+
+class GameEngine:
+    # rng may be a random.Random shared by many engines (e.g. the sessions of
+    # a server), which saves the memory of one generator state per engine
+    def __init__(self, difficulty=DIFFICULTY_EASY, card_types=None, seed=None, pairs=None, board=None, rng=None):
+        self.seed = seed
+        self.rng = rng if rng is not None else random.Random(seed)
+        self.new_game(difficulty, card_types, pairs, board)
+
+    # Build a new shuffled board for the given difficulty; pairs overrides the
+    # difficulty's pair count (card_types must then hold at least that many types).
+    # A given board (e.g. one received from a server) is played as it is.
+    def new_game(self, difficulty, card_types=None, pairs=None, board=None):
+        settings = difficulty_settings[difficulty]
+        self.difficulty = difficulty
+        self.turn_time_limit = settings["time_limit"]
+        self.display_time = settings["display_time"]
+
+        if board is not None:
+            self.pairs = len(board) // 2
+            self.board = board
+        else:
+            self.pairs = pairs if pairs is not None else settings["pairs"]
+
+            # Select random card types for this game
+            available_types = expand_card_types(card_types if card_types is not None else CARD_TYPES, self.pairs)
+            self.rng.shuffle(available_types)
+            selected_types = available_types[:self.pairs]
+
+            # Create pairs of cards and shuffle them
+            cards = []
+            for card_type in selected_types:
+                cards.extend([card_type, card_type])
+            self.rng.shuffle(cards)
+
+            # Random rotation for Ultra Hard mode
+            if settings.get("rotate", False):
+                rotations = [self.rng.choice(ROTATIONS) for _ in cards]
+            else:
+                rotations = None
+            self.board = Board(cards, rotations)
+
+        self.board.show_all()  # All cards are shown first
+        self.selected = []
+        self.current_player = PLAYER_1
+        self.scores = [0, 0]
+        self.matched_cards = [[], []]  # Card types won by each player
+        self.state = STATE_SHOW_ALL
+        self.show_timer = 0
+        self.turn_timer = 0
+        self.reveal_timer = 0
+        self.turns = 0
+
+    @property
+    def num_cards(self):
+        return len(self.board)
+
+    @property
+    def is_revealing(self):
+        return self.reveal_timer > 0
+
+    # Whether the current player may pick this slot now
+    def can_select(self, slot):
+        return (self.state == STATE_PLAYING
+                and self.reveal_timer <= 0
+                and len(self.selected) < 2
+                and 0 <= slot < len(self.board)
+                and self.board.is_hidden(slot))
+
+    # Apply an action (a slot to pick, or None) and advance the clocks by dt ms.
+    # Returns the list of events that happened during the step.
+    def step(self, action=None, dt=0):
+        events = []
+        if action is not None:
+            self._select(action, events)
+        if dt:
+            self._advance(dt, events)
+        return events
+
+    def _select(self, slot, events):
+        if not self.can_select(slot):
+            return
+
+        self.board.flip(slot)
+        self.selected.append(slot)
+        events.append((EVENT_FLIP, slot))
+
+        if len(self.selected) < 2:
+            return
+
+        # Two cards selected: resolve the pair
+        first, second = self.selected
+        player = self.current_player
+        self.turns += 1
+        if self.board.type_ids[first] == self.board.type_ids[second]:
+            # Matched: the player scores and keeps the turn
+            self.scores[player] += 2
+            self.board.match(first, second, player)
+            self.matched_cards[player].append(self.board.card_type(first))
+            events.append((EVENT_MATCH, player, first, second))
+
+            if self.board.is_complete:
+                self._set_state(STATE_GAME_OVER, events)
+        else:
+            # Not matched: switch players
+            events.append((EVENT_MISMATCH, player, first, second))
+            self._switch_player(events)
+
+        # Keep the pair visible for a while before the next pick
+        self.reveal_timer = REVEAL_TIME
+
+    def _advance(self, dt, events):
+        # Initial card display time
+        if self.state == STATE_SHOW_ALL:
+            self.show_timer += dt
+            if self.show_timer >= self.display_time:
+                # Flip cards face down WITHOUT shuffling positions
+                for slot in range(len(self.board)):
+                    self._hide(slot, events)
+                self._set_state(STATE_PLAYING, events)
+                self.turn_timer = 0
+
+        # Selected pair stays face up until the reveal time is over
+        if self.reveal_timer > 0:
+            self.reveal_timer -= dt
+            if self.reveal_timer <= 0:
+                self._finish_reveal(events)
+
+        # Turn timer for difficulties with a time limit
+        if self.state == STATE_PLAYING and self.turn_time_limit is not None:
+            self.turn_timer += dt
+            if self.turn_timer >= self.turn_time_limit:
+                # Time's up, flip any selected cards back and switch players
+                if self.reveal_timer > 0:
+                    self._finish_reveal(events)
+                events.append((EVENT_TIMEOUT, self.current_player))
+                for slot in self.selected:
+                    self._hide(slot, events)
+                self.selected = []
+                self._switch_player(events)
+
+    def _finish_reveal(self, events):
+        # Flip cards back if not matched
+        for slot in self.selected:
+            if not self.board.is_matched(slot):
+                self._hide(slot, events)
+        self.selected = []
+        self.reveal_timer = 0
+        events.append((EVENT_REVEAL_END,))
+
+    def _hide(self, slot, events):
+        if self.board.is_flipped(slot):
+            self.board.hide(slot)
+            events.append((EVENT_HIDE, slot))
+
+    def _switch_player(self, events):
+        self.current_player = 1 - self.current_player
+        self.turn_timer = 0
+        events.append((EVENT_TURN, self.current_player))
+
+    def _set_state(self, state, events):
+        self.state = state
+        events.append((EVENT_STATE, state))
+
+    # Mirror events produced by another engine playing the same board (e.g. the
+    # server's engine in a networked game) instead of running the rules here
+    def apply_events(self, events):
+        for event in events:
+            kind = event[0]
+            if kind == EVENT_FLIP:
+                self.board.flip(event[1])
+                if self.state == STATE_PLAYING and event[1] not in self.selected:
+                    self.selected.append(event[1])
+            elif kind == EVENT_HIDE:
+                self.board.hide(event[1])
+            elif kind == EVENT_MATCH:
+                player, first, second = event[1:]
+                self.scores[player] += 2
+                self.board.match(first, second, player)
+                self.matched_cards[player].append(self.board.card_type(first))
+                self.turns += 1
+                self.reveal_timer = REVEAL_TIME
+            elif kind == EVENT_MISMATCH:
+                self.turns += 1
+                self.reveal_timer = REVEAL_TIME
+            elif kind == EVENT_TURN:
+                self.current_player = event[1]
+                self.turn_timer = 0
+            elif kind == EVENT_TIMEOUT or kind == EVENT_REVEAL_END:
+                self.selected = []
+                self.reveal_timer = 0
+            elif kind == EVENT_STATE:
+                self.state = event[1]
+                if self.state == STATE_PLAYING:
+                    self.turn_timer = 0
+
+    # Advance the clocks of a mirroring engine for display. The timed events
+    # themselves (end of the show-all phase, end of a reveal, turn timeouts)
+    # only come from the authoritative engine, so the clocks stop at their limits.
+    def advance_clocks(self, dt):
+        if self.state == STATE_SHOW_ALL:
+            self.show_timer = min(self.show_timer + dt, self.display_time)
+        if self.state == STATE_PLAYING and self.turn_time_limit is not None:
+            self.turn_timer = min(self.turn_timer + dt, self.turn_time_limit)
+
+    # Milliseconds until step() produces events without any action (end of the
+    # show-all phase, end of a pair reveal or a turn timeout), or None
+    def time_until_event(self):
+        delays = []
+        if self.state == STATE_SHOW_ALL:
+            delays.append(self.display_time - self.show_timer)
+        if self.reveal_timer > 0:
+            delays.append(self.reveal_timer)
+        if self.state == STATE_PLAYING and self.turn_time_limit is not None:
+            delays.append(self.turn_time_limit - self.turn_timer)
+        return max(0, min(delays)) if delays else None
+
+    # Seconds left in the current turn, or None when there is no turn timer
+    def turn_time_left(self):
+        if self.turn_time_limit is None or self.state != STATE_PLAYING:
+            return None
+        return max(0, (self.turn_time_limit - self.turn_timer) // 1000)
+
+    # Independent copy of the whole game state, for simulations and undo
+    def copy(self):
+        other = GameEngine.__new__(GameEngine)
+        other.__dict__.update(self.__dict__)
+        other.rng = random.Random()
+        other.rng.setstate(self.rng.getstate())
+        other.board = self.board.copy()
+        other.selected = list(self.selected)
+        other.scores = list(self.scores)
+        other.matched_cards = [list(cards) for cards in self.matched_cards]
+        return other
+
+    # Winning player, or None for a tie
+    def winner(self):
+        if self.scores[PLAYER_1] > self.scores[PLAYER_2]:
+            return PLAYER_1
+        if self.scores[PLAYER_2] > self.scores[PLAYER_1]:
+            return PLAYER_2
+        return None
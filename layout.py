@@ -0,0 +1,106 @@
+# Board layouts computed from shape specs.
+#
+# A shape spec (the "layout" entry of difficulty_settings) is a dict with:
+#   rows      number of cards in each row, top to bottom; when left out, a
+#             near-square grid is made for the pair count
+#   margin    gap between cards and around the board (pixels)
+#   area      target area (x, y, width, height) as fractions of the window
+#   max_card  largest card size (pixels)
+# Rows are centered in the area and cards get the largest square size that
+# fits. Layouts are memoized per (shape, window size), so restarting a
+# difficulty reuses the same Layout, including its spatial index.
+# Like spatial_index, this module does not need pygame.
+import math
+from functools import lru_cache
+
+from spatial_index import build_slot_index
+
+DEFAULT_MARGIN = 15
+DEFAULT_AREA = (0.2, 0.0, 0.6, 1.0)  # The play area between the two territories
+DEFAULT_MAX_CARD = 70
+
+
+# Card positions and size for one shape at one window size. Shared between
+# games, so it must not be modified.
+class Layout:
+    def __init__(self, row_lengths, card_size, positions, area):
+        self.row_lengths = row_lengths
+        self.card_size = card_size  # May be fractional, like the positions
+        self.positions = positions  # (x, y) of each slot's top left corner
+        self.area = area            # Target area in pixels (x, y, width, height)
+        size = int(card_size)
+        self.rects = tuple((int(x), int(y), size, size) for x, y in positions)
+        self._slot_index = None
+
+    def __len__(self):
+        return len(self.positions)
+
+    def slot_rect(self, slot):
+        return self.rects[slot]
+
+    # Spatial index over the slot rects, built on first use
+    @property
+    def slot_index(self):
+        if self._slot_index is None:
+            self._slot_index = build_slot_index(self.rects)
+        return self._slot_index
+
+
+# Row lengths of a spec for a number of cards
+def row_lengths_for(spec, num_cards, area_width, area_height):
+    rows = spec.get("rows")
+    if rows is not None:
+        if sum(rows) != num_cards:
+            raise ValueError(f"layout rows {rows} do not hold {num_cards} cards")
+        return tuple(rows)
+
+    # Near-square grid matching the aspect ratio of the area; the last row may be shorter
+    cols = max(1, math.ceil(math.sqrt(num_cards * area_width / area_height)))
+    full_rows, rest = divmod(num_cards, cols)
+    return (cols,) * full_rows + ((rest,) if rest else ())
+
+
+@lru_cache(maxsize=64)
+def _compute_layout(row_lengths, margin, area, max_card, width, height):
+    ax, ay, aw, ah = area[0] * width, area[1] * height, area[2] * width, area[3] * height
+    cols = max(row_lengths)
+    rows = len(row_lengths)
+
+    # Largest square card that fits both ways
+    card_size = min(max_card,
+                    (aw - (cols + 1) * margin) / cols,
+                    (ah - (rows + 1) * margin) / rows)
+    card_size = max(1, card_size)
+    pitch = card_size + margin
+
+    total_height = rows * pitch - margin
+    start_y = ay + (ah - total_height) / 2
+    positions = []
+    for row, count in enumerate(row_lengths):
+        # Center each row in the area
+        row_width = count * pitch - margin
+        start_x = ax + (aw - row_width) / 2
+        for col in range(count):
+            positions.append((start_x + col * pitch, start_y + row * pitch))
+    return Layout(row_lengths, card_size, tuple(positions), (ax, ay, aw, ah))
+
+
+# Layout of a board at full card size, for boards shown through a viewport:
+# a near-square grid whose area is the whole board
+def get_world_layout(pairs, card_size=DEFAULT_MAX_CARD, margin=DEFAULT_MARGIN):
+    num_cards = pairs * 2
+    cols = max(1, math.ceil(math.sqrt(num_cards)))
+    full_rows, rest = divmod(num_cards, cols)
+    rows = [cols] * full_rows + ([rest] if rest else [])
+    pitch = card_size + margin
+    spec = {"rows": rows, "margin": margin, "area": (0, 0, 1, 1), "max_card": card_size}
+    return get_layout(spec, pairs, cols * pitch + margin, len(rows) * pitch + margin)
+
+
+# Layout of a shape spec for `pairs` pairs in a width x height window
+def get_layout(spec, pairs, width, height):
+    spec = spec or {}
+    area = tuple(spec.get("area", DEFAULT_AREA))
+    row_lengths = row_lengths_for(spec, pairs * 2, area[2] * width, area[3] * height)
+    return _compute_layout(row_lengths, spec.get("margin", DEFAULT_MARGIN), area,
+                           spec.get("max_card", DEFAULT_MAX_CARD), width, height)
@@ -1,18 +1,54 @@
 import pygame
-import random
+import argparse
 import sys
 import time
 import math
 import os
+import random
+from collections import OrderedDict
 
-# Initialize pygame
-pygame.init()
+from game_engine import (
+    GameEngine, PLAYER_1, PLAYER_2,
+    DIFFICULTY_EASY, DIFFICULTY_ULTRA,
+    difficulty_names, difficulty_settings,
+    STATE_SHOW_ALL, STATE_PLAYING, STATE_GAME_OVER,
+    EVENT_FLIP, EVENT_HIDE, EVENT_MATCH, EVENT_STATE,
+    split_card_type,
+)
+from ai_player import ComputerPlayer
+from layout import get_layout, get_world_layout
+from assets import AssetManager, IconTiers, IMAGE_DIR, SET_CARD_BACK, SET_REGULAR, SET_HARD_MODE, scale_image
+from profiler import FrameProfiler
+from viewport import Viewport
+from net_client import NetworkClient, DISCONNECTED
+from net_protocol import DEFAULT_PORT, WELCOME, START, OPPONENT_LEFT, BUSY
+from replay import ReplayRecorder, ReplayPlayer, ReplayError, load_replay, REPLAY_EXTENSION
+from texture_renderer import TextureRenderer
+from animation import (
+    CardAnimation, FrameCache, FLIP, FLIP_TIME, FLIP_FRAMES, COLLECT, COLLECT_TIME, COLLECT_FRAMES,
+    ease, lerp, flip_frame_width, flip_shows_front, make_flip_frames,
+    collect_frame_scale, collect_frame_angle, make_collect_frames,
+)
 
-# Screen settings
+# Screen settings: the UI is laid out in logical coordinates on a
+# SCREEN_WIDTH x SCREEN_HEIGHT screen, which is scaled to fit the window
+# (keeping its aspect ratio; the space left over on two sides stays black)
 SCREEN_WIDTH = 800
 SCREEN_HEIGHT = 600
-screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-pygame.display.set_caption("Memory Card Game")
+FPS = 60
+screen = None  # Surface of the scaled screen (created by init_display)
+window_size = (SCREEN_WIDTH, SCREEN_HEIGHT)  # Window size in windowed mode
+fullscreen = False
+ui_scale = 1.0  # Pixels per logical unit
+ui_area = pygame.Rect(0, 0, SCREEN_WIDTH, SCREEN_HEIGHT)  # Part of the window the screen is shown in
+
+# Smallest scale of the UI (fonts and lines get too small below it)
+MIN_UI_SCALE = 0.25
+
+# SDL2 texture renderer (--renderer texture or software), or None when drawing
+# with Surfaces. With it, the game screen is drawn as textured quads and
+# `screen` is an off-screen Surface for the menu and the waiting screen.
+gpu = None
 
 # AWS corporate colors
 WHITE = (255, 255, 255)
@@ -34,11 +70,9 @@ PLAY_AREA_COLOR = (255, 255, 255)    # White for play area
 
 # Card settings - making them square
 CARD_SIZE = 80  # Square cards
-CARD_MARGIN = 15
 CARD_BACK_COLOR = AWS_BLUE
 
-# Card symbols (more types for different difficulty levels)
-CARD_TYPES = ["A", "B", "C", "D", "E", "F", "G", "H", "I", "J", "K", "L", "M"]
+# Card colors (more types for different difficulty levels)
 CARD_COLORS = [
     AWS_BLUE, AWS_ORANGE, AWS_TEAL, AWS_DARK_ORANGE, AWS_DARK_GRAY,
     AWS_LIGHT_BLUE, AWS_BLUE, AWS_ORANGE, AWS_TEAL, AWS_DARK_ORANGE,
@@ -46,107 +80,521 @@ CARD_COLORS = [
 ]
 
 # Player settings
-PLAYER_1 = 0
-PLAYER_2 = 1
 player_names = ["Player 1", "Player 2"]
 player_colors = [AWS_ORANGE, AWS_ORANGE]  # Both players use orange color
-player_scores = [0, 0]
-current_player = PLAYER_1
 
 # Game settings
-DIFFICULTY_EASY = 0
-DIFFICULTY_NORMAL = 1
-DIFFICULTY_HARD = 2
-DIFFICULTY_ULTRA = 3
-difficulty_names = ["Easy", "Normal", "Hard", "Ultra Hard"]
 current_difficulty = DIFFICULTY_EASY
 
-# Difficulty settings
-difficulty_settings = {
-    DIFFICULTY_EASY: {"rows": 2, "cols": 5, "pairs": 5, "time_limit": None, "display_time": 10000, "rotate": False, "custom_layout": False},
-    DIFFICULTY_NORMAL: {"rows": 3, "cols": 6, "pairs": 9, "time_limit": None, "display_time": 10000, "rotate": False, "custom_layout": False},
-    DIFFICULTY_HARD: {"rows": 5, "cols": 6, "pairs": 13, "time_limit": 15000, "display_time": 10000, "rotate": False, "custom_layout": True},
-    DIFFICULTY_ULTRA: {"rows": 5, "cols": 6, "pairs": 13, "time_limit": 15000, "display_time": 5000, "rotate": True, "custom_layout": True}
-}
-
-# Game states
+# Screen state: the menu, the networked mode's waiting screen, or the state
+# of the running game (from the engine)
 STATE_MENU = "menu"
-STATE_SHOW_ALL = "show_all"
-STATE_PLAYING = "playing"
-STATE_GAME_OVER = "game_over"
+STATE_WAITING = "waiting"
 game_state = STATE_MENU
 
-# Matched cards for each player
-player_matched_cards = [[], []]
-
-# Turn timer for hard mode
-turn_timer = 0
-turn_time_limit = 0
-
-# Load card images
-def load_card_images():
-    # Load card back image
-    card_back_path = './images/card_back.png'
-    card_back_img = pygame.image.load(card_back_path)
-    
-    # Get all PNG files from the images directory (excluding card_back.png)
-    image_dir = './images'
-    hard_mode_dir = './images/hard_mode'
-    
-    # Regular card images
-    card_images = []
-    for file in os.listdir(image_dir):
-        if file.lower().endswith('.png') and file != 'card_back.png' and not os.path.isdir(os.path.join(image_dir, file)):
-            img_path = os.path.join(image_dir, file)
-            img = pygame.image.load(img_path)
-            card_images.append((file.split('.')[0], img))  # Store name without extension and image
-    
-    # Hard mode card images
-    hard_mode_images = []
-    if os.path.exists(hard_mode_dir):
-        for file in os.listdir(hard_mode_dir):
-            if file.lower().endswith('.png') and not file.startswith('.'):
-                img_path = os.path.join(hard_mode_dir, file)
-                img = pygame.image.load(img_path)
-                hard_mode_images.append((file.split('.')[0], img))  # Store name without extension and image
+# Rules engine of the running game, and one Card view per board slot
+engine = None
+cards = []
+
+# Maps a screen position to a board slot (built by init_game); on large
+# boards it maps board (world) positions instead
+slot_index = None
+hover_slot = None  # Slot under the mouse pointer
+
+# Large board mode (--pairs): the board is laid out at full card size and
+# shown through a pannable, zoomable viewport. Only cards that intersect the
+# view are positioned and drawn.
+board_pairs = None     # Pair count of every game, or None for the difficulty's own
+viewport = None        # Viewport of the running game, or None on normal boards
+board_layout = None    # World layout of a large board
+cards_in_view = []     # Cards that intersect the view, in slot order
+viewport_moved = False # The view changed: repaint the whole viewport
+
+# Cards showing a success mark or running an animation, so the timers do not
+# loop over the whole board (a dict: insertion ordered, no duplicates)
+active_cards = {}
+
+# Screen rects covered by flying cards in the last frame drawn with Surfaces
+flight_rects = []
+
+# Computer opponent for Player 2 (None when Player 2 is human)
+ai_enabled = False
+computer = None
+
+# Networked mode (--connect): the server runs the game and the engine here
+# mirrors it; local_player is the seat the server gave this client
+network = None
+local_player = None
+network_status = "Waiting for an opponent..."  # Text of the waiting screen
+SERVER_FULL_TEXT = "The server is full, try again later"
+
+# Game recording (--record DIR): every local game is written to a replay log.
+# game_time is the engine time of the running game (the sum of its steps).
+record_dir = None
+recorder = None
+game_time = 0
+
+# Replay playback (--replay FILE): the player runs the recorded game and the
+# views show its engine; picks are ignored, the keys pause, seek and change speed
+replay_player = None
+replay_speed = 1.0
+replay_paused = False
+REPLAY_SPEEDS = (0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0)
+
+# Posted by the network thread to wake the idle wait when a message arrives
+NETWORK_EVENT = pygame.USEREVENT + 1
+
+# Frame profiler (enabled with --profile or F3; costs next to nothing while disabled)
+profiler = FrameProfiler()
+
+# Create the game window (renderer: "surface", "texture" or "software");
+# size is the window size, fullscreen fills the desktop instead
+def init_display(renderer="surface", size=None, full_screen=False):
+    global gpu, window_size, fullscreen
+    pygame.init()
+    window_size = tuple(size or (SCREEN_WIDTH, SCREEN_HEIGHT))
+    fullscreen = full_screen
+    gpu = None
+    if renderer != "surface":
+        try:
+            gpu = TextureRenderer(window_size, "Memory Card Game", software=renderer == "software")
+        except pygame.error as e:
+            print(f"Texture renderer unavailable ({e}), drawing with Surfaces")
+    if gpu is None:
+        pygame.display.set_caption("Memory Card Game")
+    set_display_mode()
+    return screen
+
+# Open the window at window_size, or fill the desktop in fullscreen mode
+def set_display_mode():
+    if gpu is not None:
+        gpu.set_fullscreen(fullscreen, window_size)
+    elif fullscreen:
+        pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
+    else:
+        pygame.display.set_mode(window_size, pygame.RESIZABLE)
+    resize_display()
+
+def toggle_fullscreen():
+    global fullscreen
+    fullscreen = not fullscreen
+    set_display_mode()
+
+# Fit the logical screen into the window after it was opened or resized.
+# Everything drawn at the old size is dropped, but the decoded images and
+# their size tiers are kept, so nothing is loaded again.
+def resize_display():
+    global screen, ui_scale, ui_area, window_size
+    size = gpu.window_size() if gpu is not None else pygame.display.get_surface().get_size()
+    if not fullscreen:
+        window_size = size
+    ui_scale = max(MIN_UI_SCALE, min(size[0] / SCREEN_WIDTH, size[1] / SCREEN_HEIGHT))
+    ui_area = pygame.Rect(0, 0, round(SCREEN_WIDTH * ui_scale), round(SCREEN_HEIGHT * ui_scale))
+    ui_area.center = (size[0] // 2, size[1] // 2)
+    if gpu is not None:
+        gpu.set_area(ui_area)
+        screen = pygame.Surface(ui_area.size)
+    else:
+        display = pygame.display.get_surface()
+        display.fill(BLACK)
+        ui_area = ui_area.clip(display.get_rect())
+        screen = display.subsurface(ui_area)
     
+    # Sized for the old window
+    invalidate_backgrounds()
+    card_surface_cache.clear()
+    animation_frames.clear()
+    thumbnail_cache.clear()
+    text_cache.clear()
+    if gpu is not None:
+        gpu.clear_textures()
+    if engine is not None:
+        place_cards()
+        for territory in territories:
+            territory.rebuild()
+    request_full_redraw()
+
+# Pixels of a logical length or coordinate
+def px(length):
+    return round(length * ui_scale)
+
+# Pixels of a logical line width (never 0, which would fill the shape)
+def px_width(width):
+    return max(1, px(width))
+
+# Screen rect of a logical rect (every card of a size gets the same pixel size)
+def to_screen(rect):
+    x, y, width, height = rect
+    scale = ui_scale
+    return pygame.Rect(round(x * scale), round(y * scale), round(width * scale), round(height * scale))
+
+# Logical position of a window position (mouse events)
+def to_logical(pos):
+    return ((pos[0] - ui_area.x) / ui_scale, (pos[1] - ui_area.y) / ui_scale)
+
+# Show the whole frame drawn onto `screen`
+def flip_display():
+    if gpu is not None:
+        gpu.present_surface(screen)
+    else:
+        pygame.display.flip()
+
+# Show the parts of `screen` that changed (the texture renderer shows all of it)
+def update_display(rects):
+    if gpu is not None:
+        gpu.present_surface(screen)
+    elif ui_area.topleft == (0, 0):
+        pygame.display.update(rects)
+    else:
+        x, y = ui_area.topleft
+        pygame.display.update([rect.move(x, y) for rect in rects])
+
+# Asset manager that decodes image sets in the background (created by load_assets)
+assets = None
+
+# Load every card image (blocking)
+def load_card_images(manager=None):
+    manager = manager or AssetManager(IMAGE_DIR)
+    card_back_img = manager.card_back()
+    card_images = manager.load_set(SET_REGULAR)
+    hard_mode_images = manager.load_set(SET_HARD_MODE)
     return card_back_img, card_images, hard_mode_images
 
-# Load images at the start
-CARD_BACK_IMG, CARD_IMAGES, HARD_MODE_IMAGES = load_card_images()
+# Card images, filled in when a game needs them
+CARD_BACK_IMG = None
+CARD_IMAGES = []
+HARD_MODE_IMAGES = []
+image_index = {}  # Card type -> image, for every image set loaded so far
+
+# Start decoding the card back and the regular icons in the background.
+# Hard mode icons are only decoded when Ultra Hard is played.
+def load_assets():
+    global assets
+    assets = AssetManager(IMAGE_DIR)
+    assets.request(SET_CARD_BACK)
+    assets.request(SET_REGULAR)
+
+# Make sure the images a difficulty needs are decoded (blocks until they are)
+def ensure_images(difficulty):
+    global CARD_BACK_IMG, CARD_IMAGES, HARD_MODE_IMAGES
+    CARD_BACK_IMG = assets.card_back()
+    if difficulty == DIFFICULTY_ULTRA:
+        HARD_MODE_IMAGES = assets.load_set(SET_HARD_MODE)
+        image_index.update(HARD_MODE_IMAGES)
+        return HARD_MODE_IMAGES
+    CARD_IMAGES = assets.load_set(SET_REGULAR)
+    image_index.update(CARD_IMAGES)
+    return CARD_IMAGES
+
+# Size tiers of the card images (kept when the window is resized)
+icon_tiers = IconTiers()
+
+# Maximum number of scaled/rotated surfaces kept in the card surface cache.
+# The largest board needs 13 types x 4 rotations + 1 card back, so this keeps
+# one full board plus headroom when switching difficulty.
+CARD_SURFACE_CACHE_SIZE = 64
+
+# Cache of card surfaces that are already scaled (and rotated) for drawing at
+# the current window size (cleared when the window is resized)
+class CardSurfaceCache:
+    CARD_BACK_KEY = "__card_back__"
+
+    def __init__(self, max_size=CARD_SURFACE_CACHE_SIZE):
+        self.max_size = max_size
+        self.surfaces = OrderedDict()  # (card_type, width, height, rotation) -> Surface
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, card_type, image, width, height, rotation=0):
+        key = (card_type, int(width), int(height), rotation)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            # Mark as most recently used
+            self.surfaces.move_to_end(key)
+            self.hits += 1
+            return surface
+
+        self.misses += 1
+        # Use a copy pre-scaled in the asset bundle when there is one
+        surface = None
+        if assets is not None and int(width) == int(height):
+            name = "card_back" if card_type == self.CARD_BACK_KEY else card_type
+            surface = assets.prescaled(name, int(width))
+        if surface is None:
+            # Scale the closest size tier rather than the full size image
+            source = icon_tiers.get(card_type, image, max(int(width), int(height)))
+            surface = scale_image(source, (int(width), int(height)))
+        if rotation != 0:
+            surface = pygame.transform.rotate(surface, rotation)
+        self.surfaces[key] = surface
+
+        # Evict least recently used surfaces
+        while len(self.surfaces) > self.max_size:
+            self.surfaces.popitem(last=False)
+        return surface
+
+    def card_back(self, width, height):
+        # One shared scaled card back for every face-down card
+        return self.get(self.CARD_BACK_KEY, CARD_BACK_IMG, width, height)
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+
+    def clear(self):
+        self.surfaces.clear()
+        self.reset_stats()
+
+card_surface_cache = CardSurfaceCache()
 
-# Card class
+# Flip and collect frames at the current window size (cleared when the window is resized)
+animation_frames = FrameCache()
+
+# A card's front as Card.draw shows it (white background, image, border and
+# variant badge) on its own surface, with the image turned by `rotation`
+def make_card_face(card, rotation):
+    surface = pygame.Surface((card.width, card.height))
+    rect = surface.get_rect()
+    surface.fill(WHITE)
+    image = card_surface_cache.get(card.icon, card.image, card.width, card.height, rotation)
+    surface.blit(image, image.get_rect(center=rect.center))
+    pygame.draw.rect(surface, BLACK, rect, px_width(2))
+    if card.variant > 1 and card.width >= BADGE_MIN_SIZE:
+        draw_variant_badge(surface, rect, card.variant)
+    return surface
+
+# The card back with its border
+def make_card_back_face(width, height):
+    surface = card_surface_cache.card_back(width, height).copy()
+    pygame.draw.rect(surface, BLACK, surface.get_rect(), px_width(2))
+    return surface
+
+# Frame of a card's flip: the back frames are shared by every card of the
+# size, the front frames belong to its image and rotation
+def flip_frame(card, index):
+    width, height = card.width, card.height
+    if not flip_shows_front(index, FLIP_FRAMES):
+        frames = animation_frames.get(("flip_back", width, height),
+                                      lambda: make_flip_frames(make_card_back_face(width, height), FLIP_FRAMES, False))
+        return frames[index]
+    frames = animation_frames.get(("flip_front", card.card_type, width, height, card.rotation),
+                                  lambda: make_flip_frames(make_card_face(card, card.rotation), FLIP_FRAMES, True))
+    return frames[index - FLIP_FRAMES // 2]
+
+# Frames of a matched card flying to its thumbnail
+def collect_frames(card):
+    size, _ = thumbnail_metrics()
+    return animation_frames.get(("collect", card.card_type, card.width, card.height, card.rotation, size),
+                                lambda: make_collect_frames(make_card_face(card, 0), card.rotation, size, COLLECT_FRAMES))
+
+# Maximum number of rendered text surfaces kept in the text cache
+TEXT_CACHE_SIZE = 128
+
+# Fonts loaded once per size, and rendered text surfaces cached by (string, size, color)
+class TextCache:
+    def __init__(self, max_size=TEXT_CACHE_SIZE):
+        self.max_size = max_size
+        self.fonts = {}  # size -> Font
+        self.surfaces = OrderedDict()  # (string, size, color) -> Surface
+        self.hits = 0
+        self.misses = 0
+
+    def font(self, size):
+        font = self.fonts.get(size)
+        if font is None:
+            font = pygame.font.SysFont(None, size)
+            self.fonts[size] = font
+        return font
+
+    def render(self, text, size, color):
+        key = (text, size, tuple(color))
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            # Mark as most recently used
+            self.surfaces.move_to_end(key)
+            self.hits += 1
+            return surface
+
+        self.misses += 1
+        surface = self.font(size).render(text, True, color)
+        self.surfaces[key] = surface
+
+        # Evict least recently used text
+        while len(self.surfaces) > self.max_size:
+            self.surfaces.popitem(last=False)
+        return surface
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+    
+    def clear(self):
+        self.surfaces.clear()
+        self.reset_stats()
+
+text_cache = TextCache()
+
+# Render text through the shared text cache (size is the logical font size)
+def render_text(text, size, color):
+    return text_cache.render(text, max(1, px(size)), color)
+
+# Cards smaller than this (pixels) are drawn as plain colored squares
+LOW_DETAIL_SIZE = 16
+
+# Smallest card size a large board can be zoomed out to (pixels). This caps
+# the number of cards in the view, so frame time does not grow with the board.
+MIN_CARD_PIXELS = 8
+
+# Smallest card that shows the copy number badge of a reused icon
+BADGE_MIN_SIZE = 24
+
+# Copy number text of a reused icon, and its badge and text rects in the
+# bottom right corner of a card or thumbnail
+def layout_variant_badge(rect, variant):
+    text = render_text(str(variant), 18, WHITE)
+    badge = text.get_rect(bottomright=(rect.right - px(2), rect.bottom - px(2))).inflate(px(4), px(2))
+    return text, badge, text.get_rect(center=badge.center)
+
+def draw_variant_badge(surface, rect, variant):
+    text, badge, text_rect = layout_variant_badge(rect, variant)
+    surface.fill(BLACK, badge)
+    surface.blit(text, text_rect)
+
+def draw_variant_badge_texture(rect, variant):
+    _, badge, text_rect = layout_variant_badge(rect, variant)
+    gpu.fill(BLACK, badge)
+    gpu.blit(text_texture(str(variant), 18, WHITE), text_rect)
+
+# Green circle with a check mark in the center of a matched card
+def draw_success_mark(surface, rect):
+    circle_radius = min(rect.width, rect.height) // 3
+    pygame.draw.circle(surface, SUCCESS_GREEN, rect.center, circle_radius, px_width(5))
+    
+    # Draw a checkmark inside the circle
+    check_size = circle_radius * 0.8
+    start_x = rect.centerx - check_size * 0.5
+    mid_x = rect.centerx - check_size * 0.1
+    end_x = rect.centerx + check_size * 0.5
+    start_y = rect.centery
+    mid_y = rect.centery + check_size * 0.5
+    end_y = rect.centery - check_size * 0.3
+    
+    pygame.draw.line(surface, SUCCESS_GREEN, (start_x, start_y), (mid_x, mid_y), px_width(5))
+    pygame.draw.line(surface, SUCCESS_GREEN, (mid_x, mid_y), (end_x, end_y), px_width(5))
+
+# Textures of the texture renderer, uploaded on first use
+def text_texture(text, size, color):
+    return gpu.texture(("text", text, size, tuple(color)), lambda: render_text(text, size, color))
+
+def card_back_texture(width, height):
+    return gpu.texture(("card_back", width, height), lambda: card_surface_cache.card_back(width, height))
+
+# Upright card front and card back with their borders, for the animations
+# of the texture renderer (it squashes and turns them while copying)
+def face_texture(card):
+    return gpu.texture(("face", card.card_type, card.width, card.height), lambda: make_card_face(card, 0))
+
+def back_face_texture(width, height):
+    return gpu.texture(("back_face", width, height), lambda: make_card_back_face(width, height))
+
+# Success mark on a transparent card-sized texture
+def success_mark_texture(width, height):
+    def make_surface():
+        surface = pygame.Surface((width, height), pygame.SRCALPHA)
+        draw_success_mark(surface, surface.get_rect())
+        return surface
+    return gpu.texture(("success_mark", width, height), make_surface)
+
+# Card class: drawing and pixel geometry for one board slot of the engine
 class Card:
-    def __init__(self, card_type, x, y, image):
+    __slots__ = ("slot", "card_type", "icon", "variant", "x", "y", "width", "height", "rect", "image",
+                 "rotation", "_show_success_mark", "success_mark_timer", "dirty", "animation")
+    
+    def __init__(self, slot, card_type, x, y, image):
+        self.slot = slot  # Index of this card in the engine's board
         self.card_type = card_type
+        self.icon, self.variant = split_card_type(card_type)  # Image name, copy number on large boards
         self.x = x
         self.y = y
         self.width = CARD_SIZE
         self.height = CARD_SIZE
-        self.is_flipped = False
-        self.is_matched = False
-        self.matched_by = None  # Which player matched this card
         self.rect = pygame.Rect(x, y, CARD_SIZE, CARD_SIZE)
         self.image = image  # Store the card's front image
         self.rotation = 0  # Rotation angle in degrees
-        self.show_success_mark = False  # Flag to show success mark
+        self._show_success_mark = False  # Flag to show success mark
         self.success_mark_timer = 0  # Timer for success mark display
+        self.dirty = True  # Card needs to be redrawn
+        self.animation = None  # Running flip or collect animation
+    
+    # Face up/matched state lives in the engine's board
+    @property
+    def is_flipped(self):
+        return engine.board.is_flipped(self.slot)
+    
+    @property
+    def is_matched(self):
+        return engine.board.is_matched(self.slot)
+    
+    @property
+    def matched_by(self):
+        return engine.board.matched_player(self.slot)
+    
+    # Changing the success mark marks the card dirty for the renderer
+    @property
+    def show_success_mark(self):
+        return self._show_success_mark
+    
+    @show_success_mark.setter
+    def show_success_mark(self, value):
+        if value != self._show_success_mark:
+            self._show_success_mark = value
+            self.dirty = True
+        
+    @property
+    def is_flipping(self):
+        return self.animation is not None and self.animation.kind == FLIP
+    
+    # Matched and on its way to the territory (drawn by draw_flight, not in its slot)
+    @property
+    def is_flying(self):
+        return self.animation is not None and self.animation.kind == COLLECT
+    
+    # Turn over to face up or face down; a card that is still turning the
+    # other way turns back from where it is
+    def start_flip(self, face_up):
+        previous = self.animation
+        self.animation = CardAnimation(FLIP, FLIP_TIME, reverse=not face_up)
+        if previous is not None and previous.kind == FLIP and previous.reverse == face_up:
+            self.animation.elapsed = previous.duration - previous.elapsed
+        self.dirty = True
+    
+    def stop_animation(self):
+        self.animation = None
+        self.show_success_mark = False
+        self.dirty = True
         
     def draw(self):
+        if self.is_flipping:
+            frame = flip_frame(self, self.animation.frame_index(FLIP_FRAMES))
+            screen.blit(frame, frame.get_rect(center=self.rect.center))
+            return
+        
         if self.is_matched and not self.show_success_mark:
             return
+        
+        if self.width < LOW_DETAIL_SIZE:
+            self.draw_low_detail()
+            return
             
         if self.is_flipped:
             # Front side - draw the card image
             # Create a white background
             pygame.draw.rect(screen, WHITE, self.rect)
             
-            # Scale the image to fit the card size
-            scaled_img = pygame.transform.scale(self.image, (self.width, self.height))
+            # Scaled (and rotated for Ultra Hard mode) image from the cache
+            scaled_img = card_surface_cache.get(self.icon, self.image, self.width, self.height, self.rotation)
             
-            # Apply rotation if needed (for Ultra Hard mode)
             if self.rotation != 0:
-                scaled_img = pygame.transform.rotate(scaled_img, self.rotation)
                 # Get the rect of the rotated image to center it
                 rot_rect = scaled_img.get_rect(center=self.rect.center)
                 screen.blit(scaled_img, rot_rect)
@@ -154,202 +602,324 @@ class Card:
                 screen.blit(scaled_img, self.rect)
             
             # Draw border
-            pygame.draw.rect(screen, BLACK, self.rect, 2)
+            pygame.draw.rect(screen, BLACK, self.rect, px_width(2))
+            
+            # Tell apart the copies of a reused icon
+            if self.variant > 1 and self.width >= BADGE_MIN_SIZE:
+                draw_variant_badge(screen, self.rect, self.variant)
             
             # Draw success mark if needed
             if self.show_success_mark:
-                # Draw a green circle (success mark)
-                circle_radius = min(self.width, self.height) // 3
-                pygame.draw.circle(screen, SUCCESS_GREEN, self.rect.center, circle_radius, 5)
-                
-                # Draw a checkmark inside the circle
-                check_size = circle_radius * 0.8
-                start_x = self.rect.centerx - check_size * 0.5
-                mid_x = self.rect.centerx - check_size * 0.1
-                end_x = self.rect.centerx + check_size * 0.5
-                start_y = self.rect.centery
-                mid_y = self.rect.centery + check_size * 0.5
-                end_y = self.rect.centery - check_size * 0.3
-                
-                pygame.draw.line(screen, SUCCESS_GREEN, (start_x, start_y), (mid_x, mid_y), 5)
-                pygame.draw.line(screen, SUCCESS_GREEN, (mid_x, mid_y), (end_x, end_y), 5)
+                draw_success_mark(screen, self.rect)
                 
         else:
             # Back side - use the card back image
-            scaled_back = pygame.transform.scale(CARD_BACK_IMG, (self.width, self.height))
+            scaled_back = card_surface_cache.card_back(self.width, self.height)
             screen.blit(scaled_back, self.rect)
-            pygame.draw.rect(screen, BLACK, self.rect, 2)
+            
+            # Highlight the card under the mouse pointer
+            if self.slot == hover_slot and game_state == STATE_PLAYING:
+                pygame.draw.rect(screen, AWS_ORANGE, self.rect, px_width(3))
+            else:
+                pygame.draw.rect(screen, BLACK, self.rect, px_width(2))
+    
+    # Same drawing with the texture renderer: textured quad copies instead of blits
+    def draw_texture(self):
+        if self.is_flipping:
+            self.draw_flip_texture()
+            return
+        
+        if self.is_matched and not self.show_success_mark:
+            return
+        
+        if self.width < LOW_DETAIL_SIZE:
+            gpu.fill(self.low_detail_color(), self.rect)
+            return
+        
+        if self.is_flipped:
+            gpu.fill(WHITE, self.rect)
+            # The renderer's angle turns clockwise, pygame.transform.rotate counterclockwise
+            gpu.blit(self.front_texture(), self.rect, (360 - self.rotation) % 360)
+            gpu.rect(BLACK, self.rect, px_width(2))
+            if self.variant > 1 and self.width >= BADGE_MIN_SIZE:
+                draw_variant_badge_texture(self.rect, self.variant)
+            if self.show_success_mark:
+                gpu.blit(success_mark_texture(self.width, self.height), self.rect)
+        else:
+            gpu.blit(card_back_texture(self.width, self.height), self.rect)
+            if self.slot == hover_slot and game_state == STATE_PLAYING:
+                gpu.rect(AWS_ORANGE, self.rect, px_width(3))
+            else:
+                gpu.rect(BLACK, self.rect, px_width(2))
+    
+    # The flip frame squashed by the renderer: one copy of the face texture
+    def draw_flip_texture(self):
+        index = self.animation.frame_index(FLIP_FRAMES)
+        width = flip_frame_width(index, FLIP_FRAMES, self.width)
+        if flip_shows_front(index, FLIP_FRAMES):
+            texture, rotation = face_texture(self), self.rotation
+        else:
+            texture, rotation = back_face_texture(self.width, self.height), 0
+        # Squashed across the screen: a quarter turn squashes the texture's height
+        size = (self.height, width) if rotation % 180 == 90 else (width, self.height)
+        rect = pygame.Rect((0, 0), size)
+        rect.center = self.rect.center
+        gpu.blit(texture, rect, (360 - rotation) % 360)
+    
+    # Unrotated front image at the card size, shared by every card of the icon
+    def front_texture(self):
+        return gpu.texture(("card", self.icon, self.width, self.height),
+                           lambda: card_surface_cache.get(self.icon, self.image, self.width, self.height))
+    
+    # Far zoomed out: a square in the pair's color when face up, the card back color when face down
+    def draw_low_detail(self):
+        screen.fill(self.low_detail_color(), self.rect)
+    
+    def low_detail_color(self):
+        if self.show_success_mark:
+            return SUCCESS_GREEN
+        if self.is_flipped:
+            return CARD_COLORS[engine.board.type_ids[self.slot] % len(CARD_COLORS)]
+        if self.slot == hover_slot and game_state == STATE_PLAYING:
+            return AWS_ORANGE
+        return CARD_BACK_COLOR
     
     def is_clicked(self, pos):
-        return self.rect.collidepoint(pos) and not self.is_flipped and not self.is_matched
+        return self.rect.collidepoint(pos) and engine.can_select(self.slot)
         
+    # Advance the animation and the success mark; when the mark is over, a
+    # card on the screen flies to its player's territory
     def update(self, dt):
+        if self.animation is not None:
+            self.animation.advance(dt)
+            if self.animation.kind == FLIP:
+                self.dirty = True  # Flying cards are drawn by draw_flight instead
+            if self.animation.done:
+                self.animation = None
+        
         # Update success mark timer if active
         if self.show_success_mark:
             self.success_mark_timer += dt
             if self.success_mark_timer >= 1000:  # 1 second
                 self.show_success_mark = False
+                if can_animate(self):
+                    self.animation = CardAnimation(COLLECT, COLLECT_TIME)
+    
+    # Still needs update() calls
+    @property
+    def is_active(self):
+        return self.show_success_mark or self.animation is not None
 
-# Initialize game with selected difficulty
-def init_game(difficulty):
-    global cards, selected_cards, current_player, player_scores, game_state, player_matched_cards, show_timer, turn_timer, turn_time_limit
+# Initialize game with selected difficulty (seed makes the board reproducible)
+# (a board received from the server is played as it is)
+def init_game(difficulty, seed=None, board=None):
+    global engine, cards, game_state, computer, slot_index, hover_slot, viewport, board_layout, recorder, game_time
     
-    # Set difficulty settings
-    rows = difficulty_settings[difficulty]["rows"]
-    cols = difficulty_settings[difficulty]["cols"]
-    pairs = difficulty_settings[difficulty]["pairs"]
-    turn_time_limit = difficulty_settings[difficulty]["time_limit"]
-    custom_layout = difficulty_settings[difficulty].get("custom_layout", False)
-    rotate_cards = difficulty_settings[difficulty].get("rotate", False)
+    # Card images for this difficulty (hard mode images for Ultra Hard)
+    available_images = ensure_images(difficulty)
+    images = dict(available_images)
+    card_types = [card_type for card_type, _ in available_images]
     
-    # Create cards based on difficulty
-    cards = []
+    # A game that was left unfinished keeps the records it has
+    stop_recording()
+    game_time = 0
     
-    # Select random card images for this game
-    if difficulty == DIFFICULTY_ULTRA:
-        # Use hard mode images for Ultra Hard difficulty
-        available_images = list(HARD_MODE_IMAGES)
+    # The engine picks and shuffles the cards (reusing icons when a large board has more pairs than icons);
+    # a replay plays the engine of its log, and recorded games need a known seed
+    if replay_player is not None:
+        engine = replay_player.engine
     else:
-        # Use regular images for other difficulties
-        available_images = list(CARD_IMAGES)
-    
-    random.shuffle(available_images)
-    selected_images = available_images[:pairs]
-    
-    # Create pairs of cards
-    card_pairs = []
-    for card_type, img in selected_images:
-        card_pairs.extend([(card_type, img), (card_type, img)])  # Add each card twice
-    
-    random.shuffle(card_pairs)  # Shuffle the pairs
-    
-    # Calculate play area dimensions
-    play_area_width = SCREEN_WIDTH * 0.6  # 60% of screen width
-    play_area_left = (SCREEN_WIDTH - play_area_width) / 2
+        if record_dir is not None and network is None and board is None:
+            if seed is None:
+                seed = random.getrandbits(64)
+            recorder = ReplayRecorder(new_replay_path(difficulty), difficulty, seed, card_types, board_pairs)
+        engine = GameEngine(difficulty, card_types, seed, board_pairs, board)
+    computer = ComputerPlayer(engine, PLAYER_2) if ai_enabled and network is None and replay_player is None else None
     
-    # Adjust card size based on grid
-    card_width = min(70, (play_area_width - (cols + 1) * CARD_MARGIN) / cols)
-    card_height = card_width  # Keep cards square
-    
-    positions = []
-    
-    if custom_layout and (difficulty == DIFFICULTY_HARD or difficulty == DIFFICULTY_ULTRA):
-        # Custom layout for Hard and Ultra Hard modes:
-        # Row 1: 4 cards
-        # Row 2: 6 cards
-        # Row 3: 6 cards
-        # Row 4: 6 cards
-        # Row 5: 4 cards
-        
-        # Calculate total height and width
-        total_height = 5 * (card_height + CARD_MARGIN) - CARD_MARGIN
-        max_width = 6 * (card_width + CARD_MARGIN) - CARD_MARGIN
-        
-        # Calculate starting positions
-        start_y = (SCREEN_HEIGHT - total_height) / 2
-        
-        # Row 1: 4 cards (centered)
-        row1_width = 4 * (card_width + CARD_MARGIN) - CARD_MARGIN
-        row1_start_x = play_area_left + (play_area_width - row1_width) / 2
-        for col in range(4):
-            x = row1_start_x + col * (card_width + CARD_MARGIN)
-            y = start_y
-            positions.append((x, y))
-        
-        # Row 2: 6 cards
-        row2_start_x = play_area_left + (play_area_width - max_width) / 2
-        for col in range(6):
-            x = row2_start_x + col * (card_width + CARD_MARGIN)
-            y = start_y + 1 * (card_height + CARD_MARGIN)
-            positions.append((x, y))
-        
-        # Row 3: 6 cards
-        row3_start_x = row2_start_x
-        for col in range(6):
-            x = row3_start_x + col * (card_width + CARD_MARGIN)
-            y = start_y + 2 * (card_height + CARD_MARGIN)
-            positions.append((x, y))
-        
-        # Row 4: 6 cards
-        row4_start_x = row2_start_x
-        for col in range(6):
-            x = row4_start_x + col * (card_width + CARD_MARGIN)
-            y = start_y + 3 * (card_height + CARD_MARGIN)
-            positions.append((x, y))
-        
-        # Row 5: 4 cards (centered)
-        row5_width = 4 * (card_width + CARD_MARGIN) - CARD_MARGIN
-        row5_start_x = play_area_left + (play_area_width - row5_width) / 2
-        for col in range(4):
-            x = row5_start_x + col * (card_width + CARD_MARGIN)
-            y = start_y + 4 * (card_height + CARD_MARGIN)
-            positions.append((x, y))
+    # Card positions and size for this board shape and window size (memoized);
+    # large boards are laid out at full card size and shown through a viewport
+    if board_pairs is not None or engine.pairs != difficulty_settings[difficulty]["pairs"]:
+        layout = get_world_layout(engine.pairs)
+        viewport = Viewport(get_viewport_rect(), (layout.area[2], layout.area[3]), MIN_CARD_PIXELS / layout.card_size)
     else:
-        # Standard grid layout
-        # Calculate starting position to center the cards in the play area
-        total_width = cols * (card_width + CARD_MARGIN) - CARD_MARGIN
-        total_height = rows * (card_height + CARD_MARGIN) - CARD_MARGIN
+        layout = get_layout(difficulty_settings[difficulty].get("layout"), engine.pairs, SCREEN_WIDTH, SCREEN_HEIGHT)
+        viewport = None
+    board_layout = layout
+    
+    # Create cards with positions and images
+    cards = []
+    for i, card_type in enumerate(engine.board.card_types()):
+        x, y = layout.positions[i]
+        card = Card(i, card_type, x, y, images[split_card_type(card_type)[0]])
         
-        start_x = play_area_left + (play_area_width - total_width) / 2
-        start_y = (SCREEN_HEIGHT - total_height) / 2
+        # Rotation chosen by the engine for Ultra Hard mode
+        card.rotation = engine.board.rotations[i]
         
-        for row in range(rows):
-            for col in range(cols):
-                x = start_x + col * (card_width + CARD_MARGIN)
-                y = start_y + row * (card_height + CARD_MARGIN)
-                positions.append((x, y))
+        cards.append(card)
     
-    # Create cards with positions and images
-    for i, (card_type, img) in enumerate(card_pairs):
-        if i < len(positions):  # Make sure we don't exceed available positions
-            x, y = positions[i]
-            card = Card(card_type, x, y, img)
-            card.width = card_width
-            card.height = card_height
-            card.rect = pygame.Rect(x, y, card_width, card_height)
-            
-            # Apply random rotation for Ultra Hard mode
-            if rotate_cards:
-                # Random rotation: 0, 90, 180, or 270 degrees
-                card.rotation = random.choice([0, 90, 180, 270])
-            
-            cards.append(card)
+    # Index for clicks and hover highlighting, shared with the layout (in logical coordinates)
+    slot_index = layout.slot_index
+    hover_slot = None
+    active_cards.clear()
+    flight_rects.clear()
+    place_cards()
     
-    selected_cards = []
-    current_player = PLAYER_1
-    player_scores = [0, 0]
-    player_matched_cards = [[], []]
-    game_state = STATE_SHOW_ALL  # Initially show all cards
-    show_timer = 0  # Reset timer for each new game
-    turn_timer = 0  # Reset turn timer
+    for territory in territories:
+        territory.reset()
     
-    # Initially flip all cards face up
-    for card in cards:
-        card.is_flipped = True
+    game_state = engine.state  # Initially show all cards
+    request_full_redraw()
 
-# Draw main menu
-def draw_menu():
-    screen.fill(WHITE)
-    
-    # Title
-    font = pygame.font.SysFont(None, 72)
-    title = font.render("Memory Card Game", True, AWS_BLUE)
-    screen.blit(title, (SCREEN_WIDTH // 2 - title.get_width() // 2, 80))
-    
-    # Subtitle
-    font = pygame.font.SysFont(None, 36)
-    subtitle = font.render("Select Difficulty", True, BLACK)
-    screen.blit(subtitle, (SCREEN_WIDTH // 2 - subtitle.get_width() // 2, 160))
+# Screen rects of the cards for the current window size (on large boards,
+# of the cards in the view)
+def place_cards():
+    if viewport is not None:
+        update_viewport()
+        return
+    for card in cards:
+        card.rect = to_screen(board_layout.rects[card.slot])
+        card.width = card.rect.width
+        card.height = card.rect.height
     
-    # Difficulty buttons
+    # Fill the surface cache (or upload the textures) once so steady-state frames
+    # do no transforms (on large boards the card size depends on the zoom, so
+    # cards fill it as they are drawn)
+    if not cards:
+        return
+    width, height = cards[0].width, cards[0].height
+    if gpu is not None:
+        card_back_texture(width, height)
+        for card in cards:
+            card.front_texture()
+    else:
+        card_surface_cache.card_back(width, height)
+        for card in cards:
+            card_surface_cache.get(card.icon, card.image, card.width, card.height, card.rotation)
+
+# File name of a new recording: replay_<date>-<time>_<difficulty>.mcr in the record directory
+def new_replay_path(difficulty):
+    os.makedirs(record_dir, exist_ok=True)
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    name = difficulty_names[difficulty].replace(" ", "")
+    path = os.path.join(record_dir, f"replay_{stamp}_{name}{REPLAY_EXTENSION}")
+    count = 2
+    while os.path.exists(path):
+        path = os.path.join(record_dir, f"replay_{stamp}_{name}_{count}{REPLAY_EXTENSION}")
+        count += 1
+    return path
+
+# Close the log of the running game (left unfinished if it is not over)
+def stop_recording():
+    global recorder
+    if recorder is not None:
+        recorder.close()
+        recorder = None
+
+# Open a replay log for playback; exits with a message if it cannot be played
+def start_replay(path):
+    global replay_player, current_difficulty, board_pairs
+    try:
+        log = load_replay(path)
+        replay_player = ReplayPlayer(log)
+    except (OSError, ReplayError) as e:
+        sys.exit(f"cannot play {path}: {e}")
+    images = dict(ensure_images(log.difficulty))
+    missing = {split_card_type(card_type)[0] for card_type in log.card_types} - set(images)
+    if missing:
+        sys.exit(f"cannot play {path}: no images for {', '.join(sorted(missing))}")
+    current_difficulty = log.difficulty
+    board_pairs = log.pairs
+    init_game(current_difficulty)
+
+# After a seek the player has a new engine: rebuild the views from it
+def replay_seek(turn):
+    global engine, game_state
+    replay_player.seek(turn)
+    engine = replay_player.engine
+    for card in active_cards:
+        card.stop_animation()
+    active_cards.clear()
+    for territory in territories:
+        territory.reset()
+    game_state = engine.state
+    request_full_redraw()
+
+# Playback keys: Space pauses, Page Up/Down seek a turn back/forward, [ and ] change the speed
+def handle_replay_key(key):
+    global replay_paused, replay_speed
+    if key == pygame.K_SPACE:
+        replay_paused = not replay_paused
+    elif key == pygame.K_PAGEDOWN:
+        # Start of the next turn (the one after it when the playback is right at a turn start)
+        turn = replay_player.current_turn()
+        if turn < replay_player.turn_count and replay_player.turn_starts[turn] == replay_player.index:
+            turn += 1
+        replay_seek(turn)
+    elif key == pygame.K_PAGEUP:
+        # Start of the turn being played (the previous one when it has not
+        # started yet); before the first turn, the start of the replay
+        replay_seek(replay_player.current_turn() - 1)
+    elif key in (pygame.K_LEFTBRACKET, pygame.K_RIGHTBRACKET):
+        step = 1 if key == pygame.K_RIGHTBRACKET else -1
+        index = REPLAY_SPEEDS.index(replay_speed) + step
+        replay_speed = REPLAY_SPEEDS[min(max(index, 0), len(REPLAY_SPEEDS) - 1)]
+
+# Screen area of the viewport on large boards: the play area between the HUD lines
+def get_viewport_rect():
+    play_area_width, play_area_left, _ = get_play_area_metrics()
+    return pygame.Rect(play_area_left, 115, play_area_width, SCREEN_HEIGHT - 175)
+
+# Position the cards inside the view after the viewport changed
+def update_viewport():
+    global cards_in_view, viewport_moved
+    cards_in_view = [cards[slot] for slot in slot_index.slots_in(viewport.visible_world_rect())]
+    size = board_layout.card_size
+    for card in cards_in_view:
+        x, y = board_layout.positions[card.slot]
+        card.rect = pygame.Rect(viewport.to_screen((x, y, size, size), ui_scale))
+        card.width = card.rect.width
+        card.height = card.rect.height
+    viewport_moved = True
+
+# Cards that can be on the screen: every card, or on large boards the cards in the view
+def visible_cards():
+    if viewport is None:
+        return cards
+    return cards_in_view
+
+# Whether a card is animated: only cards drawn with their image in the view
+# (cards elsewhere on a large board just change)
+def can_animate(card):
+    if card.width < LOW_DETAIL_SIZE:
+        return False
+    if viewport is None:
+        return True
+    x, y, width, height = viewport.visible_world_rect()
+    left, top, card_width, card_height = board_layout.rects[card.slot]
+    return left < x + width and x < left + card_width and top < y + height and y < top + card_height
+
+# After a pan or zoom: reposition the cards and move the hover highlight
+def viewport_changed(changed=True):
+    if changed:
+        update_viewport()
+        set_hover_slot(slot_at(pygame.mouse.get_pos()))
+
+# Cached static backgrounds, keyed by (kind, screen size, difficulty)
+background_cache = {}
+
+# Drop every cached background (e.g. after the window was resized)
+def invalidate_backgrounds():
+    background_cache.clear()
+
+# Difficulty button rects on the menu screen
+def get_menu_button_rects():
     button_width = 200
     button_height = 60
     button_margin = 30
     button_y = 250
     
     difficulty_rects = []
-    
-    for i, name in enumerate(difficulty_names):
+    for i in range(len(difficulty_names)):
         button_rect = pygame.Rect(
             SCREEN_WIDTH // 2 - button_width // 2,
             button_y + i * (button_height + button_margin),
@@ -357,375 +927,1154 @@ def draw_menu():
             button_height
         )
         difficulty_rects.append(button_rect)
-        
-        # Draw button
-        pygame.draw.rect(screen, AWS_LIGHT_GRAY, button_rect)
-        pygame.draw.rect(screen, BLACK, button_rect, 2)
-        
-        # Draw text
-        font = pygame.font.SysFont(None, 36)
-        text = font.render(name, True, BLACK)
-        screen.blit(text, (button_rect.centerx - text.get_width() // 2, 
-                          button_rect.centery - text.get_height() // 2))
+    return difficulty_rects
+
+# Button with a centered label (rect in logical coordinates)
+def draw_button(surface, rect, label, font_size):
+    rect = to_screen(rect)
+    text = render_text(label, font_size, BLACK)
+    pygame.draw.rect(surface, AWS_LIGHT_GRAY, rect)
+    pygame.draw.rect(surface, BLACK, rect, px_width(2))
+    surface.blit(text, (rect.centerx - text.get_width() // 2, 
+                        rect.centery - text.get_height() // 2))
+
+# Blit text horizontally centered on the screen at logical height y
+def blit_centered(surface, text, y):
+    return surface.blit(text, (px(SCREEN_WIDTH // 2) - text.get_width() // 2, px(y)))
+
+# Paint the static parts of the menu onto a surface
+def paint_menu_background(surface):
+    surface.fill(WHITE)
+    
+    # Title
+    blit_centered(surface, render_text("Memory Card Game", 72, AWS_BLUE), 80)
+    
+    # Subtitle
+    blit_centered(surface, render_text("Select Difficulty", 36, BLACK), 160)
+    
+    # Difficulty buttons
+    for button_rect, name in zip(get_menu_button_rects(), difficulty_names):
+        draw_button(surface, button_rect, name, 36)
     
     # Quit button
-    quit_font = pygame.font.SysFont(None, 24)
-    quit_text = quit_font.render("Quit", True, BLACK)
-    quit_rect = pygame.Rect(SCREEN_WIDTH - 70, 10, 60, 30)
-    pygame.draw.rect(screen, AWS_LIGHT_GRAY, quit_rect)
-    pygame.draw.rect(screen, BLACK, quit_rect, 2)
-    screen.blit(quit_text, (quit_rect.centerx - quit_text.get_width() // 2, 
-                           quit_rect.centery - quit_text.get_height() // 2))
-    
-    pygame.display.flip()
-    return difficulty_rects
+    draw_button(surface, pygame.Rect(SCREEN_WIDTH - 70, 10, 60, 30), "Quit", 24)
 
-# Draw game state
-def draw_game():
-    screen.fill(WHITE)
+# Static background for the menu (kind "menu") or the game screen (kind "game")
+def get_background(kind):
+    size = screen.get_size()
+    difficulty = current_difficulty if kind == "game" else None
+    key = (kind, size, difficulty)
+    background = background_cache.get(key)
+    if background is None:
+        # Keep only the background for the current difficulty
+        for old_key in [k for k in background_cache if k[0] == kind]:
+            del background_cache[old_key]
+        
+        background = pygame.Surface(size).convert(screen)
+        if kind == "menu":
+            paint_menu_background(background)
+        else:
+            paint_game_background(background)
+        background_cache[key] = background
+    return background
+
+# Button that switches Player 2 between human and computer
+def get_ai_toggle_rect():
+    return pygame.Rect(10, 10, 220, 30)
+
+# Enable or disable the computer opponent for Player 2
+def set_ai_enabled(enabled):
+    global ai_enabled
+    ai_enabled = enabled
+    player_names[PLAYER_2] = "Computer" if enabled else "Player 2"
+
+# Draw main menu
+def draw_menu():
+    screen.blit(get_background("menu"), (0, 0))
+    
+    # Player 2 toggle (not part of the static background)
+    draw_button(screen, get_ai_toggle_rect(), f"Player 2: {'Computer' if ai_enabled else 'Human'}", 24)
     
-    # Calculate play area dimensions
+    with profiler.phase("display.flip"):
+        flip_display()
+    return get_menu_button_rects()
+
+# Dirty-region rendering state for the game screen
+dirty_rects = []           # Screen areas changed this frame
+full_redraw_needed = True  # Repaint and flip the whole screen on the next frame
+last_drawn_state = None    # Game state of the last drawn frame
+hud_values = {}            # HUD label name -> value drawn last
+hud_rects = {}             # HUD label name -> screen rect drawn last
+
+# Force the next draw_game call to repaint the whole screen
+def request_full_redraw():
+    global full_redraw_needed
+    full_redraw_needed = True
+
+# Queue a screen area for the next display update
+def mark_dirty(rect):
+    dirty_rects.append(pygame.Rect(rect))
+
+# Compute play area and territory widths
+def get_play_area_metrics():
     play_area_width = SCREEN_WIDTH * 0.6  # 60% of screen width
     play_area_left = (SCREEN_WIDTH - play_area_width) / 2
     territory_width = (SCREEN_WIDTH - play_area_width) / 2  # Each territory gets half of remaining space
+    return play_area_width, play_area_left, territory_width
+
+# Paint everything that stays the same for a whole game onto a surface
+def paint_game_background(surface):
+    surface.fill(WHITE)
+    
+    play_area_width, play_area_left, territory_width = get_play_area_metrics()
     
     # Draw player territories
-    p1_territory = pygame.Rect(0, 0, territory_width, SCREEN_HEIGHT)
-    p2_territory = pygame.Rect(SCREEN_WIDTH - territory_width, 0, territory_width, SCREEN_HEIGHT)
-    pygame.draw.rect(screen, PLAYER1_TERRITORY, p1_territory)
-    pygame.draw.rect(screen, PLAYER2_TERRITORY, p2_territory)
+    p1_territory = to_screen((0, 0, territory_width, SCREEN_HEIGHT))
+    p2_territory = to_screen((SCREEN_WIDTH - territory_width, 0, territory_width, SCREEN_HEIGHT))
+    pygame.draw.rect(surface, PLAYER1_TERRITORY, p1_territory)
+    pygame.draw.rect(surface, PLAYER2_TERRITORY, p2_territory)
     
     # Draw play area
-    play_area = pygame.Rect(territory_width, 0, play_area_width, SCREEN_HEIGHT)
-    pygame.draw.rect(screen, PLAY_AREA_COLOR, play_area)
+    play_area = to_screen((territory_width, 0, play_area_width, SCREEN_HEIGHT))
+    pygame.draw.rect(surface, PLAY_AREA_COLOR, play_area)
     
     # Title
-    font = pygame.font.SysFont(None, 36)
-    title = font.render(f"Memory Card Game - {difficulty_names[current_difficulty]}", True, BLACK)
-    screen.blit(title, (SCREEN_WIDTH // 2 - title.get_width() // 2, 10))
+    blit_centered(surface, render_text(f"Memory Card Game - {difficulty_names[current_difficulty]}", 36, BLACK), 10)
     
-    # Quit button
-    quit_font = pygame.font.SysFont(None, 24)
-    quit_text = quit_font.render("Quit", True, BLACK)
-    quit_rect = pygame.Rect(SCREEN_WIDTH - 70, 10, 60, 30)
-    pygame.draw.rect(screen, AWS_LIGHT_GRAY, quit_rect)
-    pygame.draw.rect(screen, BLACK, quit_rect, 2)
-    screen.blit(quit_text, (quit_rect.centerx - quit_text.get_width() // 2, 
-                           quit_rect.centery - quit_text.get_height() // 2))
-    
-    # Menu button
-    menu_font = pygame.font.SysFont(None, 24)
-    menu_text = menu_font.render("Menu", True, BLACK)
-    menu_rect = pygame.Rect(SCREEN_WIDTH - 140, 10, 60, 30)
-    pygame.draw.rect(screen, AWS_LIGHT_GRAY, menu_rect)
-    pygame.draw.rect(screen, BLACK, menu_rect, 2)
-    screen.blit(menu_text, (menu_rect.centerx - menu_text.get_width() // 2, 
-                           menu_rect.centery - menu_text.get_height() // 2))
-    
-    # Player information
-    for i, name in enumerate(player_names):
-        font = pygame.font.SysFont(None, 36)
+    # Quit and menu buttons
+    draw_button(surface, pygame.Rect(SCREEN_WIDTH - 70, 10, 60, 30), "Quit", 24)
+    draw_button(surface, pygame.Rect(SCREEN_WIDTH - 140, 10, 60, 30), "Menu", 24)
+
+# Draw the static game background with a single blit
+def draw_background():
+    screen.blit(get_background("game"), (0, 0))
+
+# Repaint the background inside a rect, erasing whatever was drawn there
+def restore_background(rect):
+    rect = pygame.Rect(rect)
+    screen.blit(get_background("game"), rect, rect)
+
+# Player name, underlined when it is that player's turn
+def draw_player_name(player):
+    text = render_text(player_names[player], 36, player_colors[player])
+    x_pos = px(20) if player == PLAYER_1 else px(SCREEN_WIDTH - 20) - text.get_width()
+    rect = screen.blit(text, (x_pos, px(60)))
+    
+    # Underline current player
+    if player == engine.current_player:
+        line_y = px(60) + text.get_height() + px(2)
+        line_width = text.get_width()
+        line_rect = pygame.draw.line(screen, player_colors[player], 
+                                     (x_pos, line_y), 
+                                     (x_pos + line_width, line_y), 
+                                     px_width(3))
+        rect = rect.union(line_rect)
+    return rect
+
+# Player score
+def draw_player_score(player):
+    score_text = render_text(f"Score: {engine.scores[player]}", 36, BLACK)
+    x_pos = px(20) if player == PLAYER_1 else px(SCREEN_WIDTH - 20) - score_text.get_width()
+    return screen.blit(score_text, (x_pos, px(100)))
+
+# Seconds left in the current turn, or None when there is no turn timer
+def get_turn_time_left():
+    return engine.turn_time_left()
+
+# Draw turn timer for hard mode
+def draw_turn_timer():
+    time_left = get_turn_time_left()
+    if time_left is None:
+        return None
+    return blit_centered(screen, render_text(f"Time: {time_left}s", 36, BLACK), 50)
+
+# Draw Ultra Hard mode indicator
+def draw_ultra_banner():
+    if current_difficulty == DIFFICULTY_ULTRA and (game_state == STATE_PLAYING or game_state == STATE_SHOW_ALL):
+        return blit_centered(screen, render_text("Ultra Hard Mode - Cards are rotated!", 30, RED), 80)
+    return None
+
+# Instruction text
+def draw_instruction():
+    if replay_player is not None:
+        text = render_text(get_replay_status(), 30, BLACK)
+    elif game_state == STATE_SHOW_ALL:
+        text = render_text("Memorize the cards...", 36, BLACK)
+    elif game_state == STATE_PLAYING:
+        # Change text color to black
+        text = render_text(f"{player_names[engine.current_player]}'s Turn", 36, BLACK)
+    else:
+        return None
+    return blit_centered(screen, text, SCREEN_HEIGHT - 50)
+
+# Redraw a HUD label when its value changed since it was last drawn
+def update_hud_label(name, value, draw_func, force=False):
+    if not force and name in hud_values and hud_values[name] == value:
+        return
+    
+    # Erase the previous text before drawing the new one
+    old_rect = hud_rects.get(name)
+    if old_rect is not None and not force:
+        restore_background(old_rect)
+        mark_dirty(old_rect)
+    
+    new_rect = draw_func()
+    hud_values[name] = value
+    hud_rects[name] = new_rect
+    if new_rect is not None and not force:
+        mark_dirty(new_rect)
+
+# Draw every HUD label that changed (or all of them when forced)
+def draw_hud(force=False):
+    for i in range(len(player_names)):
+        update_hud_label(("name", i), i == engine.current_player, lambda i=i: draw_player_name(i), force)
+        update_hud_label(("score", i), engine.scores[i], lambda i=i: draw_player_score(i), force)
+    update_hud_label("timer", get_turn_time_left(), draw_turn_timer, force)
+    update_hud_label("ultra", game_state, draw_ultra_banner, force)
+    update_hud_label("instruction", (game_state, engine.current_player, get_replay_status()), draw_instruction, force)
+
+# Draw the HUD labels overlapping a rect again, erasing them first
+def redraw_hud_labels(rect):
+    for name, label_rect in hud_rects.items():
+        if label_rect is not None and label_rect.colliderect(rect):
+            hud_values.pop(name, None)
+    draw_hud()
+
+# Every HUD label with the texture renderer, at the same places as above
+def draw_hud_texture():
+    for player in range(len(player_names)):
+        name = text_texture(player_names[player], 36, player_colors[player])
+        x_pos = px(20) if player == PLAYER_1 else px(SCREEN_WIDTH - 20) - name.width
+        gpu.blit_at(name, (x_pos, px(60)))
+        if player == engine.current_player:
+            line_y = px(60) + name.height + px(2)
+            gpu.line(player_colors[player], (x_pos, line_y), (x_pos + name.width, line_y), px_width(3))
+        
+        score = text_texture(f"Score: {engine.scores[player]}", 36, BLACK)
+        x_pos = px(20) if player == PLAYER_1 else px(SCREEN_WIDTH - 20) - score.width
+        gpu.blit_at(score, (x_pos, px(100)))
+    
+    time_left = get_turn_time_left()
+    if time_left is not None:
+        blit_centered_texture(text_texture(f"Time: {time_left}s", 36, BLACK), 50)
+    
+    if current_difficulty == DIFFICULTY_ULTRA and (game_state == STATE_PLAYING or game_state == STATE_SHOW_ALL):
+        blit_centered_texture(text_texture("Ultra Hard Mode - Cards are rotated!", 30, RED), 80)
+    
+    if replay_player is not None:
+        instruction = text_texture(get_replay_status(), 30, BLACK)
+    elif game_state == STATE_SHOW_ALL:
+        instruction = text_texture("Memorize the cards...", 36, BLACK)
+    elif game_state == STATE_PLAYING:
+        instruction = text_texture(f"{player_names[engine.current_player]}'s Turn", 36, BLACK)
+    else:
+        return
+    blit_centered_texture(instruction, SCREEN_HEIGHT - 50)
+
+# Copy a texture horizontally centered on the screen at logical height y
+def blit_centered_texture(texture, y):
+    gpu.blit_at(texture, (px(SCREEN_WIDTH // 2) - texture.width // 2, px(y)))
+
+# Replay position shown instead of the instruction text, or None when not replaying
+def get_replay_status():
+    if replay_player is None:
+        return None
+    status = f"Replay: turn {replay_player.current_turn()}/{replay_player.turn_count}, {replay_speed:g}x"
+    return status + " (paused)" if replay_paused else status
+
+# Matched card thumbnails in the player territories
+THUMBNAIL_SIZE = int(CARD_SIZE * 0.4)  # 40% of the card size
+THUMBNAIL_SPACING = 10
+TERRITORY_COLUMNS = 2
+TERRITORY_TOP = 150
+TERRITORY_MARGIN = 20
+
+# Scaled thumbnails by card type (at the current screen size)
+thumbnail_cache = {}
+
+# Thumbnail size and the distance between thumbnails, in screen pixels
+def thumbnail_metrics():
+    size = px(THUMBNAIL_SIZE)
+    return size, size + px(THUMBNAIL_SPACING)
+
+# Thumbnail of a card type for the territories, or None if its image is unknown
+def get_thumbnail(card_type):
+    thumbnail = thumbnail_cache.get(card_type)
+    if thumbnail is None:
+        image = image_index.get(card_type)
+        if image is None:
+            return None
+        size, _ = thumbnail_metrics()
+        thumbnail = assets.prescaled(card_type, size) if assets is not None else None
+        if thumbnail is None:
+            thumbnail = scale_image(icon_tiers.get(card_type, image, size), (size, size))
+        thumbnail_cache[card_type] = thumbnail
+    return thumbnail
+
+# A player's territory: the won cards are drawn once onto an off-screen
+# surface, which is shown with a single blit. The surface grows by doubling
+# its rows, and the view scrolls once it is taller than the screen. The
+# surface and the scroll position are in screen pixels.
+class Territory:
+    def __init__(self, player):
+        self.player = player
+        self.color = PLAYER1_TERRITORY if player == PLAYER_1 else PLAYER2_TERRITORY
+        self.surface = None
+        self.reset()
+    
+    # Forget the cards of the previous game
+    def reset(self):
+        self.count = 0  # Cards drawn onto the surface
+        self.scroll = 0  # First visible pixel row of the surface
+        self.dirty = True
+        if self.surface is not None:
+            self.surface.fill(self.color)
+    
+    # Drop the surface drawn at the old screen size; the next sync draws
+    # the won cards again at the new size
+    def rebuild(self):
+        self.surface = None
+        self.reset()
+    
+    # Logical area the territory is shown in
+    def view_rect(self):
+        _, _, territory_width = get_play_area_metrics()
+        x = TERRITORY_MARGIN if self.player == PLAYER_1 else SCREEN_WIDTH - territory_width + TERRITORY_MARGIN
+        width = TERRITORY_COLUMNS * (THUMBNAIL_SIZE + THUMBNAIL_SPACING) - THUMBNAIL_SPACING
+        return pygame.Rect(x, TERRITORY_TOP, width, SCREEN_HEIGHT - TERRITORY_TOP - TERRITORY_MARGIN)
+    
+    # Screen area the territory is shown in
+    def screen_rect(self):
+        return to_screen(self.view_rect())
+    
+    def content_height(self):
+        _, pitch = thumbnail_metrics()
+        rows = (self.count + TERRITORY_COLUMNS - 1) // TERRITORY_COLUMNS
+        return max(0, rows * pitch - (pitch - px(THUMBNAIL_SIZE)))
+    
+    # Make room for `rows` rows, doubling the surface height when it is full
+    def reserve(self, rows):
+        _, pitch = thumbnail_metrics()
+        height = rows * pitch
+        if self.surface is not None and self.surface.get_height() >= height:
+            return
+        capacity = self.surface.get_height() if self.surface is not None else 8 * pitch
+        while capacity < height:
+            capacity *= 2
+        surface = pygame.Surface((self.screen_rect().width, capacity)).convert(screen)
+        surface.fill(self.color)
+        if self.surface is not None:
+            surface.blit(self.surface, (0, 0))
+        self.surface = surface
+    
+    # Draw one more won card onto the surface
+    def append(self, card_type):
+        idx = self.count
+        col = idx % TERRITORY_COLUMNS
+        row = idx // TERRITORY_COLUMNS
+        if gpu is None:
+            self.reserve(row + 1)
         
-        # Player name
-        text = font.render(name, True, player_colors[i])
-        x_pos = 20 if i == PLAYER_1 else SCREEN_WIDTH - 20 - text.get_width()
-        screen.blit(text, (x_pos, 60))
+        # The texture renderer draws the thumbnails every frame instead
+        if gpu is None:
+            size, pitch = thumbnail_metrics()
+            card_rect = pygame.Rect(col * pitch, row * pitch, size, size)
+            pygame.draw.rect(self.surface, WHITE, card_rect)
+            pygame.draw.rect(self.surface, BLACK, card_rect, px_width(2))
+            icon, variant = split_card_type(card_type)
+            thumbnail = get_thumbnail(icon)
+            if thumbnail is not None:
+                self.surface.blit(thumbnail, card_rect)
+            if variant > 1:
+                draw_variant_badge(self.surface, card_rect, variant)
+        self.count += 1
+        self.dirty = True
         
-        # Underline current player
-        if i == current_player:
-            line_y = 60 + text.get_height() + 2
-            line_width = text.get_width()
-            pygame.draw.line(screen, player_colors[i], 
-                            (x_pos, line_y), 
-                            (x_pos + line_width, line_y), 
-                            3)
+        # Keep the newest card in view
+        overflow = self.content_height() - self.screen_rect().height
+        if overflow > self.scroll:
+            self.scroll = overflow
+    
+    # Catch up with the first `count` of the player's won cards; True if anything was added
+    def sync(self, matched_cards, count):
+        added = self.count < count
+        while self.count < count:
+            self.append(matched_cards[self.count])
+        return added
+    
+    # Screen rect of the index-th thumbnail (kept inside the view when it is scrolled out)
+    def slot_rect(self, index):
+        view = self.screen_rect()
+        size, pitch = thumbnail_metrics()
+        row, col = divmod(index, TERRITORY_COLUMNS)
+        y = min(max(view.y + row * pitch - self.scroll, view.y), view.bottom - size)
+        return pygame.Rect(view.x + col * pitch, y, size, size)
+    
+    def scroll_by(self, dy):
+        max_scroll = max(0, self.content_height() - self.screen_rect().height)
+        scroll = min(max(self.scroll + dy, 0), max_scroll)
+        if scroll != self.scroll:
+            self.scroll = scroll
+            self.dirty = True
+    
+    # Blit the visible part of the territory; returns the screen area it covers
+    def draw(self):
+        view = self.screen_rect()
+        self.dirty = False
+        if self.surface is None:
+            return view
+        height = min(view.height, self.surface.get_height() - self.scroll)
+        screen.blit(self.surface, view.topleft, pygame.Rect(0, self.scroll, view.width, height))
+        return view
+    
+    # Draw the visible thumbnails with the texture renderer, clipped to the view
+    def draw_texture(self, matched_cards):
+        view = self.screen_rect()
+        self.dirty = False
+        size, pitch = thumbnail_metrics()
+        gpu.set_clip(view)
+        for idx in range(self.scroll // pitch * TERRITORY_COLUMNS, self.count):
+            row, col = divmod(idx, TERRITORY_COLUMNS)
+            card_rect = pygame.Rect(view.x + col * pitch, view.y + row * pitch - self.scroll, size, size)
+            if card_rect.top >= view.bottom:
+                break
+            gpu.fill(WHITE, card_rect)
+            gpu.rect(BLACK, card_rect, px_width(2))
+            icon, variant = split_card_type(matched_cards[idx])
+            thumbnail = get_thumbnail(icon)
+            if thumbnail is not None:
+                gpu.blit(gpu.texture(("thumbnail", icon, size), lambda: thumbnail), card_rect)
+            if variant > 1:
+                draw_variant_badge_texture(card_rect, variant)
+        gpu.set_clip(None)
+
+territories = [Territory(PLAYER_1), Territory(PLAYER_2)]
+
+# Add the player's won cards that have arrived to the territory: the last
+# pairs may still show their success mark or fly there
+def sync_territory(territory):
+    player = territory.player
+    matched_cards = engine.matched_cards[player]
+    pending = sum(1 for card in active_cards if card.is_matched and card.matched_by == player)
+    return territory.sync(matched_cards, len(matched_cards) - (pending + 1) // 2)
+
+# Screen position of a flying card, on the way from its slot to its thumbnail
+def flight_center(card):
+    player = card.matched_by
+    target = territories[player].slot_rect(engine.matched_cards[player].index(card.card_type))
+    t = ease(card.animation.progress())
+    (x0, y0), (x1, y1) = card.rect.center, target.center
+    return round(lerp(x0, x1, t)), round(lerp(y0, y1, t))
+
+def flying_cards():
+    return [card for card in active_cards if card.is_flying]
+
+# Draw a flying card on top of everything; returns the screen area it covers
+def draw_flight(card):
+    frame = collect_frames(card)[card.animation.frame_index(COLLECT_FRAMES)]
+    return screen.blit(frame, frame.get_rect(center=flight_center(card)))
+
+# The same with the texture renderer: the face texture scaled and turned while copying
+def draw_flight_texture(card):
+    index = card.animation.frame_index(COLLECT_FRAMES)
+    size, _ = thumbnail_metrics()
+    scale = collect_frame_scale(index, COLLECT_FRAMES, card.width, size)
+    rect = pygame.Rect(0, 0, round(card.width * scale), round(card.height * scale))
+    rect.center = flight_center(card)
+    angle = collect_frame_angle(index, COLLECT_FRAMES, card.rotation)
+    gpu.blit(face_texture(card), rect, (360 - angle) % 360)
+
+# Repaint everything under a rect that a flying card left: the background and
+# the territories clipped to the rect, then the cards and HUD labels it touched
+# whole (thick borders and clipped text come out differently when clipped)
+def repaint_region(rect):
+    screen.set_clip(rect)
+    restore_background(rect)
+    for territory in territories:
+        if territory.screen_rect().colliderect(rect):
+            territory.draw()
+    screen.set_clip(None)
+    touched = [card for card in visible_cards() if card.rect.colliderect(rect)]
+    draw_cards(touched, restore=True)
+    for card in touched:
+        mark_dirty(card.rect)
+    redraw_hud_labels(rect)
+
+# Scroll the territory under a logical position by dy screen pixels
+def scroll_territory_at(pos, dy):
+    for territory in territories:
+        if territory.view_rect().collidepoint(pos):
+            territory.scroll_by(dy)
+
+# Draw the game over overlay
+def draw_game_over():
+    winner = engine.winner()
+    if winner is not None:
+        result = f"{player_names[winner]} Wins!"
+        color = player_colors[winner]
+    else:
+        result = "It's a Tie!"
+        color = BLACK
         
-        # Score
-        score_text = font.render(f"Score: {player_scores[i]}", True, BLACK)
-        x_pos = 20 if i == PLAYER_1 else SCREEN_WIDTH - 20 - score_text.get_width()
-        screen.blit(score_text, (x_pos, 100))
+    text = render_text(result, 72, color)
+    text_rect = text.get_rect(center=(px(SCREEN_WIDTH // 2), px(SCREEN_HEIGHT // 2)))
+    
+    # Semi-transparent background
+    s = pygame.Surface(screen.get_size(), pygame.SRCALPHA)
+    s.fill((255, 255, 255, 200))
+    screen.blit(s, (0, 0))
+    
+    screen.blit(text, text_rect)
+    
+    # Restart button
+    draw_button(screen, pygame.Rect(SCREEN_WIDTH // 2 - 150, SCREEN_HEIGHT // 2 + 50, 140, 50), "Play Again", 36)
+    
+    # Quit button on game over screen
+    draw_button(screen, pygame.Rect(SCREEN_WIDTH // 2 + 10, SCREEN_HEIGHT // 2 + 50, 140, 50), "Quit", 36)
+
+# Game over overlay with the texture renderer: a blended fill instead of an alpha surface
+def draw_game_over_texture():
+    winner = engine.winner()
+    result = f"{player_names[winner]} Wins!" if winner is not None else "It's a Tie!"
+    text = text_texture(result, 72, player_colors[winner] if winner is not None else BLACK)
+    
+    gpu.fill((255, 255, 255, 200), screen.get_rect())
+    gpu.blit_at(text, (px(SCREEN_WIDTH // 2) - text.width // 2, px(SCREEN_HEIGHT // 2) - text.height // 2))
+    draw_button_texture(pygame.Rect(SCREEN_WIDTH // 2 - 150, SCREEN_HEIGHT // 2 + 50, 140, 50), "Play Again")
+    draw_button_texture(pygame.Rect(SCREEN_WIDTH // 2 + 10, SCREEN_HEIGHT // 2 + 50, 140, 50), "Quit")
+
+def draw_button_texture(rect, label):
+    rect = to_screen(rect)
+    text = text_texture(label, 36, BLACK)
+    gpu.fill(AWS_LIGHT_GRAY, rect)
+    gpu.rect(BLACK, rect, px_width(2))
+    gpu.blit_at(text, (rect.centerx - text.width // 2, rect.centery - text.height // 2))
+
+# Repaint the whole game screen
+def draw_full_game():
+    draw_background()
     
     # Draw matched cards in player territories
-    for player in range(2):
-        for idx, card_info in enumerate(player_matched_cards[player]):
-            # Calculate position for 2-column layout
-            col = idx % 2  # 0 for left column, 1 for right column
-            row = idx // 2  # Row index
-            
-            # Card size is 40% of original
-            card_size = CARD_SIZE * 0.4
-            card_spacing = 10
-            
-            if player == PLAYER_1:
-                # Left territory
-                base_x = 20  # Left margin
-                if col == 0:
-                    card_x = base_x
-                else:
-                    card_x = base_x + card_size + card_spacing
-            else:
-                # Right territory
-                base_x = SCREEN_WIDTH - territory_width + 20  # Right territory left margin
-                if col == 0:
-                    card_x = base_x
-                else:
-                    card_x = base_x + card_size + card_spacing
-            
-            card_y = 150 + row * (card_size + card_spacing)
-            
-            # Draw card at 40% of original size
-            card_rect = pygame.Rect(card_x, card_y, card_size, card_size)
-            pygame.draw.rect(screen, WHITE, card_rect)
-            pygame.draw.rect(screen, BLACK, card_rect, 2)
-            
-            # Find the image for this card type
-            card_type, card_img = None, None
-            
-            # Check in regular images first
-            for c_type, img in CARD_IMAGES:
-                if c_type == card_info:
-                    card_type, card_img = c_type, img
-                    break
-            
-            # If not found, check in hard mode images
-            if not card_img:
-                for c_type, img in HARD_MODE_IMAGES:
-                    if c_type == card_info:
-                        card_type, card_img = c_type, img
-                        break
-            
-            if card_img:
-                # Scale and draw the image
-                scaled_img = pygame.transform.scale(card_img, (card_size, card_size))
-                screen.blit(scaled_img, card_rect)
+    for territory in territories:
+        sync_territory(territory)
+        territory.draw()
     
     # Draw cards in play area
-    for card in cards:
-        card.draw()
+    draw_cards(visible_cards())
     
-    # Draw turn timer for hard mode
-    if (current_difficulty == DIFFICULTY_HARD or current_difficulty == DIFFICULTY_ULTRA) and game_state == STATE_PLAYING:
-        time_left = (turn_time_limit - turn_timer) // 1000
-        if time_left < 0:
-            time_left = 0
-        
-        timer_font = pygame.font.SysFont(None, 36)
-        timer_text = timer_font.render(f"Time: {time_left}s", True, BLACK)
-        screen.blit(timer_text, (SCREEN_WIDTH // 2 - timer_text.get_width() // 2, 50))
+    draw_hud(force=True)
     
-    # Draw Ultra Hard mode indicator
-    if current_difficulty == DIFFICULTY_ULTRA and (game_state == STATE_PLAYING or game_state == STATE_SHOW_ALL):
-        rot_font = pygame.font.SysFont(None, 30)
-        rot_text = rot_font.render("Ultra Hard Mode - Cards are rotated!", True, RED)
-        screen.blit(rot_text, (SCREEN_WIDTH // 2 - rot_text.get_width() // 2, 80))
+    # Matched cards on their way to the territories
+    flight_rects[:] = [draw_flight(card) for card in flying_cards()]
     
     # Game over message
     if game_state == STATE_GAME_OVER:
-        font = pygame.font.SysFont(None, 72)
-        if player_scores[0] > player_scores[1]:
-            result = "Player 1 Wins!"
-            color = player_colors[0]
-        elif player_scores[1] > player_scores[0]:
-            result = "Player 2 Wins!"
-            color = player_colors[1]
+        draw_game_over()
+    
+    with profiler.phase("display.flip"):
+        pygame.display.flip()
+
+# Draw cards (restoring the background behind each one first when asked),
+# clipped to the viewport on large boards
+def draw_cards(card_list, restore=False):
+    if viewport is not None:
+        screen.set_clip(to_screen(get_viewport_rect()))
+    for card in card_list:
+        if restore:
+            restore_background(card.rect)
+        with profiler.phase("card.draw"):
+            card.draw()
+        card.dirty = False
+    screen.set_clip(None)
+
+# Draw game state, pushing only the changed screen areas to the display
+def draw_game():
+    global full_redraw_needed, last_drawn_state, viewport_moved
+    
+    if gpu is not None:
+        draw_game_texture()
+        return
+    
+    # State transitions (and any change under the game over overlay) repaint everything
+    if game_state != last_drawn_state:
+        full_redraw_needed = True
+    elif game_state == STATE_GAME_OVER and (viewport_moved or flight_rects or any(card.dirty for card in visible_cards())):
+        full_redraw_needed = True
+    
+    if full_redraw_needed:
+        full_redraw_needed = False
+        viewport_moved = False
+        last_drawn_state = game_state
+        dirty_rects.clear()
+        draw_full_game()
+        return
+    
+    # Territories that won cards or were scrolled
+    for territory in territories:
+        sync_territory(territory)
+        if territory.dirty:
+            mark_dirty(territory.draw())
+    
+    # Panned or zoomed: repaint the whole viewport
+    if viewport_moved:
+        viewport_moved = False
+        view_rect = to_screen(get_viewport_rect())
+        restore_background(view_rect)
+        draw_cards(visible_cards())
+        mark_dirty(view_rect)
+    
+    # Cards that were flipped, matched or lost their success mark
+    changed = [card for card in visible_cards() if card.dirty]
+    if changed:
+        draw_cards(changed, restore=True)
+        for card in changed:
+            mark_dirty(card.rect)
+    
+    draw_hud()
+    
+    # Flying cards: repair the areas they covered, then draw them on top
+    flights = flying_cards()
+    if flights or flight_rects:
+        for rect in flight_rects:
+            repaint_region(rect)
+            mark_dirty(rect)
+        flight_rects[:] = [draw_flight(card) for card in flights]
+        for rect in flight_rects:
+            mark_dirty(rect)
+    
+    if dirty_rects:
+        with profiler.phase("display.update"):
+            update_display(dirty_rects)
+        dirty_rects.clear()
+
+# HUD values of the last frame drawn with the texture renderer
+last_hud_state = None
+
+# Draw game state with the texture renderer. Every frame is drawn whole (a
+# renderer's back buffer does not keep the last frame), but frames where
+# nothing changed are not drawn at all.
+def draw_game_texture():
+    global full_redraw_needed, last_drawn_state, viewport_moved, last_hud_state
+    
+    for territory in territories:
+        sync_territory(territory)
+    hud_state = (game_state, engine.current_player, tuple(engine.scores), get_turn_time_left(), get_replay_status())
+    flights = flying_cards()
+    if not (full_redraw_needed or viewport_moved or hud_state != last_hud_state or profiler.overlay or flights
+            or any(territory.dirty for territory in territories) or any(card.dirty for card in visible_cards())):
+        return
+    full_redraw_needed = False
+    viewport_moved = False
+    last_drawn_state = game_state
+    last_hud_state = hud_state
+    
+    gpu.set_clip(None)
+    gpu.clear(BLACK)  # Bars around the screen when the window has another aspect ratio
+    background = gpu.texture(("background", screen.get_size(), current_difficulty), lambda: get_background("game"))
+    gpu.blit_at(background, (0, 0))
+    
+    for territory in territories:
+        territory.draw_texture(engine.matched_cards[territory.player])
+    
+    if viewport is not None:
+        gpu.set_clip(to_screen(get_viewport_rect()))
+    for card in visible_cards():
+        with profiler.phase("card.draw"):
+            card.draw_texture()
+        card.dirty = False
+    gpu.set_clip(None)
+    
+    draw_hud_texture()
+    for card in flights:
+        draw_flight_texture(card)
+    if game_state == STATE_GAME_OVER:
+        draw_game_over_texture()
+    
+    # Drawn into the frame here, as the frame is presented as a whole
+    if profiler.overlay:
+        rect = to_screen(PROFILER_OVERLAY_RECT)
+        gpu.fill(BLACK, rect)
+        for i, text in enumerate(get_profiler_overlay_text()):
+            gpu.blit_surface(text, (rect.x + px(4), rect.y + px(3 + i * 16)))
+    
+    with profiler.phase("display.flip"):
+        gpu.present()
+
+# Mirror engine events onto the card views
+def apply_engine_events(events):
+    global game_state
+    
+    if computer is not None:
+        computer.observe(engine, events)
+    
+    for event in events:
+        kind = event[0]
+        if kind == EVENT_FLIP or kind == EVENT_HIDE:
+            card = cards[event[1]]
+            card.dirty = True
+            if can_animate(card):
+                card.start_flip(kind == EVENT_FLIP)
+                active_cards[card] = None
+        elif kind == EVENT_MATCH:
+            # Show success mark on matched cards
+            for slot in event[2:]:
+                cards[slot].show_success_mark = True
+                cards[slot].success_mark_timer = 0
+                cards[slot].dirty = True
+                active_cards[cards[slot]] = None
+        elif kind == EVENT_STATE:
+            game_state = event[1]
+            if game_state == STATE_GAME_OVER and recorder is not None:
+                recorder.end(game_time, engine.scores)
+                stop_recording()
+
+# Flip a card for the current player; the engine resolves the pair once two
+# are selected (in the networked mode, the server does)
+def select_card(card):
+    if network is not None:
+        apply_engine_events(network.pick(engine, card.slot))
+    else:
+        events = engine.step(card.slot)
+        if recorder is not None and events:
+            recorder.pick(game_time, card.slot)
+        apply_engine_events(events)
+
+# Whether the player at this screen may pick a slot now
+def can_pick(slot):
+    if replay_player is not None:
+        return False
+    if network is not None:
+        return network.can_pick(engine, slot)
+    return engine.can_select(slot)
+
+# Board slot at a window position (of the mouse), or None
+def slot_at(pos):
+    if slot_index is None:
+        return None
+    pos = to_logical(pos)
+    if viewport is not None:
+        if not get_viewport_rect().collidepoint(pos):
+            return None
+        return slot_index.slot_at(viewport.to_world(pos))
+    return slot_index.slot_at(pos)
+
+# Move the hover highlight to another slot
+def set_hover_slot(slot):
+    global hover_slot
+    if slot == hover_slot:
+        return
+    for old_or_new in (hover_slot, slot):
+        if old_or_new is not None:
+            cards[old_or_new].dirty = True
+    hover_slot = slot
+
+# Whether card clicks are ignored because the computer is playing
+def is_computer_turn():
+    return computer is not None and engine.current_player == computer.player
+
+# Advance the game by dt milliseconds
+def update_game(dt):
+    global game_time
+    
+    # Show-all countdown, pair reveal and turn timer (only the clocks when
+    # the server runs the game; its events arrive through poll_network)
+    with profiler.phase("engine.step"):
+        if replay_player is not None:
+            if not replay_paused:
+                apply_engine_events(replay_player.advance(dt * replay_speed))
+        elif network is not None:
+            engine.advance_clocks(dt)
         else:
-            result = "It's a Tie!"
-            color = BLACK
-            
-        text = font.render(result, True, color)
-        text_rect = text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2))
-        
-        # Semi-transparent background
-        s = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
-        s.fill((255, 255, 255, 200))
-        screen.blit(s, (0, 0))
-        
-        screen.blit(text, text_rect)
-        
-        # Restart button
-        restart_font = pygame.font.SysFont(None, 36)
-        restart_text = restart_font.render("Play Again", True, BLACK)
-        restart_rect = pygame.Rect(SCREEN_WIDTH // 2 - 150, SCREEN_HEIGHT // 2 + 50, 140, 50)
-        pygame.draw.rect(screen, AWS_LIGHT_GRAY, restart_rect)
-        pygame.draw.rect(screen, BLACK, restart_rect, 2)
-        screen.blit(restart_text, (restart_rect.centerx - restart_text.get_width() // 2, 
-                                  restart_rect.centery - restart_text.get_height() // 2))
-        
-        # Quit button on game over screen
-        quit_game_text = restart_font.render("Quit", True, BLACK)
-        quit_game_rect = pygame.Rect(SCREEN_WIDTH // 2 + 10, SCREEN_HEIGHT // 2 + 50, 140, 50)
-        pygame.draw.rect(screen, AWS_LIGHT_GRAY, quit_game_rect)
-        pygame.draw.rect(screen, BLACK, quit_game_rect, 2)
-        screen.blit(quit_game_text, (quit_game_rect.centerx - quit_game_text.get_width() // 2, 
-                                   quit_game_rect.centery - quit_game_text.get_height() // 2))
-    
-    # Instruction text
-    if game_state == STATE_SHOW_ALL:
-        font = pygame.font.SysFont(None, 36)
-        text = font.render("Memorize the cards...", True, BLACK)
-        screen.blit(text, (SCREEN_WIDTH // 2 - text.get_width() // 2, SCREEN_HEIGHT - 50))
-    elif game_state == STATE_PLAYING:
-        font = pygame.font.SysFont(None, 36)
-        # Change text color to black
-        text = font.render(f"{player_names[current_player]}'s Turn", True, BLACK)
-        screen.blit(text, (SCREEN_WIDTH // 2 - text.get_width() // 2, SCREEN_HEIGHT - 50))
+            events = engine.step(None, dt)
+            game_time += dt
+            if recorder is not None and events:
+                recorder.timer(game_time, dt)
+            apply_engine_events(events)
+    
+    # The computer picks when its delay is over; it never blocks the frame
+    if computer is not None:
+        with profiler.phase("computer"):
+            slot = computer.update(engine, dt)
+            if slot is not None:
+                select_card(cards[slot])
     
-    pygame.display.flip()
+    # Card animations and success mark timers
+    with profiler.phase("card.update"):
+        for card in active_cards:
+            card.update(dt)
+        for card in [card for card in active_cards if not card.is_active]:
+            del active_cards[card]
+
+# Profiler overlay in the top left corner
+PROFILER_OVERLAY_RECT = (0, 0, 340, 36)
+profiler_overlay_text = (None, [])  # Summary lines and their rendered surfaces
+
+# Rendered lines of the profiler overlay
+def get_profiler_overlay_text():
+    global profiler_overlay_text
+    lines = profiler.summary_lines()
+    size = max(1, px(18))
+    if profiler_overlay_text[0] != (lines, size):
+        # Rendered here rather than in the text cache, which would fill up with stale numbers
+        font = text_cache.font(size)
+        profiler_overlay_text = ((lines, size), [font.render(line, True, WHITE) for line in lines])
+    return profiler_overlay_text[1]
+
+# Draw the profiler overlay on top of the frame
+def draw_profiler_overlay():
+    if not profiler.overlay:
+        return
+    # The texture renderer draws it as part of the game frame
+    if gpu is not None and game_state != STATE_MENU and game_state != STATE_WAITING:
+        return
+    
+    rect = to_screen(PROFILER_OVERLAY_RECT)
+    screen.fill(BLACK, rect)
+    for i, text in enumerate(get_profiler_overlay_text()):
+        screen.blit(text, (rect.x + px(4), rect.y + px(3 + i * 16)))
+    update_display([rect])
+
+# Show or hide the profiler overlay; showing it starts profiling
+def toggle_profiler_overlay():
+    profiler.overlay = not profiler.overlay
+    if profiler.overlay and not profiler.enabled:
+        profiler.enabled = True
+        profiler.clear()
+    if not profiler.overlay:
+        request_full_redraw()  # Erase the overlay
+
+# Connect to a game server ("host" or "host:port") and wait for the first game
+def connect_to_server(address):
+    global network, game_state, network_status
+    host, _, port = address.rpartition(":") if ":" in address else (address, "", "")
+    network = NetworkClient(host, int(port) if port else DEFAULT_PORT,
+                            notify=lambda: pygame.event.post(pygame.event.Event(NETWORK_EVENT)))
+    network.connect()
+    network_status = "Waiting for an opponent..."
+    game_state = STATE_WAITING
+
+# Close the connection and go back to local play
+def leave_network():
+    global network, local_player
+    if network is not None:
+        network.close()
+    network = None
+    local_player = None
+    player_names[PLAYER_1] = "Player 1"
+    set_ai_enabled(ai_enabled)
+
+# Apply the messages the server sent since the last frame
+def poll_network():
+    global local_player, current_difficulty, game_state, network_status
+    for message in network.poll():
+        kind = message[0]
+        if kind == WELCOME:
+            local_player = message[1]
+            player_names[PLAYER_1] = "Player 1"
+            player_names[PLAYER_2] = "Player 2"
+            player_names[local_player] += " (You)"
+        elif kind == START:
+            current_difficulty = message[1]
+            network.reset_picks()
+            init_game(current_difficulty, board=message[2])
+        elif kind == OPPONENT_LEFT:
+            # The server pairs this client with the next player who connects
+            network_status = "Opponent left the game, waiting for a new one..."
+            game_state = STATE_WAITING
+        elif kind == BUSY:
+            network_status = SERVER_FULL_TEXT
+            game_state = STATE_WAITING
+        elif kind == DISCONNECTED:
+            if network_status != SERVER_FULL_TEXT:  # The server closes the connection after BUSY
+                network_status = "Disconnected from the server"
+            game_state = STATE_WAITING
+        elif engine is not None:
+            apply_engine_events(network.apply(engine, message))
+
+# Waiting screen of the networked mode (before a game and after the opponent left)
+def draw_waiting():
+    draw_background()
+    text = render_text(network_status, 36, BLACK)
+    screen.blit(text, text.get_rect(center=(px(SCREEN_WIDTH // 2), px(SCREEN_HEIGHT // 2))))
+    with profiler.phase("display.flip"):
+        flip_display()
+
+# Milliseconds until the screen changes without any input (show-all countdown,
+# pair reveal, success marks, the next second of the turn timer or the
+# computer's next pick), or None when nothing is scheduled
+def next_update_delay():
+    if game_state == STATE_MENU or game_state == STATE_WAITING:
+        return None
+    delays = []
+    engine_delay = engine.time_until_event()
+    if engine_delay is not None:
+        delays.append(engine_delay)
+    
+    # Next change of the whole seconds shown by the turn timer
+    if engine.state == STATE_PLAYING and engine.turn_time_limit is not None:
+        time_left = engine.turn_time_limit - engine.turn_timer
+        delays.append(time_left % 1000 or 1000)
+    
+    # Animations draw every frame; marks wait for their end
+    card_delays = [0 if card.animation is not None else 1000 - card.success_mark_timer for card in active_cards]
+    delays.extend(card_delays)
+    
+    if computer is not None and computer.is_my_move(engine):
+        delays.append(computer.wait if computer.wait is not None else 0)
+    
+    # Next recorded pick or timer of a replay (the engine's own deadlines are in its log too)
+    if replay_player is not None:
+        if replay_paused:
+            delays = card_delays
+        elif replay_player.time_until_next() is not None:
+            delays.append(replay_player.time_until_next() / replay_speed)
+    return max(0, min(delays)) if delays else None
+
+# Block until an input event arrives or `delay` ms have passed (forever when
+# delay is None). Returns the event, or None on timeout.
+def wait_for_event(delay):
+    if delay is None:
+        event = pygame.event.wait()
+    else:
+        event = pygame.event.wait(max(1, math.ceil(delay)))
+    return None if event.type == pygame.NOEVENT else event
+
+# Panning of a large board with the arrow keys (screen pixels per key press)
+PAN_STEP = 60
+PAN_KEYS = {pygame.K_LEFT: (1, 0), pygame.K_RIGHT: (-1, 0), pygame.K_UP: (0, 1), pygame.K_DOWN: (0, -1)}
+
+# Window size option, e.g. 1280x720
+def parse_window_size(value):
+    try:
+        width, height = (int(n) for n in value.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected WIDTHxHEIGHT, got {value!r}")
+    if width < 1 or height < 1:
+        raise argparse.ArgumentTypeError(f"window size must be positive, got {value!r}")
+    return width, height
+
+# Command line options
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="AWS Memory Card Game")
+    parser.add_argument("--ai", action="store_true", help="Player 2 is played by the computer")
+    parser.add_argument("--connect", metavar="HOST[:PORT]", help="play against another player through a game server (net_server.py)")
+    parser.add_argument("--pairs", type=int, help="large board with this many pairs, shown through a pannable, zoomable view")
+    parser.add_argument("--record", metavar="DIR", help="record every game to a replay log in this directory")
+    parser.add_argument("--replay", metavar="FILE", help="play back a recorded game (Space: pause, Page Up/Down: seek a turn, [ ]: speed)")
+    parser.add_argument("--renderer", choices=("surface", "texture", "software"), default="surface",
+                        help="draw with Surfaces (default), SDL2 textures (GPU when available) or SDL2 textures on the software renderer")
+    parser.add_argument("--window", metavar="WIDTHxHEIGHT", type=parse_window_size,
+                        help="initial window size (the window can be resized; the game is scaled to fit)")
+    parser.add_argument("--fullscreen", action="store_true", help="start in fullscreen mode (F11 toggles)")
+    parser.add_argument("--no-idle", action="store_true", help="redraw at the full frame rate even when nothing changes")
+    parser.add_argument("--profile", action="store_true", help="record frame timings (F3: overlay, F4: export trace)")
+    parser.add_argument("--profile-out", default="profile_trace.json", help="Chrome trace file written by F4")
+    return parser.parse_args(argv)
 
 # Main game loop
-def main():
-    global selected_cards, current_player, game_state, show_timer, turn_timer, current_difficulty
+def main(argv=None):
+    global game_state, current_difficulty, board_pairs, record_dir, replay_player
+    
+    args = parse_args(argv)
+    if args.pairs is not None and args.pairs < 1:
+        sys.exit("--pairs must be at least 1")
+    board_pairs = args.pairs
+    record_dir = args.record
+    set_ai_enabled(args.ai)
+    profiler.enabled = args.profile
+    
+    init_display(args.renderer, args.window, args.fullscreen)
+    load_assets()
     
     clock = pygame.time.Clock()
-    show_timer = 0
-    turn_timer = 0
     game_state = STATE_MENU
+    if args.connect:
+        try:
+            connect_to_server(args.connect)
+        except ConnectionError as e:
+            sys.exit(str(e))
+    elif args.replay:
+        start_replay(args.replay)
+    
+    pending_event = None  # Event that ended an idle wait
     
     running = True
     while running:
         # Get time elapsed since last frame
         dt = clock.get_time()
+        profiler.begin_frame()
+        started_engine = engine
         
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                running = False
+        events = pygame.event.get()
+        if pending_event is not None:
+            # dt includes the idle wait, which passed before the event that
+            # ended it: run the game clocks up to the event first
+            if game_state != STATE_MENU and game_state != STATE_WAITING:
+                update_game(dt)
+                dt = 0
+            events.insert(0, pending_event)
+            pending_event = None
+        
+        # Server messages (flips, matches, timeouts, new games)
+        if network is not None:
+            poll_network()
+        
+        with profiler.phase("events"):
+            for event in events:
+                if event.type == pygame.QUIT:
+                    running = False
                 
-            if event.type == pygame.MOUSEBUTTONDOWN:
-                # Menu state
-                if game_state == STATE_MENU:
-                    # Check for difficulty selection
-                    difficulty_rects = draw_menu()
-                    for i, rect in enumerate(difficulty_rects):
-                        if rect.collidepoint(event.pos):
-                            current_difficulty = i
-                            init_game(current_difficulty)
-                            break
+                # Fit the screen into the resized window
+                if event.type == pygame.VIDEORESIZE or event.type == pygame.WINDOWSIZECHANGED:
+                    resize_display()
+                if event.type == pygame.KEYDOWN and event.key == pygame.K_F11:
+                    toggle_fullscreen()
                     
-                    # Check for quit button click
-                    quit_rect = pygame.Rect(SCREEN_WIDTH - 70, 10, 60, 30)
-                    if quit_rect.collidepoint(event.pos):
-                        running = False
-                        continue
+                # Window contents were lost (e.g. uncovered): repaint everything
+                if event.type == pygame.VIDEOEXPOSE:
+                    request_full_redraw()
+                
+                # Hover highlighting of the card under the pointer
+                if event.type == pygame.MOUSEMOTION and game_state != STATE_MENU:
+                    # Dragging with the right button pans a large board
+                    if viewport is not None and event.buttons[2]:
+                        viewport_changed(viewport.pan(event.rel[0] / ui_scale, event.rel[1] / ui_scale))
+                    set_hover_slot(slot_at(event.pos))
                 
-                # Game playing states
-                else:
-                    # Check for quit button click
-                    quit_rect = pygame.Rect(SCREEN_WIDTH - 70, 10, 60, 30)
-                    if quit_rect.collidepoint(event.pos):
-                        running = False
-                        continue
+                # The wheel zooms a large board at the pointer and scrolls a
+                # territory that no longer fits on the screen
+                if event.type == pygame.MOUSEWHEEL and game_state != STATE_MENU:
+                    pos = to_logical(pygame.mouse.get_pos())
+                    if viewport is not None and get_viewport_rect().collidepoint(pos):
+                        viewport_changed(viewport.zoom_at(pos, event.y))
+                    else:
+                        scroll_territory_at(pos, -event.y * thumbnail_metrics()[1])
+                
+                # Keyboard panning and zooming of a large board
+                if event.type == pygame.KEYDOWN and viewport is not None and game_state != STATE_MENU:
+                    if event.key in PAN_KEYS:
+                        dx, dy = PAN_KEYS[event.key]
+                        viewport_changed(viewport.pan(dx * PAN_STEP, dy * PAN_STEP))
+                    elif event.key in (pygame.K_PLUS, pygame.K_EQUALS, pygame.K_KP_PLUS):
+                        viewport_changed(viewport.zoom_at(viewport.center(), 1))
+                    elif event.key in (pygame.K_MINUS, pygame.K_KP_MINUS):
+                        viewport_changed(viewport.zoom_at(viewport.center(), -1))
+                    elif event.key == pygame.K_HOME:
+                        viewport_changed(viewport.fit())
+                
+                # Replay playback controls
+                if event.type == pygame.KEYDOWN and replay_player is not None and game_state != STATE_MENU:
+                    handle_replay_key(event.key)
                     
-                    # Check for menu button click
-                    menu_rect = pygame.Rect(SCREEN_WIDTH - 140, 10, 60, 30)
-                    if menu_rect.collidepoint(event.pos):
-                        game_state = STATE_MENU
-                        continue
+                # Profiler overlay and trace export
+                if event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                    toggle_profiler_overlay()
+                if event.type == pygame.KEYDOWN and event.key == pygame.K_F4 and profiler.enabled:
+                    count = profiler.export_chrome_trace(args.profile_out)
+                    print(f"Wrote {count} trace events to {args.profile_out}")
+                
+                # Left button only: the wheel and the right button (panning) do not select cards
+                if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+                    pos = to_logical(event.pos)
                     
-                    # Game over screen buttons
-                    if game_state == STATE_GAME_OVER:
-                        # Restart button
-                        restart_rect = pygame.Rect(SCREEN_WIDTH // 2 - 150, SCREEN_HEIGHT // 2 + 50, 140, 50)
-                        if restart_rect.collidepoint(event.pos):
-                            init_game(current_difficulty)  # Restart with same difficulty
-                            continue
+                    # Menu state
+                    if game_state == STATE_MENU:
+                        # Check for difficulty selection
+                        difficulty_rects = get_menu_button_rects()
+                        for i, rect in enumerate(difficulty_rects):
+                            if rect.collidepoint(pos):
+                                current_difficulty = i
+                                init_game(current_difficulty)
+                                break
                         
-                        # Quit button on game over screen
-                        quit_game_rect = pygame.Rect(SCREEN_WIDTH // 2 + 10, SCREEN_HEIGHT // 2 + 50, 140, 50)
-                        if quit_game_rect.collidepoint(event.pos):
+                        # Check for quit button click
+                        quit_rect = pygame.Rect(SCREEN_WIDTH - 70, 10, 60, 30)
+                        if quit_rect.collidepoint(pos):
                             running = False
                             continue
+                        
+                        # Check for Player 2 human/computer toggle
+                        if get_ai_toggle_rect().collidepoint(pos):
+                            set_ai_enabled(not ai_enabled)
+                            continue
                     
-                    # Card selection
-                    if game_state == STATE_PLAYING:
-                        for card in cards:
-                            if card.is_clicked(event.pos) and len(selected_cards) < 2:
-                                card.is_flipped = True
-                                selected_cards.append(card)
-                                
-                                # When 2 cards are selected
-                                if len(selected_cards) == 2:
-                                    # Check if they match
-                                    if selected_cards[0].card_type == selected_cards[1].card_type:
-                                        # If matched, increase player's score
-                                        player_scores[current_player] += 2
-                                        
-                                        # Mark cards as matched
-                                        selected_cards[0].is_matched = True
-                                        selected_cards[1].is_matched = True
-                                        selected_cards[0].matched_by = current_player
-                                        selected_cards[1].matched_by = current_player
-                                        
-                                        # Show success mark on matched cards
-                                        selected_cards[0].show_success_mark = True
-                                        selected_cards[1].show_success_mark = True
-                                        selected_cards[0].success_mark_timer = 0
-                                        selected_cards[1].success_mark_timer = 0
-                                        
-                                        # Add to player's matched cards
-                                        player_matched_cards[current_player].append(selected_cards[0].card_type)
-                                        
-                                        # Check if all cards are matched
-                                        all_matched = all(card.is_matched for card in cards)
-                                        if all_matched:
-                                            game_state = STATE_GAME_OVER
-                                    else:
-                                        # If not matched, switch players
-                                        current_player = 1 - current_player
-                                        # Reset turn timer for hard/ultra mode
-                                        if current_difficulty == DIFFICULTY_HARD or current_difficulty == DIFFICULTY_ULTRA:
-                                            turn_timer = 0
-                                    
-                                    # Wait a bit before flipping cards back
-                                    draw_game()
-                                    pygame.display.flip()
-                                    pygame.time.delay(1000)
-                                    
-                                    # Flip cards back if not matched
-                                    if not selected_cards[0].is_matched:
-                                        selected_cards[0].is_flipped = False
-                                        selected_cards[1].is_flipped = False
-                                    
-                                    selected_cards = []
+                    # Game playing states (and the networked mode's waiting screen)
+                    else:
+                        # Check for quit button click
+                        quit_rect = pygame.Rect(SCREEN_WIDTH - 70, 10, 60, 30)
+                        if quit_rect.collidepoint(pos):
+                            running = False
+                            continue
+                        
+                        # Check for menu button click
+                        menu_rect = pygame.Rect(SCREEN_WIDTH - 140, 10, 60, 30)
+                        if menu_rect.collidepoint(pos):
+                            leave_network()
+                            stop_recording()
+                            replay_player = None
+                            board_pairs = args.pairs
+                            game_state = STATE_MENU
+                            continue
+                        
+                        # Game over screen buttons
+                        if game_state == STATE_GAME_OVER:
+                            # Restart button
+                            restart_rect = pygame.Rect(SCREEN_WIDTH // 2 - 150, SCREEN_HEIGHT // 2 + 50, 140, 50)
+                            if restart_rect.collidepoint(pos):
+                                if network is not None:
+                                    network.restart()  # The server deals the new board
+                                elif replay_player is not None:
+                                    replay_seek(-1)  # Watch the replay again from the start
+                                else:
+                                    init_game(current_difficulty)  # Restart with same difficulty
+                                continue
+                            
+                            # Quit button on game over screen
+                            quit_game_rect = pygame.Rect(SCREEN_WIDTH // 2 + 10, SCREEN_HEIGHT // 2 + 50, 140, 50)
+                            if quit_game_rect.collidepoint(pos):
+                                running = False
+                                continue
+                        
+                        # Card selection (clicks are ignored while a pair is revealed
+                        # or while the computer is playing)
+                        if game_state == STATE_PLAYING and not engine.is_revealing and not is_computer_turn():
+                            slot = slot_at(event.pos)
+                            if slot is not None and can_pick(slot):
+                                select_card(cards[slot])
         
         # Menu state
         if game_state == STATE_MENU:
-            draw_menu()
+            with profiler.phase("draw_menu"):
+                draw_menu()
+        
+        elif game_state == STATE_WAITING:
+            draw_waiting()
         
         # Game states
         else:
-            # Initial card display time
-            if game_state == STATE_SHOW_ALL:
-                show_timer += dt
-                display_time = difficulty_settings[current_difficulty]["display_time"]
-                if show_timer >= display_time:  # Display time based on difficulty
-                    # Flip cards face down WITHOUT shuffling positions
-                    for card in cards:
-                        card.is_flipped = False
-                    
-                    game_state = STATE_PLAYING
-                    turn_timer = 0  # Reset turn timer
-            
-            # Turn timer for hard/ultra mode
-            elif game_state == STATE_PLAYING and (current_difficulty == DIFFICULTY_HARD or current_difficulty == DIFFICULTY_ULTRA):
-                turn_timer += dt
-                if turn_timer >= turn_time_limit:
-                    # Time's up, switch players
-                    current_player = 1 - current_player
-                    turn_timer = 0
-                    
-                    # Flip any selected cards back
-                    for card in selected_cards:
-                        card.is_flipped = False
-                    selected_cards = []
-            
-            # Update card success mark timers
-            for card in cards:
-                card.update(dt)
-            
-            draw_game()
+            # Time spent idle in the menu or on the previous game does not count
+            if engine is not started_engine:
+                dt = 0
+            update_game(dt)
+            with profiler.phase("draw_game"):
+                draw_game()
+        
+        draw_profiler_overlay()
+        profiler.end_frame()
         
-        clock.tick(60)
+        # Nothing to animate: sleep until the next input or scheduled change
+        # instead of redrawing the same frame
+        if running and not args.no_idle and not profiler.overlay:
+            delay = next_update_delay()
+            if delay is None or delay > 1000 / FPS:
+                pending_event = wait_for_event(delay)
+        clock.tick(FPS)
     
+    leave_network()
+    stop_recording()
+    assets.shutdown()
+    if gpu is not None:
+        gpu.close()
     pygame.quit()
     sys.exit()
 
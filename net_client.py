@@ -0,0 +1,212 @@
+# Client side of the networked two-player mode.
+#
+# The connection runs on an asyncio event loop in a background thread, so
+# the pygame frame loop never blocks on the network: it polls decoded
+# messages once per frame (and a notify callback can wake an idle wait).
+# The client keeps a mirror of the server's engine (GameEngine.apply_events)
+# for rendering. The first pick of a turn is predicted: the card turns face
+# up locally as soon as it is clicked and is turned back if the server
+# rejects the pick. Everything else, including turn timeouts, comes from the
+# server.
+#
+# A headless bot client that plays with the computer opponent's logic is
+# included for testing over localhost:
+#   python net_server.py &
+#   python net_client.py --bot & python net_client.py --bot
+import argparse
+import asyncio
+import queue
+import socket
+import threading
+import time
+
+from game_engine import GameEngine, STATE_GAME_OVER, EVENT_FLIP, EVENT_HIDE, EVENT_STATE
+from net_protocol import (
+    DEFAULT_PORT, START, WELCOME, REJECT, OPPONENT_LEFT, BUSY, ProtocolError,
+    encode_hello, encode_pick, encode_restart, read_message,
+)
+
+# Message put in the inbox when the connection is closed
+DISCONNECTED = "disconnected"
+
+# Seconds to wait for the connection to the server
+CONNECT_TIMEOUT = 5
+
+
+class NetworkClient:
+    def __init__(self, host="127.0.0.1", port=DEFAULT_PORT, notify=None):
+        self.host = host
+        self.port = port
+        self.notify = notify   # Called from the network thread after each message
+        self.inbox = queue.SimpleQueue()
+        self.player = None     # Seat given by the server
+        self.unconfirmed = []  # Picks sent that the server has not echoed or rejected yet
+        self.loop = None
+        self.writer = None
+        self.thread = None
+        self.connected = threading.Event()
+        self.error = None
+
+    # Connect in the background thread; raises ConnectionError on failure
+    def connect(self, timeout=CONNECT_TIMEOUT):
+        self.thread = threading.Thread(target=asyncio.run, args=(self._run(),), daemon=True)
+        self.thread.start()
+        if not self.connected.wait(timeout):
+            raise ConnectionError(f"no answer from {self.host}:{self.port}")
+        if self.error is not None:
+            raise ConnectionError(f"cannot connect to {self.host}:{self.port}: {self.error}")
+
+    async def _run(self):
+        try:
+            reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        except OSError as e:
+            self.error = e
+            self.connected.set()
+            return
+        self.loop = asyncio.get_running_loop()
+        sock = self.writer.get_extra_info("socket")
+        if sock is not None:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.writer.write(encode_hello())
+        self.connected.set()
+
+        try:
+            while True:
+                message = await read_message(reader)
+                if message[0] == WELCOME:
+                    self.player = message[1]
+                self._put(message)
+        except (asyncio.IncompleteReadError, ConnectionError, ProtocolError) as e:
+            self._put((DISCONNECTED, str(e) or "connection closed"))
+        finally:
+            self.writer.close()
+
+    def _put(self, message):
+        self.inbox.put(message)
+        if self.notify is not None:
+            self.notify()
+
+    def _send(self, data):
+        if self.loop is not None and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self.writer.write, data)
+
+    # Messages received since the last poll
+    def poll(self):
+        messages = []
+        while True:
+            try:
+                messages.append(self.inbox.get_nowait())
+            except queue.Empty:
+                return messages
+
+    # Forget the picks of the previous game (call when a new game starts)
+    def reset_picks(self):
+        self.unconfirmed = []
+
+    # Whether the local player may pick this slot now
+    def can_pick(self, engine, slot):
+        pending = sum(1 for picked in self.unconfirmed if picked not in engine.selected)
+        return (engine.current_player == self.player
+                and slot not in self.unconfirmed
+                and len(engine.selected) + pending < 2
+                and engine.can_select(slot))
+
+    # Send a pick; returns the predicted events (the flip of a first pick)
+    def pick(self, engine, slot):
+        self.unconfirmed.append(slot)
+        self._send(encode_pick(slot))
+        if engine.selected:
+            return []  # The second pick resolves the pair, so it waits for the server
+        events = [(EVENT_FLIP, slot)]
+        engine.apply_events(events)
+        return events
+
+    # Apply a server event or rejection to the mirrored engine; returns the events for the view
+    def apply(self, engine, message):
+        kind = message[0]
+        if kind == REJECT:
+            slot = message[1]
+            if slot in self.unconfirmed:
+                self.unconfirmed.remove(slot)
+            # Undo the prediction
+            if slot in engine.selected:
+                engine.selected.remove(slot)
+            if engine.board.is_flipped(slot) and not engine.board.is_matched(slot):
+                engine.board.hide(slot)
+                return [(EVENT_HIDE, slot)]
+            return []
+        if kind == EVENT_FLIP and message[1] in self.unconfirmed:
+            self.unconfirmed.remove(message[1])
+        engine.apply_events([message])
+        return [message]
+
+    # Start a new game once the current one is over
+    def restart(self):
+        self._send(encode_restart())
+
+    def close(self):
+        if self.loop is not None and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self.writer.close)
+        if self.thread is not None:
+            self.thread.join(1)
+
+
+# Headless client that plays with the computer opponent's logic; returns the
+# final scores of each game it played
+def run_bot(host, port, games=1, seed=None, tick=1 / 60):
+    from ai_player import ComputerPlayer
+
+    client = NetworkClient(host, port)
+    client.connect()
+    engine = None
+    bot = None
+    results = []
+    last = time.monotonic()
+    try:
+        while len(results) < games:
+            for message in client.poll():
+                kind = message[0]
+                if kind == START:
+                    engine = GameEngine(message[1], board=message[2])
+                    bot = ComputerPlayer(engine, client.player, seed)
+                    client.reset_picks()
+                elif kind in (OPPONENT_LEFT, BUSY, DISCONNECTED):
+                    return results
+                elif engine is not None and kind != WELCOME:
+                    events = client.apply(engine, message)
+                    bot.observe(engine, events)
+                    if kind == EVENT_STATE and message[1] == STATE_GAME_OVER:
+                        results.append(list(engine.scores))
+                        if len(results) < games:
+                            client.restart()
+
+            now = time.monotonic()
+            dt = (now - last) * 1000
+            last = now
+            if engine is not None and engine.state != STATE_GAME_OVER:
+                engine.advance_clocks(dt)
+                slot = bot.update(engine, dt)
+                if slot is not None and client.can_pick(engine, slot):
+                    bot.observe(engine, client.pick(engine, slot))
+            time.sleep(tick)
+    finally:
+        client.close()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless bot client for the networked mode (for testing).")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--bot", action="store_true", help="play with the computer opponent's logic")
+    parser.add_argument("--games", type=int, default=1)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args(argv)
+    if not args.bot:
+        parser.error("use memory_game.py --connect HOST:PORT to play; this entry point only runs --bot")
+    for scores in run_bot(args.host, args.port, args.games, args.seed):
+        print(f"Scores: {scores[0]} - {scores[1]}")
+
+
+if __name__ == "__main__":
+    main()
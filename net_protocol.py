@@ -0,0 +1,198 @@
+# Binary protocol of the networked two-player mode.
+#
+# Every message is a 3 byte header (message type, payload length) followed
+# by a fixed-layout little-endian payload. The board is sent once when a
+# game starts; after that the server only sends the engine's events, one
+# small message each (a flip is 5 bytes), and clients only send picks.
+#
+#   client -> server: HELLO, PICK, RESTART
+#   server -> client: WELCOME, START, REJECT, OPPONENT_LEFT, BUSY and the events
+#
+# Event messages decode to the same tuples GameEngine.step returns, so a
+# client feeds them straight into GameEngine.apply_events and the renderer.
+# Like game_engine, this module does not need pygame.
+import struct
+
+from game_engine import (
+    Board, ROTATIONS, STATE_SHOW_ALL, STATE_PLAYING, STATE_GAME_OVER,
+    EVENT_FLIP, EVENT_HIDE, EVENT_MATCH, EVENT_MISMATCH, EVENT_TURN, EVENT_TIMEOUT,
+    EVENT_STATE, EVENT_REVEAL_END,
+)
+
+PROTOCOL_VERSION = 1
+DEFAULT_PORT = 47100
+
+HEADER = struct.Struct("<BH")  # Message type, payload length
+MAX_PAYLOAD = 0xFFFF
+
+# Client -> server
+MSG_HELLO = 1          # protocol version (u16)
+MSG_PICK = 2           # slot (u16)
+MSG_RESTART = 3        # start a new game once this one is over
+
+# Server -> client
+MSG_WELCOME = 16       # player number of this client (u8)
+MSG_START = 17         # difficulty, card type names, board
+MSG_REJECT = 18        # slot (u16) of a pick the server did not accept
+MSG_OPPONENT_LEFT = 19
+MSG_BUSY = 20          # the server is full; it closes the connection
+
+# Server -> client: engine events
+MSG_FLIP = 32          # slot (u16)
+MSG_HIDE = 33          # slot (u16)
+MSG_MATCH = 34         # player (u8), slots (u16, u16)
+MSG_MISMATCH = 35      # player (u8), slots (u16, u16)
+MSG_TURN = 36          # player (u8)
+MSG_TIMEOUT = 37       # player (u8)
+MSG_STATE = 38         # state (u8)
+MSG_REVEAL_END = 39
+
+# Decoded forms of the non-event messages
+HELLO = "hello"
+PICK = "pick"
+RESTART = "restart"
+WELCOME = "welcome"
+START = "start"
+REJECT = "reject"
+OPPONENT_LEFT = "opponent_left"
+BUSY = "busy"
+
+STATES = (STATE_SHOW_ALL, STATE_PLAYING, STATE_GAME_OVER)
+STATE_CODES = {state: code for code, state in enumerate(STATES)}
+
+_U8 = struct.Struct("<B")
+_U16 = struct.Struct("<H")
+_PAIR = struct.Struct("<BHH")
+_START = struct.Struct("<BHH")  # difficulty, number of type names, number of slots
+
+# Event kind -> (message type, payload struct)
+_EVENT_MESSAGES = {
+    EVENT_FLIP: (MSG_FLIP, _U16),
+    EVENT_HIDE: (MSG_HIDE, _U16),
+    EVENT_MATCH: (MSG_MATCH, _PAIR),
+    EVENT_MISMATCH: (MSG_MISMATCH, _PAIR),
+    EVENT_TURN: (MSG_TURN, _U8),
+    EVENT_TIMEOUT: (MSG_TIMEOUT, _U8),
+}
+_MESSAGE_EVENTS = {msg_type: (kind, layout) for kind, (msg_type, layout) in _EVENT_MESSAGES.items()}
+
+
+class ProtocolError(Exception):
+    pass
+
+
+def encode_message(msg_type, payload=b""):
+    if len(payload) > MAX_PAYLOAD:
+        raise ProtocolError(f"payload of {len(payload)} bytes is too large")
+    return HEADER.pack(msg_type, len(payload)) + payload
+
+
+def encode_hello():
+    return encode_message(MSG_HELLO, _U16.pack(PROTOCOL_VERSION))
+
+
+def encode_pick(slot):
+    return encode_message(MSG_PICK, _U16.pack(slot))
+
+
+def encode_restart():
+    return encode_message(MSG_RESTART)
+
+
+def encode_welcome(player):
+    return encode_message(MSG_WELCOME, _U8.pack(player))
+
+
+def encode_reject(slot):
+    return encode_message(MSG_REJECT, _U16.pack(slot))
+
+
+def encode_opponent_left():
+    return encode_message(MSG_OPPONENT_LEFT)
+
+
+def encode_busy():
+    return encode_message(MSG_BUSY)
+
+
+# Board of a new game: the type names once, then a type id (u16) and a
+# rotation (u8, in quarter turns) per slot
+def encode_start(difficulty, board):
+    parts = [_START.pack(difficulty, len(board.type_names), len(board))]
+    for name in board.type_names:
+        data = name.encode("utf-8")
+        parts.append(_U8.pack(len(data)) + data)
+    parts.append(struct.pack(f"<{len(board)}H", *board.type_ids))
+    parts.append(bytes(ROTATIONS.index(rotation) for rotation in board.rotations))
+    return encode_message(MSG_START, b"".join(parts))
+
+
+# One message per event, concatenated so a step goes out in a single write
+def encode_events(events):
+    parts = []
+    for event in events:
+        kind = event[0]
+        if kind == EVENT_STATE:
+            parts.append(encode_message(MSG_STATE, _U8.pack(STATE_CODES[event[1]])))
+        elif kind == EVENT_REVEAL_END:
+            parts.append(encode_message(MSG_REVEAL_END))
+        else:
+            msg_type, layout = _EVENT_MESSAGES[kind]
+            parts.append(encode_message(msg_type, layout.pack(*event[1:])))
+    return b"".join(parts)
+
+
+def _decode_start(payload):
+    difficulty, name_count, slot_count = _START.unpack_from(payload, 0)
+    offset = _START.size
+    names = []
+    for _ in range(name_count):
+        length = payload[offset]
+        names.append(payload[offset + 1:offset + 1 + length].decode("utf-8"))
+        offset += 1 + length
+    type_ids = struct.unpack_from(f"<{slot_count}H", payload, offset)
+    offset += 2 * slot_count
+    rotations = [ROTATIONS[quarter] for quarter in payload[offset:offset + slot_count]]
+    if len(rotations) != slot_count or any(type_id >= name_count for type_id in type_ids):
+        raise ProtocolError("malformed board")
+    board = Board([names[type_id] for type_id in type_ids], rotations)
+    return (START, difficulty, board)
+
+
+# Decode one message into an engine event tuple or a (name, ...) tuple
+def decode_message(msg_type, payload):
+    try:
+        event = _MESSAGE_EVENTS.get(msg_type)
+        if event is not None:
+            kind, layout = event
+            return (kind,) + layout.unpack(payload)
+        if msg_type == MSG_STATE:
+            return (EVENT_STATE, STATES[_U8.unpack(payload)[0]])
+        if msg_type == MSG_REVEAL_END:
+            return (EVENT_REVEAL_END,)
+        if msg_type == MSG_PICK:
+            return (PICK,) + _U16.unpack(payload)
+        if msg_type == MSG_HELLO:
+            return (HELLO,) + _U16.unpack(payload)
+        if msg_type == MSG_RESTART:
+            return (RESTART,)
+        if msg_type == MSG_WELCOME:
+            return (WELCOME,) + _U8.unpack(payload)
+        if msg_type == MSG_START:
+            return _decode_start(payload)
+        if msg_type == MSG_REJECT:
+            return (REJECT,) + _U16.unpack(payload)
+        if msg_type == MSG_OPPONENT_LEFT:
+            return (OPPONENT_LEFT,)
+        if msg_type == MSG_BUSY:
+            return (BUSY,)
+    except (struct.error, IndexError, ValueError) as e:
+        raise ProtocolError(f"malformed message {msg_type}: {e}") from e
+    raise ProtocolError(f"unknown message type {msg_type}")
+
+
+# Read and decode the next message from an asyncio StreamReader
+async def read_message(reader):
+    msg_type, length = HEADER.unpack(await reader.readexactly(HEADER.size))
+    payload = await reader.readexactly(length) if length else b""
+    return decode_message(msg_type, payload)
@@ -0,0 +1,427 @@
+# Authoritative asyncio server of the networked two-player mode.
+#
+# One event loop hosts any number of game sessions. Clients are paired in
+# the order they connect; each pair plays a Session whose GameEngine only
+# runs on the server. Picks are checked against the server's engine and
+# every resulting event is sent to both clients as a compact delta (see
+# net_protocol).
+#
+# Built to run thousands of sessions in one process:
+# - Sessions hold only the engine's flat board state, and the engines share
+#   one random generator. Finished sessions go back to a pool and are reused
+#   with their engine.
+# - Timed events (end of the show-all phase, end of a pair reveal, turn
+#   timeouts) of every session go into one shared TimerHeap, which keeps a
+#   single loop.call_at armed at the earliest deadline. Nothing polls, and
+#   the server alone decides when a turn runs out.
+# - Connections are kept when a game ends or the opponent leaves: the player
+#   goes back into matchmaking.
+# - Backpressure: a client whose unsent output grows past MAX_WRITE_BUFFER
+#   (it stopped reading) is disconnected instead of buffering without limit,
+#   and connections beyond max_sessions are turned away with BUSY.
+# - Metrics: move latency percentiles (pick received to events written),
+#   sessions, connections and memory per session (--metrics-interval).
+#
+# Usage:
+#   python net_server.py [--host 127.0.0.1] [--port 47100] [--difficulty 2] [--pairs N]
+#                        [--max-sessions 5000] [--metrics-interval 5]
+import argparse
+import asyncio
+import heapq
+import json
+import random
+import resource
+import socket
+import sys
+import time
+from collections import deque
+
+from game_engine import (
+    GameEngine, STATE_GAME_OVER, DIFFICULTY_NORMAL, DIFFICULTY_ULTRA,
+    difficulty_names, difficulty_settings,
+)
+from net_protocol import (
+    DEFAULT_PORT, PROTOCOL_VERSION, HELLO, PICK, RESTART, ProtocolError,
+    encode_welcome, encode_start, encode_events, encode_reject, encode_opponent_left, encode_busy,
+    read_message,
+)
+
+# Sessions hosted at once; further connections get BUSY
+DEFAULT_MAX_SESSIONS = 5000
+
+# Unsent bytes a connection may queue before it is dropped as too slow
+MAX_WRITE_BUFFER = 64 * 1024
+
+# Move latencies kept for the percentiles (the most recent ones since the last report)
+LATENCY_SAMPLES = 20000
+
+# Rebuild the timer heap when it holds this many times more entries than sessions
+TIMER_HEAP_SLACK = 4
+
+
+# Card type names of a difficulty: the names of its icons
+def load_card_types(difficulty):
+    from assets import AssetManager, SET_REGULAR, SET_HARD_MODE
+
+    manager = AssetManager(bundle_path=False)
+    try:
+        names = [name for name, _ in manager.list_set(SET_HARD_MODE if difficulty == DIFFICULTY_ULTRA else SET_REGULAR)]
+    finally:
+        manager.shutdown()
+    return sorted(names)
+
+
+# Value at fraction q of a sorted list
+def _percentile(values, q):
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0
+
+
+# Approximate bytes held by an engine's game state
+def engine_bytes(engine):
+    board = engine.board
+    size = sys.getsizeof(engine) + sys.getsizeof(engine.__dict__) + sys.getsizeof(board) + sys.getsizeof(board.__dict__)
+    size += sum(sys.getsizeof(a) for a in (board.type_ids, board.rotations, board.matched_by))
+    size += sys.getsizeof(board.flipped_mask) + sys.getsizeof(board.matched_mask)
+    size += sys.getsizeof(engine.selected) + sys.getsizeof(engine.scores)
+    size += sum(sys.getsizeof(cards) for cards in engine.matched_cards)
+    return size
+
+
+# Deadlines of every session in one heap, served by a single loop.call_at.
+# Rescheduling a session leaves its old entry in the heap; stale entries are
+# skipped when they come up (each session keeps the token of its live entry).
+class TimerHeap:
+    def __init__(self, loop):
+        self.loop = loop
+        self.heap = []  # (loop time, token, session)
+        self.counter = 0
+        self.live = 0  # Sessions with a live entry
+        self.handle = None
+        self.handle_time = None
+
+    def schedule(self, session, when):
+        if session.timer_token is None:
+            self.live += 1
+        self.counter += 1
+        session.timer_token = self.counter
+        heapq.heappush(self.heap, (when, self.counter, session))
+        if len(self.heap) > TIMER_HEAP_SLACK * self.live + 1024:
+            self.compact()
+        if self.handle is None or when < self.handle_time:
+            self._arm()
+
+    def cancel(self, session):
+        if session.timer_token is not None:
+            session.timer_token = None
+            self.live -= 1
+
+    # Drop the stale entries
+    def compact(self):
+        self.heap = [entry for entry in self.heap if entry[2].timer_token == entry[1]]
+        heapq.heapify(self.heap)
+
+    def _arm(self):
+        if self.handle is not None:
+            self.handle.cancel()
+            self.handle = None
+        while self.heap and self.heap[0][2].timer_token != self.heap[0][1]:
+            heapq.heappop(self.heap)
+        if self.heap:
+            self.handle_time = self.heap[0][0]
+            self.handle = self.loop.call_at(self.handle_time, self._fire)
+
+    def _fire(self):
+        self.handle = None
+        now = self.loop.time()
+        while self.heap and self.heap[0][0] <= now:
+            _, token, session = heapq.heappop(self.heap)
+            if session.timer_token == token:
+                session.timer_token = None
+                self.live -= 1
+                session.on_timer()
+        self._arm()
+
+
+# A client connection; it stays open across games
+class Connection:
+    __slots__ = ("server", "writer", "session", "player")
+
+    def __init__(self, server, writer):
+        self.server = server
+        self.writer = writer
+        self.session = None
+        self.player = None
+
+    @property
+    def is_open(self):
+        return self.writer is not None
+
+    def send(self, data):
+        if self.writer is None or self.writer.transport.is_closing():
+            return
+        self.writer.write(data)
+        # Backpressure: a client that stopped reading is dropped
+        if self.writer.transport.get_write_buffer_size() > MAX_WRITE_BUFFER:
+            self.server.metrics["dropped_slow"] += 1
+            self.close()
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.transport.abort()
+            self.writer = None
+
+
+# One game between two connections
+class Session:
+    __slots__ = ("server", "players", "engine", "start_time", "elapsed", "timer_token",
+                 "picks", "latency_total", "latency_max", "state_bytes")
+
+    def __init__(self, server):
+        self.server = server
+        self.players = [None, None]  # Connection per player
+        self.engine = None  # Kept when the session goes back to the pool
+        self.timer_token = None  # Token of the live TimerHeap entry
+        self.start_time = 0
+        self.elapsed = 0  # Engine time (ms) already stepped
+        self.picks = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self.state_bytes = 0  # Size of the game state, measured when a game starts
+
+    def broadcast(self, data):
+        for connection in self.players:
+            if connection is not None:
+                connection.send(data)
+
+    # Deal a new board and send it to both players
+    def start(self):
+        server = self.server
+        if self.engine is None:
+            self.engine = GameEngine(server.difficulty, server.card_types, pairs=server.pairs, rng=server.rng)
+        else:
+            self.engine.new_game(server.difficulty, server.card_types, server.pairs)
+        self.start_time = server.loop.time()
+        self.elapsed = 0
+        self.state_bytes = engine_bytes(self.engine)
+        self.broadcast(encode_start(server.difficulty, self.engine.board))
+        self.schedule()
+
+    # Step the engine's clocks up to now and send what happened
+    def advance(self):
+        elapsed = int((self.server.loop.time() - self.start_time) * 1000)
+        dt = elapsed - self.elapsed
+        self.elapsed = elapsed
+        if dt > 0:
+            events = self.engine.step(None, dt)
+            if events:
+                self.broadcast(encode_events(events))
+
+    # Wake up at the engine's next deadline
+    def schedule(self):
+        delay = self.engine.time_until_event()
+        if delay is None:
+            self.server.timers.cancel(self)
+        else:
+            self.server.timers.schedule(self, self.start_time + (self.elapsed + delay + 1) / 1000)
+
+    def on_timer(self):
+        self.advance()
+        self.schedule()
+
+    def pick(self, player, slot):
+        if self.engine is None:
+            return
+        self.advance()
+        if self.engine.current_player != player or not self.engine.can_select(slot):
+            self.players[player].send(encode_reject(slot))
+        else:
+            self.broadcast(encode_events(self.engine.step(slot)))
+        self.schedule()
+        self.picks += 1
+
+    def record_latency(self, latency):
+        self.latency_total += latency
+        if latency > self.latency_max:
+            self.latency_max = latency
+
+    def restart(self):
+        if self.engine is not None and self.engine.state == STATE_GAME_OVER and None not in self.players:
+            self.start()
+
+
+class GameServer:
+    def __init__(self, difficulty=DIFFICULTY_NORMAL, pairs=None, seed=None, card_types=None,
+                 max_sessions=DEFAULT_MAX_SESSIONS):
+        self.difficulty = difficulty
+        self.pairs = pairs
+        self.card_types = card_types if card_types is not None else load_card_types(difficulty)
+        self.max_sessions = max_sessions
+        self.rng = random.Random(seed)  # Shared by every session's engine
+        self.loop = None
+        self.timers = None
+        self.server = None
+        self.waiting = None  # Connection waiting for an opponent
+        self.connections = 0
+        self.sessions = set()
+        self.pool = []  # Finished sessions, ready for reuse
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)  # Seconds from pick received to events written
+        self.metrics = {"picks": 0, "games": 0, "dropped_slow": 0, "busy": 0}
+
+    async def start(self, host="127.0.0.1", port=DEFAULT_PORT):
+        self.loop = asyncio.get_running_loop()
+        self.timers = TimerHeap(self.loop)
+        self.server = await asyncio.start_server(self.handle_client, host, port, backlog=1024)
+        return self.server
+
+    # Port the server listens on (useful with port 0)
+    @property
+    def port(self):
+        return self.server.sockets[0].getsockname()[1]
+
+    # Pair a connection with the waiting one, or let it wait
+    def matchmake(self, connection):
+        waiting = self.waiting
+        if waiting is None or not waiting.is_open:
+            self.waiting = connection
+            return
+        self.waiting = None
+        session = self.pool.pop() if self.pool else Session(self)
+        self.sessions.add(session)
+        for player, member in enumerate((waiting, connection)):
+            session.players[player] = member
+            member.session = session
+            member.player = player
+            member.send(encode_welcome(player))
+        self.metrics["games"] += 1
+        session.start()
+
+    # A connection left its session: the opponent goes back to matchmaking
+    def leave(self, connection):
+        if self.waiting is connection:
+            self.waiting = None
+        session = connection.session
+        if session is None:
+            return
+        connection.session = None
+        self.timers.cancel(session)
+        self.sessions.discard(session)
+        for other in session.players:
+            if other is not None and other is not connection:
+                other.session = None
+                other.send(encode_opponent_left())
+                if other.is_open:
+                    self.matchmake(other)
+        session.players = [None, None]
+        session.picks = 0
+        session.latency_total = session.latency_max = 0.0
+        self.pool.append(session)
+
+    async def handle_client(self, reader, writer):
+        sock = writer.get_extra_info("socket")
+        if sock is not None:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.connections += 1
+        connection = Connection(self, writer)
+        try:
+            hello = await read_message(reader)
+            if hello[0] != HELLO or hello[1] != PROTOCOL_VERSION:
+                return
+            # Answered after HELLO so the client reads BUSY before the connection closes
+            if self.connections > 2 * self.max_sessions:
+                self.metrics["busy"] += 1
+                writer.write(encode_busy())
+                await writer.drain()
+                return
+            self.matchmake(connection)
+
+            while connection.is_open:
+                message = await read_message(reader)
+                session = connection.session
+                if session is None:
+                    continue  # Still waiting for an opponent
+                if message[0] == PICK:
+                    received = time.perf_counter()
+                    session.pick(connection.player, message[1])
+                    latency = time.perf_counter() - received
+                    session.record_latency(latency)
+                    self.latencies.append(latency)
+                    self.metrics["picks"] += 1
+                elif message[0] == RESTART:
+                    session.restart()
+        except (asyncio.IncompleteReadError, ConnectionError, ProtocolError):
+            pass
+        finally:
+            self.connections -= 1
+            self.leave(connection)
+            connection.close()
+
+    # Snapshot of the server metrics
+    def metrics_snapshot(self):
+        latencies = sorted(self.latencies)
+        sizes = [session.state_bytes for session in self.sessions]
+        return {
+            "sessions": len(self.sessions),
+            "pooled_sessions": len(self.pool),
+            "connections": self.connections,
+            "timer_heap": len(self.timers.heap) if self.timers else 0,
+            "move_latency_p50_ms": _percentile(latencies, 0.50) * 1000,
+            "move_latency_p99_ms": _percentile(latencies, 0.99) * 1000,
+            "move_latency_max_ms": (latencies[-1] if latencies else 0) * 1000,
+            "session_latency_max_ms": max((session.latency_max for session in self.sessions), default=0) * 1000,
+            "session_bytes": sum(sizes) / len(sizes) if sizes else 0,
+            "session_bytes_max": max(sizes, default=0),
+            "max_rss_kib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            **self.metrics,
+        }
+
+    # Per-session metrics: picks, mean and worst move latency (ms), state size
+    def session_metrics(self):
+        return [{
+            "picks": session.picks,
+            "latency_mean_ms": session.latency_total / session.picks * 1000 if session.picks else 0,
+            "latency_max_ms": session.latency_max * 1000,
+            "bytes": session.state_bytes,
+        } for session in self.sessions]
+
+    async def report_metrics(self, interval, path=None):
+        while True:
+            await asyncio.sleep(interval)
+            snapshot = self.metrics_snapshot()
+            print(f"sessions {snapshot['sessions']}  connections {snapshot['connections']}  "
+                  f"picks {snapshot['picks']}  move p50 {snapshot['move_latency_p50_ms']:.3f} ms  "
+                  f"p99 {snapshot['move_latency_p99_ms']:.3f} ms  {snapshot['session_bytes']:.0f} B/session  "
+                  f"dropped {snapshot['dropped_slow']}  busy {snapshot['busy']}", flush=True)
+            self.latencies.clear()  # Percentiles of each report cover its interval
+            if path:
+                with open(path, "w") as f:
+                    json.dump(snapshot, f, indent=2)
+
+    async def serve_forever(self, host="127.0.0.1", port=DEFAULT_PORT, metrics_interval=None, metrics_out=None):
+        server = await self.start(host, port)
+        print(f"Serving {difficulty_names[self.difficulty]} games on {host}:{self.port}", flush=True)
+        if metrics_interval:
+            asyncio.ensure_future(self.report_metrics(metrics_interval, metrics_out))
+        async with server:
+            await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Server for networked two-player memory card games.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--difficulty", type=int, choices=list(difficulty_settings), default=DIFFICULTY_NORMAL)
+    parser.add_argument("--pairs", type=int, help="pairs per game (default: the difficulty's)")
+    parser.add_argument("--seed", type=int, help="seed for the boards (reproducible games)")
+    parser.add_argument("--max-sessions", type=int, default=DEFAULT_MAX_SESSIONS, help="sessions hosted at once")
+    parser.add_argument("--metrics-interval", type=float, help="print metrics every this many seconds")
+    parser.add_argument("--metrics-out", help="also write the metrics to this JSON file")
+    args = parser.parse_args(argv)
+    server = GameServer(args.difficulty, args.pairs, args.seed, max_sessions=args.max_sessions)
+    try:
+        asyncio.run(server.serve_forever(args.host, args.port, args.metrics_interval, args.metrics_out))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+# Frame profiler for the game loop.
+#
+# The loop marks frames with begin_frame()/end_frame() and wraps its phases
+# in `with profiler.phase(name):` blocks. Timings of the last frames are kept
+# in a ring buffer, summarized for the on-screen overlay and exported as a
+# Chrome trace (open it in chrome://tracing or https://ui.perfetto.dev).
+#
+# Phases may nest (draw_game wraps card.draw and display.flip). Each span also
+# records its self time, its duration minus that of the phases nested in it,
+# and the overlay's slowest phase is picked by self time so that a container
+# phase does not hide the child that actually costs the time.
+#
+# While the profiler is disabled, phase() hands out one shared no-op context
+# manager and the frame markers return right away, so the instrumentation
+# can stay in place in production builds.
+import json
+import os
+import time
+from collections import deque
+
+# Frames kept in the ring buffer (10 seconds at 60 fps)
+PROFILE_FRAMES = 600
+
+# How often the overlay summary is recomputed (ms)
+SUMMARY_INTERVAL = 500
+
+
+class _NullPhase:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_PHASE = _NullPhase()
+
+
+class _Phase:
+    __slots__ = ("spans", "stack", "name", "start", "child_time")
+
+    def __init__(self, spans, stack, name):
+        self.spans = spans
+        self.stack = stack
+        self.name = name
+        self.child_time = 0
+
+    def __enter__(self):
+        self.stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        duration = time.perf_counter() - self.start
+        self.stack.pop()
+        if self.stack:
+            self.stack[-1].child_time += duration
+        self.spans.append((self.name, self.start, duration, duration - self.child_time))
+        return False
+
+
+# Value at fraction q of a sorted list
+def _percentile(values, q):
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+class FrameProfiler:
+    def __init__(self, enabled=False, max_frames=PROFILE_FRAMES):
+        self.enabled = enabled
+        self.overlay = False
+        self.frames = deque(maxlen=max_frames)  # (start, busy time, spans) in seconds
+        self.spans = []  # (phase name, start, duration, self time) of the current frame
+        self.open_phases = []  # Phases entered and not yet left, innermost last
+        self.frame_start = None
+        self.summary = None
+        self.summary_time = 0
+
+    # Timing context for one phase of the current frame
+    def phase(self, name):
+        if not self.enabled:
+            return NULL_PHASE
+        return _Phase(self.spans, self.open_phases, name)
+
+    def begin_frame(self):
+        if not self.enabled:
+            return
+        self.frame_start = time.perf_counter()
+        self.spans = []
+
+    # End of the frame's work (call before waiting for the next frame)
+    def end_frame(self):
+        if not self.enabled or self.frame_start is None:
+            return
+        self.frames.append((self.frame_start, time.perf_counter() - self.frame_start, self.spans))
+        self.frame_start = None
+
+    def clear(self):
+        self.frames.clear()
+        self.summary = None
+
+    # FPS, busy time percentiles and the phase with the most self time over
+    # the buffered frames
+    def stats(self):
+        if len(self.frames) < 2:
+            return None
+        elapsed = self.frames[-1][0] - self.frames[0][0]
+        busy = sorted(frame[1] for frame in self.frames)
+        totals = {}
+        for _, _, spans in self.frames:
+            for name, _, _, self_time in spans:
+                totals[name] = totals.get(name, 0) + self_time
+        slowest = max(totals, key=totals.get) if totals else None
+        return {
+            "fps": (len(self.frames) - 1) / elapsed if elapsed > 0 else 0,
+            "p50_ms": _percentile(busy, 0.50) * 1000,
+            "p95_ms": _percentile(busy, 0.95) * 1000,
+            "p99_ms": _percentile(busy, 0.99) * 1000,
+            "slowest": slowest,
+            "slowest_ms": totals[slowest] / len(self.frames) * 1000 if slowest else 0,
+        }
+
+    # Overlay text lines, recomputed at most every SUMMARY_INTERVAL ms
+    def summary_lines(self):
+        now = time.perf_counter()
+        if self.summary is None or (now - self.summary_time) * 1000 >= SUMMARY_INTERVAL:
+            stats = self.stats()
+            if stats is None:
+                self.summary = ["profiling..."]
+            else:
+                self.summary = [
+                    f"FPS {stats['fps']:.0f}  p50 {stats['p50_ms']:.2f}  p95 {stats['p95_ms']:.2f}  p99 {stats['p99_ms']:.2f} ms",
+                    f"slowest: {stats['slowest']} {stats['slowest_ms']:.2f} ms/frame",
+                ]
+            self.summary_time = now
+        return self.summary
+
+    # Write the buffered frames as a Chrome trace JSON file
+    def export_chrome_trace(self, path):
+        events = []
+        if self.frames:
+            origin = self.frames[0][0]
+            for number, (start, busy, spans) in enumerate(self.frames):
+                events.append({"name": "frame", "ph": "X", "pid": 1, "tid": 1,
+                               "ts": (start - origin) * 1e6, "dur": busy * 1e6,
+                               "args": {"frame": number}})
+                for name, span_start, duration, _ in spans:
+                    events.append({"name": name, "ph": "X", "pid": 1, "tid": 1,
+                                   "ts": (span_start - origin) * 1e6, "dur": duration * 1e6})
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, separators=(",", ":"))
+        os.replace(tmp_path, path)
+        return len(events)
@@ -0,0 +1,364 @@
+# Game recording and deterministic replay.
+#
+# A replay log holds what is needed to play a game again exactly: the
+# difficulty, the seed of the engine's shuffle and rotation choices, the pair
+# count and the card type names the board was dealt from, followed by a
+# stream of timestamped records:
+#   PICK  (time, slot)  a card picked by either player (or the computer)
+#   TIMER (time, dt)    a frame of dt ms that ended at this time made the
+#                       clocks produce events (end of the show-all phase, end
+#                       of a pair reveal, a turn timeout)
+#   END   (time, scores) the game was over with these scores
+# Times are engine milliseconds since the game started. Between two records
+# the game only ran its clocks without anything happening, and clocks that
+# cross no deadline add up the same in one step as in many frames. So
+# replaying steps the engine once up to each record (plus the recorded frame
+# of a TIMER, since a step that crosses a deadline depends on its length), no
+# matter how many frames the game took, and ends in exactly the recorded
+# state. A record is 7 to 9 bytes; a whole game is well under a kilobyte.
+#
+# Recording only appends to a memory buffer; the buffer is written to disk by
+# a background thread, so the frame loop never waits for the disk.
+#
+# Playback (ReplayPlayer) runs through the log once when it is opened and
+# keeps a copy of the engine every KEYFRAME_INTERVAL turns, so seeking to any
+# turn starts from the nearest keyframe instead of from the first record.
+# Like game_engine, this module does not need pygame.
+#
+# Usage (headless verification and statistics of many logs):
+#   python replay.py replays/*.mcr [--workers 4] [--json summary.json]
+import argparse
+import bisect
+import json
+import os
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import Pool
+
+from game_engine import GameEngine, STATE_GAME_OVER, EVENT_TIMEOUT, difficulty_names
+
+MAGIC = b"MCRP"
+REPLAY_VERSION = 1
+
+# File extension of replay logs
+REPLAY_EXTENSION = ".mcr"
+
+_HEADER = struct.Struct("<4sBBQHH")  # magic, version, difficulty, seed, pairs (0: the difficulty's), type names
+_RECORD = struct.Struct("<IB")  # time (ms), kind
+_U16 = struct.Struct("<H")
+_U32 = struct.Struct("<I")
+_SCORES = struct.Struct("<HH")
+
+# Record kinds
+REC_PICK = 1
+REC_TIMER = 2
+REC_END = 3
+
+# Turns between the engine copies kept for seeking
+KEYFRAME_INTERVAL = 4
+
+# Buffered bytes that trigger a write before the next timer record
+FLUSH_BYTES = 4096
+
+
+class ReplayError(Exception):
+    pass
+
+
+# Writes of every recorder, in order, on one background thread
+_writer = None
+
+
+def _get_writer():
+    global _writer
+    if _writer is None:
+        _writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="replay")
+    return _writer
+
+
+def _write(file, data):
+    file.write(data)
+    file.flush()
+
+
+# Records one game into a replay log
+class ReplayRecorder:
+    def __init__(self, path, difficulty, seed, card_types, pairs=None):
+        self.path = path
+        self.buffer = bytearray(encode_header(difficulty, seed, card_types, pairs))
+        self.file = open(path, "wb")
+        self.closed = False
+
+    def pick(self, time, slot):
+        self.buffer += _RECORD.pack(time, REC_PICK) + _U16.pack(slot)
+        if len(self.buffer) >= FLUSH_BYTES:
+            self.flush()
+
+    # A frame of dt ms ending at this time produced clock events (about once
+    # a turn, so the records are handed to the writer thread here)
+    def timer(self, time, dt):
+        self.buffer += _RECORD.pack(time, REC_TIMER) + _U32.pack(dt)
+        self.flush()
+
+    def end(self, time, scores):
+        self.buffer += _RECORD.pack(time, REC_END) + _SCORES.pack(*scores)
+        self.close()
+
+    # Hand the buffered records to the writer thread
+    def flush(self):
+        if self.buffer and not self.closed:
+            _get_writer().submit(_write, self.file, bytes(self.buffer))
+            self.buffer.clear()
+
+    def close(self):
+        if not self.closed:
+            self.flush()
+            self.closed = True
+            _get_writer().submit(self.file.close)
+
+
+def encode_header(difficulty, seed, card_types, pairs=None):
+    parts = [_HEADER.pack(MAGIC, REPLAY_VERSION, difficulty, seed, pairs or 0, len(card_types))]
+    for name in card_types:
+        data = name.encode("utf-8")
+        parts.append(bytes([len(data)]) + data)
+    return b"".join(parts)
+
+
+# A decoded replay log
+class ReplayLog:
+    def __init__(self, difficulty, seed, card_types, pairs, records, scores=None):
+        self.difficulty = difficulty
+        self.seed = seed
+        self.card_types = card_types
+        self.pairs = pairs  # None: the difficulty's pair count
+        self.records = records  # (time, kind, slot of a pick or frame length of a timer)
+        self.scores = scores  # Final scores, or None if the game was not finished
+
+    @property
+    def finished(self):
+        return self.scores is not None
+
+    @property
+    def duration(self):
+        return self.records[-1][0] if self.records else 0
+
+    # New engine with the recorded board, before any record is played
+    def new_engine(self):
+        return GameEngine(self.difficulty, self.card_types, self.seed, self.pairs)
+
+
+def decode_replay(data):
+    try:
+        magic, version, difficulty, seed, pairs, name_count = _HEADER.unpack_from(data, 0)
+        if magic != MAGIC:
+            raise ReplayError("not a replay log")
+        if version != REPLAY_VERSION:
+            raise ReplayError(f"unsupported replay version {version}")
+        offset = _HEADER.size
+        card_types = []
+        for _ in range(name_count):
+            length = data[offset]
+            card_types.append(data[offset + 1:offset + 1 + length].decode("utf-8"))
+            offset += 1 + length
+
+        records = []
+        scores = None
+        while offset < len(data):
+            time, kind = _RECORD.unpack_from(data, offset)
+            offset += _RECORD.size
+            if kind == REC_PICK:
+                records.append((time, kind, _U16.unpack_from(data, offset)[0]))
+                offset += _U16.size
+            elif kind == REC_TIMER:
+                records.append((time, kind, _U32.unpack_from(data, offset)[0]))
+                offset += _U32.size
+            elif kind == REC_END:
+                scores = list(_SCORES.unpack_from(data, offset))
+                offset += _SCORES.size
+                break
+            else:
+                raise ReplayError(f"unknown record kind {kind}")
+    except (struct.error, IndexError, UnicodeDecodeError) as e:
+        raise ReplayError(f"truncated or corrupt replay log: {e}") from e
+    return ReplayLog(difficulty, seed, card_types, pairs or None, records, scores)
+
+
+def load_replay(path):
+    with open(path, "rb") as f:
+        return decode_replay(f.read())
+
+
+# Play one record on an engine at time `now`; returns (events, new time).
+# Raises ReplayError when the game does not do what the log says.
+def play_record(engine, record, now):
+    time, kind, value = record
+    frame = value if kind == REC_TIMER else 0
+    if time - frame < now:
+        raise ReplayError(f"record at {time} ms goes back in time")
+    if time - frame > now and engine.step(None, time - frame - now):
+        raise ReplayError(f"unrecorded timer events before {time} ms")
+    if kind == REC_PICK:
+        if not engine.can_select(value):
+            raise ReplayError(f"pick of slot {value} at {time} ms is not allowed")
+        events = engine.step(value)
+    else:
+        events = engine.step(None, frame)
+        if not events:
+            raise ReplayError(f"no timer events at {time} ms")
+    return events, time
+
+
+# Play a whole log at full speed; returns the final engine and statistics
+def verify_replay(log):
+    engine = log.new_engine()
+    now = 0
+    timeouts = [0, 0]
+    for record in log.records:
+        events, now = play_record(engine, record, now)
+        for event in events:
+            if event[0] == EVENT_TIMEOUT:
+                timeouts[event[1]] += 1
+    if log.finished and (engine.state != STATE_GAME_OVER or engine.scores != log.scores):
+        raise ReplayError(f"replay ends with scores {engine.scores}, the log says {log.scores}")
+    return engine, {
+        "difficulty": difficulty_names[log.difficulty],
+        "finished": log.finished,
+        "scores": list(engine.scores),
+        "turns": engine.turns,
+        "timeouts": timeouts,
+        "duration_ms": log.duration,
+    }
+
+
+# Playback with seeking: the engine state at any time of the log
+class ReplayPlayer:
+    def __init__(self, log):
+        self.log = log
+        self.turn_starts = []  # Record index of the first pick of each turn
+        self.keyframes = []  # (record index, time, engine copy) every KEYFRAME_INTERVAL turns
+        engine = log.new_engine()
+        now = 0
+        for index, record in enumerate(log.records):
+            if record[1] == REC_PICK and not engine.selected and not engine.is_revealing:
+                if len(self.turn_starts) % KEYFRAME_INTERVAL == 0:
+                    self.keyframes.append((index, now, engine.copy()))
+                self.turn_starts.append(index)
+            _, now = play_record(engine, record, now)
+        self.engine = log.new_engine()
+        self.index = 0  # Next record to play
+        self.time = 0  # Playback position (ms since the game started)
+        self.engine_time = 0  # Time the engine has been stepped to
+
+    @property
+    def turn_count(self):
+        return len(self.turn_starts)
+
+    @property
+    def finished(self):
+        return self.index >= len(self.log.records)
+
+    # Turns started so far (0 before the first pick)
+    def current_turn(self):
+        return bisect.bisect_left(self.turn_starts, self.index)
+
+    # Milliseconds until the next record, or None at the end of the log
+    def time_until_next(self):
+        if self.finished:
+            return None
+        return self.log.records[self.index][0] - self.time
+
+    # Play the records due in the next dt ms (dt may be fractional at slow
+    # playback speeds; the engine only steps whole ms); returns their events
+    def advance(self, dt):
+        self.time += dt
+        events = []
+        records = self.log.records
+        while self.index < len(records) and records[self.index][0] <= self.time:
+            step_events, self.engine_time = play_record(self.engine, records[self.index], self.engine_time)
+            events += step_events
+            self.index += 1
+        if not self.finished:
+            # Run the clocks for display, but not into the recorded frame of
+            # the next timer record; nothing happens before the next record
+            time, kind, value = records[self.index]
+            until = min(int(self.time), time - value if kind == REC_TIMER else time)
+            if until > self.engine_time:
+                events += self.engine.step(None, until - self.engine_time)
+                self.engine_time = until
+        return events
+
+    # Jump to the start of a turn (its first pick comes next), to the end of
+    # the log for turn_count, or to the very start (show-all phase) for a
+    # negative turn. The engine is replaced, so views must be rebuilt from
+    # player.engine.
+    def seek(self, turn):
+        turn = min(turn, len(self.turn_starts))
+        if turn < 0:
+            target = 0
+        elif turn == len(self.turn_starts):
+            target = len(self.log.records)
+        else:
+            target = self.turn_starts[turn]
+        if turn < 0 or not self.keyframes:
+            index, now, engine = 0, 0, self.log.new_engine()
+        else:
+            index, now, engine = self.keyframes[min(turn // KEYFRAME_INTERVAL, len(self.keyframes) - 1)]
+            engine = engine.copy()
+        records = self.log.records
+        while index < target:
+            _, now = play_record(engine, records[index], now)
+            index += 1
+        self.engine = engine
+        self.index = index
+        self.time = self.engine_time = now
+
+
+# Worker entry point: check one log
+def check_file(path):
+    try:
+        _, stats = verify_replay(load_replay(path))
+        return path, stats, None
+    except (OSError, ReplayError) as e:
+        return path, None, str(e)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Verify recorded games and summarize them (headless).")
+    parser.add_argument("paths", nargs="+", help="replay logs or directories of them")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--json", metavar="PATH", help="write the statistics of every log as JSON")
+    args = parser.parse_args(argv)
+
+    paths = []
+    for path in args.paths:
+        if os.path.isdir(path):
+            paths += sorted(os.path.join(path, name) for name in os.listdir(path) if name.endswith(REPLAY_EXTENSION))
+        else:
+            paths.append(path)
+
+    if args.workers > 1 and len(paths) > 1:
+        with Pool(args.workers) as pool:
+            results = pool.map(check_file, paths, chunksize=max(1, len(paths) // (4 * args.workers)))
+    else:
+        results = [check_file(path) for path in paths]
+
+    failed = 0
+    for path, stats, error in results:
+        if error is not None:
+            failed += 1
+            print(f"{path}: FAILED: {error}")
+        elif len(results) <= 20:
+            state = "finished" if stats["finished"] else "unfinished"
+            print(f"{path}: OK, {stats['difficulty']}, {state}, scores {stats['scores'][0]} - {stats['scores'][1]}, "
+                  f"{stats['turns']} turns, {stats['duration_ms'] / 1000:.1f} s")
+    print(f"{len(results) - failed} of {len(results)} replays verified")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({path: stats if error is None else {"error": error} for path, stats, error in results}, f, indent=2)
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+# Spatial indexes that map a screen position to a board slot.
+#
+# Card layouts made of rows (a plain grid on Easy/Normal, the 4-6-6-6-4
+# layout on Hard/Ultra) are indexed with row and column arithmetic, so a
+# lookup costs the same on any board size. Any other layout falls back to a
+# uniform bucket grid. Rects are (x, y, width, height) tuples; pygame.Rect
+# works too, but this module does not need pygame.
+
+
+# Whether (px, py) lies inside rect
+def _contains(rect, px, py):
+    x, y, w, h = rect
+    return x <= px < x + w and y <= py < y + h
+
+
+# Whether two rects overlap
+def _intersects(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    return ax < bx + bw and bx < ax + aw and ay < by + bh and by < ay + ah
+
+
+# Index for cards of one size laid out in evenly spaced rows. Each row has
+# its own left offset and card count.
+class RowGridIndex:
+    def __init__(self, rects, rows, pitch_y, pitches_x):
+        self.rects = rects
+        self.rows = rows            # (first_slot, count) per row, top to bottom
+        self.top = rects[rows[0][0]][1]
+        self.pitch_y = pitch_y
+        self.pitches_x = pitches_x  # Horizontal card pitch per row
+
+    def slot_at(self, pos):
+        px, py = pos
+        if not self.rows:
+            return None
+        # Rect origins are rounded, so the next cell after the computed one is checked too
+        row = int((py - self.top) // self.pitch_y) if self.pitch_y else 0
+        for r in (row, row + 1):
+            if 0 <= r < len(self.rows):
+                first, count = self.rows[r]
+                left = self.rects[first][0]
+                col = int((px - left) // self.pitches_x[r]) if self.pitches_x[r] else 0
+                for c in (col, col + 1):
+                    if 0 <= c < count and _contains(self.rects[first + c], px, py):
+                        return first + c
+        return None
+
+    # Slots whose rects overlap rect, in slot order
+    def slots_in(self, rect):
+        x, y, w, h = rect
+        slots = []
+        if not self.rows:
+            return slots
+        first_row, last_row = 0, len(self.rows) - 1
+        if self.pitch_y:
+            first_row = max(first_row, int((y - self.top) // self.pitch_y) - 1)
+            last_row = min(last_row, int((y + h - self.top) // self.pitch_y) + 1)
+        for r in range(first_row, last_row + 1):
+            first, count = self.rows[r]
+            first_col, last_col = 0, count - 1
+            if self.pitches_x[r]:
+                left = self.rects[first][0]
+                first_col = max(first_col, int((x - left) // self.pitches_x[r]) - 1)
+                last_col = min(last_col, int((x + w - left) // self.pitches_x[r]) + 1)
+            for c in range(first_col, last_col + 1):
+                if _intersects(self.rects[first + c], rect):
+                    slots.append(first + c)
+        return slots
+
+    def slot_rect(self, slot):
+        return self.rects[slot]
+
+
+# Index for arbitrary layouts: slots are stored in every bucket they overlap
+class BucketIndex:
+    def __init__(self, rects, bucket_size=None):
+        self.rects = rects
+        if bucket_size is None:
+            bucket_size = max([max(w, h) for _, _, w, h in rects] + [1])
+        self.bucket_size = bucket_size
+        self.buckets = {}
+        for slot, (x, y, w, h) in enumerate(rects):
+            for bx in range(int(x // bucket_size), int((x + w - 1) // bucket_size) + 1):
+                for by in range(int(y // bucket_size), int((y + h - 1) // bucket_size) + 1):
+                    self.buckets.setdefault((bx, by), []).append(slot)
+
+    def slot_at(self, pos):
+        px, py = pos
+        key = (int(px // self.bucket_size), int(py // self.bucket_size))
+        for slot in self.buckets.get(key, ()):
+            if _contains(self.rects[slot], px, py):
+                return slot
+        return None
+
+    # Slots whose rects overlap rect, in slot order
+    def slots_in(self, rect):
+        x, y, w, h = rect
+        found = set()
+        for bx in range(int(x // self.bucket_size), int((x + w) // self.bucket_size) + 1):
+            for by in range(int(y // self.bucket_size), int((y + h) // self.bucket_size) + 1):
+                for slot in self.buckets.get((bx, by), ()):
+                    if slot not in found and _intersects(self.rects[slot], rect):
+                        found.add(slot)
+        return sorted(found)
+
+    def slot_rect(self, slot):
+        return self.rects[slot]
+
+
+# Split slots into rows of equal y, if the layout is made of regular rows
+def _find_rows(rects):
+    rows = []
+    for slot, (x, y, w, h) in enumerate(rects):
+        if rows and rects[rows[-1][0]][1] == y:
+            rows[-1][1] += 1
+        elif rows and y < rects[rows[-1][0]][1]:
+            return None  # Slots are not ordered top to bottom
+        else:
+            rows.append([slot, 1])
+    return [tuple(row) for row in rows]
+
+
+# Even spacing of values (within rounding of one pixel), or None
+def _even_pitch(values):
+    if len(values) < 2:
+        return 0
+    pitch = (values[-1] - values[0]) / (len(values) - 1)
+    for i, value in enumerate(values):
+        if abs(values[0] + i * pitch - value) > 1:
+            return None
+    return pitch
+
+
+# Build the best index for a list of slot rects
+def build_slot_index(rects):
+    rects = [tuple(rect) for rect in rects]
+    if not rects:
+        return BucketIndex(rects)
+
+    sizes = {(w, h) for _, _, w, h in rects}
+    rows = _find_rows(rects)
+    if len(sizes) == 1 and rows:
+        pitch_y = _even_pitch([rects[first][1] for first, _ in rows])
+        pitches_x = []
+        for first, count in rows:
+            xs = [rects[first + c][0] for c in range(count)]
+            pitch = _even_pitch(xs)
+            if pitch is None or any(xs[c] >= xs[c + 1] for c in range(count - 1)):
+                pitches_x = None
+                break
+            pitches_x.append(pitch)
+        if pitch_y is not None and pitches_x is not None:
+            return RowGridIndex(rects, rows, pitch_y, pitches_x)
+
+    return BucketIndex(rects)
@@ -0,0 +1,158 @@
+# Rules of the headless GameEngine, stepped with synthetic dt (no sleeping).
+#
+# Run from the repository root: python -m pytest tests
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from game_engine import (  # noqa: E402
+    Board, GameEngine, PLAYER_1, PLAYER_2, REVEAL_TIME,
+    DIFFICULTY_EASY, DIFFICULTY_HARD, difficulty_settings,
+    STATE_SHOW_ALL, STATE_PLAYING, STATE_GAME_OVER,
+    EVENT_FLIP, EVENT_HIDE, EVENT_MATCH, EVENT_MISMATCH, EVENT_TURN, EVENT_TIMEOUT,
+    EVENT_STATE, EVENT_REVEAL_END,
+)
+
+# Easy board with known pairs: slots 0/1 are A, 2/3 are B, ...
+EASY_BOARD = ["A", "A", "B", "B", "C", "C", "D", "D", "E", "E"]
+
+
+# Engine on a fixed board, just past the show-all phase
+def playing_engine(difficulty=DIFFICULTY_EASY, card_types=EASY_BOARD):
+    engine = GameEngine(difficulty, board=Board(card_types))
+    engine.step(None, engine.display_time - 1)
+    engine.step(None, 1)
+    return engine
+
+
+def kinds(events):
+    return [event[0] for event in events]
+
+
+class ShowAllTest(unittest.TestCase):
+    def test_cards_hide_when_display_time_is_over(self):
+        engine = GameEngine(DIFFICULTY_EASY, board=Board(EASY_BOARD))
+        self.assertEqual(engine.state, STATE_SHOW_ALL)
+        self.assertTrue(all(engine.board.is_flipped(slot) for slot in range(engine.num_cards)))
+        self.assertFalse(engine.can_select(0))
+
+        self.assertEqual(engine.step(None, engine.display_time - 1), [])
+        self.assertEqual(engine.state, STATE_SHOW_ALL)
+
+        events = engine.step(None, 1)
+        self.assertEqual([event for event in events if event[0] == EVENT_HIDE],
+                         [(EVENT_HIDE, slot) for slot in range(engine.num_cards)])
+        self.assertIn((EVENT_STATE, STATE_PLAYING), events)
+        self.assertFalse(engine.board.any_face_up)
+        self.assertTrue(engine.can_select(0))
+
+
+class RevealTest(unittest.TestCase):
+    def test_mismatch_stays_revealed_until_reveal_time(self):
+        engine = playing_engine()
+        self.assertEqual(engine.step(0), [(EVENT_FLIP, 0)])
+        events = engine.step(2)
+        self.assertEqual(events, [(EVENT_FLIP, 2), (EVENT_MISMATCH, PLAYER_1, 0, 2), (EVENT_TURN, PLAYER_2)])
+        self.assertEqual(engine.current_player, PLAYER_2)
+        self.assertTrue(engine.is_revealing)
+
+        # Still face up one millisecond before the end of the reveal
+        self.assertEqual(engine.step(None, REVEAL_TIME - 1), [])
+        self.assertTrue(engine.board.is_flipped(0) and engine.board.is_flipped(2))
+        self.assertFalse(engine.can_select(4))
+
+        events = engine.step(None, 1)
+        self.assertEqual(events, [(EVENT_HIDE, 0), (EVENT_HIDE, 2), (EVENT_REVEAL_END,)])
+        self.assertFalse(engine.is_revealing)
+        self.assertFalse(engine.board.any_face_up)
+        self.assertEqual(engine.selected, [])
+        self.assertTrue(engine.can_select(0))
+
+    def test_match_scores_and_keeps_the_turn(self):
+        engine = playing_engine()
+        engine.step(0)
+        events = engine.step(1)
+        self.assertEqual(events, [(EVENT_FLIP, 1), (EVENT_MATCH, PLAYER_1, 0, 1)])
+        self.assertEqual(engine.scores, [2, 0])
+        self.assertEqual(engine.current_player, PLAYER_1)
+        self.assertEqual(engine.matched_cards[PLAYER_1], ["A"])
+        self.assertTrue(engine.board.is_matched(0) and engine.board.is_matched(1))
+        self.assertEqual(engine.board.matched_player(0), PLAYER_1)
+
+        # The matched pair stays on the board after the reveal
+        self.assertEqual(engine.step(None, REVEAL_TIME), [(EVENT_REVEAL_END,)])
+        self.assertFalse(engine.can_select(0))
+        self.assertTrue(engine.can_select(2))
+
+    def test_picks_during_the_reveal_are_ignored(self):
+        engine = playing_engine()
+        engine.step(0)
+        engine.step(2)
+        self.assertEqual(engine.step(4), [])
+        self.assertFalse(engine.board.is_flipped(4))
+
+        # A pick and the end of the reveal in one step: the pick comes first and is ignored
+        self.assertEqual(kinds(engine.step(4, REVEAL_TIME)), [EVENT_HIDE, EVENT_HIDE, EVENT_REVEAL_END])
+        self.assertFalse(engine.board.is_flipped(4))
+        self.assertEqual(engine.step(4), [(EVENT_FLIP, 4)])
+
+    def test_reveal_ends_in_small_steps(self):
+        engine = playing_engine()
+        engine.step(0)
+        engine.step(2)
+        elapsed = 0
+        while engine.is_revealing:
+            engine.step(None, 16)
+            elapsed += 16
+        self.assertEqual(elapsed, 1008)  # The first frame at or past REVEAL_TIME
+        self.assertFalse(engine.board.any_face_up)
+
+    def test_turns_alternate_on_mismatches(self):
+        engine = playing_engine()
+        players = []
+        for first, second in ((0, 2), (4, 6), (8, 0)):
+            players.append(engine.current_player)
+            engine.step(first)
+            engine.step(second)
+            engine.step(None, REVEAL_TIME)
+        self.assertEqual(players, [PLAYER_1, PLAYER_2, PLAYER_1])
+        self.assertEqual(engine.current_player, PLAYER_2)
+        self.assertEqual(engine.turns, 3)
+
+    def test_last_pair_ends_the_game(self):
+        engine = playing_engine()
+        for slot in range(0, engine.num_cards - 2, 2):
+            engine.step(slot)
+            engine.step(slot + 1)
+            engine.step(None, REVEAL_TIME)
+        events = engine.step(8)
+        events += engine.step(9)
+        self.assertIn((EVENT_STATE, STATE_GAME_OVER), events)
+        self.assertEqual(engine.state, STATE_GAME_OVER)
+        self.assertEqual(engine.scores, [10, 0])
+
+
+class TurnTimerTest(unittest.TestCase):
+    def test_turn_passes_when_time_runs_out(self):
+        board = [name for name in "ABCDEFGHIJKLM" for _ in range(2)]
+        engine = playing_engine(DIFFICULTY_HARD, board)
+        limit = difficulty_settings[DIFFICULTY_HARD]["time_limit"]
+        engine.step(0)
+
+        # The step that ended the show-all phase already counts towards the first turn
+        self.assertEqual(engine.step(None, limit - engine.turn_timer - 1), [])
+        events = engine.step(None, 1)
+        self.assertEqual(events, [(EVENT_TIMEOUT, PLAYER_1), (EVENT_HIDE, 0), (EVENT_TURN, PLAYER_2)])
+        self.assertEqual(engine.selected, [])
+        self.assertEqual(engine.turn_timer, 0)
+
+    def test_no_time_limit_on_easy(self):
+        engine = playing_engine()
+        self.assertEqual(engine.step(None, 10 * 60 * 1000), [])
+        self.assertEqual(engine.current_player, PLAYER_1)
+
+
+if __name__ == "__main__":
+    unittest.main()
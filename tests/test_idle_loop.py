@@ -0,0 +1,126 @@
+# The main loop gives the same game whether it idles between events or
+# redraws every frame (--no-idle). Time is simulated: the frame clock and
+# the idle wait are replaced by a script of timed input events, so nothing
+# really sleeps.
+#
+# Run from the repository root: python -m pytest tests
+import multiprocessing
+import os
+import sys
+import unittest
+from unittest import mock
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pygame  # noqa: E402
+
+import memory_game as mg  # noqa: E402
+from game_engine import DIFFICULTY_EASY, REVEAL_TIME, STATE_PLAYING  # noqa: E402
+
+FRAME_MS = 1000 // mg.FPS
+
+
+# Simulated time for main(): stands in for pygame.time.Clock and wait_for_event,
+# and delivers the scripted events when their time has come
+class ScriptedTime:
+    # script: (time in ms, function returning a pygame event), in time order
+    def __init__(self, script):
+        self.script = list(script)
+        self.now = 0
+        self.last_tick = 0
+        self.elapsed = 0  # Between the last two ticks
+
+    def __call__(self):  # pygame.time.Clock()
+        return self
+
+    # Events whose time has come go to the event queue
+    def post_due_events(self):
+        while self.script and self.script[0][0] <= self.now:
+            pygame.event.post(self.script.pop(0)[1]())
+
+    # A frame takes no time to draw; tick waits for the rest of the frame
+    def tick(self, framerate=0):
+        self.now = max(self.now, self.last_tick + FRAME_MS)
+        self.post_due_events()
+        self.elapsed = self.now - self.last_tick
+        self.last_tick = self.now
+        return self.elapsed
+
+    def get_time(self):
+        return self.elapsed
+
+    def wait_for_event(self, delay):
+        if self.script and (delay is None or self.script[0][0] <= self.now + delay):
+            self.now = max(self.now, self.script[0][0])
+            return self.script.pop(0)[1]()
+        self.now += delay
+        return None
+
+
+def click(get_pos):
+    return lambda: pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=get_pos(), button=1)
+
+
+def easy_button():
+    return mg.to_screen(mg.get_menu_button_rects()[DIFFICULTY_EASY]).center
+
+
+def card_center(get_slot):
+    return lambda: mg.cards[get_slot()].rect.center
+
+
+# A card of another type than slot 0's: the first pick is a mismatch
+def other_type_slot():
+    type_ids = mg.engine.board.type_ids
+    return next(slot for slot in range(len(type_ids)) if type_ids[slot] != type_ids[0])
+
+
+# Start an Easy game, wait out the show-all phase and sit idle for a few
+# seconds, then pick a mismatched pair and quit `quit_after` ms later.
+# Returns the engine state when the loop ended: (state, face up cards,
+# selected slots, current player, reveal time left).
+def play(argv, quit_after):
+    first_pick = 16000
+    script = [
+        (100, click(easy_button)),
+        (first_pick, click(card_center(lambda: 0))),
+        (first_pick + 200, click(card_center(other_type_slot))),
+        (first_pick + 200 + quit_after, lambda: pygame.event.Event(pygame.QUIT)),
+    ]
+    scripted = ScriptedTime(script)
+    with mock.patch.object(pygame.time, "Clock", scripted), \
+            mock.patch.object(mg, "wait_for_event", scripted.wait_for_event):
+        try:
+            mg.main(argv)
+        except SystemExit:
+            pass  # main() exits after quitting pygame
+    engine = mg.engine
+    return engine.state, engine.board.flipped_mask, list(engine.selected), engine.current_player, engine.reveal_timer
+
+
+# Every game in a new process: main() quits pygame, which a second run in the
+# same process would start again with stale fonts
+def play_in_new_process(argv, quit_after):
+    with multiprocessing.get_context("spawn").Pool(1) as pool:
+        return pool.apply(play, (argv, quit_after))
+
+
+class IdleLoopTest(unittest.TestCase):
+    def test_reveal_counts_down_after_an_idle_wait(self):
+        for quit_after in (50, 500):
+            with self.subTest(quit_after=quit_after):
+                idle_state = play_in_new_process([], quit_after)
+                busy_state = play_in_new_process(["--no-idle"], quit_after)
+
+                self.assertEqual(idle_state[0], STATE_PLAYING)
+                self.assertEqual(len(idle_state[2]), 2)  # The mismatched pair is still shown
+                self.assertEqual(idle_state[:4], busy_state[:4])
+                self.assertAlmostEqual(idle_state[4], REVEAL_TIME - quit_after, delta=FRAME_MS)
+                self.assertAlmostEqual(busy_state[4], REVEAL_TIME - quit_after, delta=FRAME_MS)
+
+
+if __name__ == "__main__":
+    unittest.main()
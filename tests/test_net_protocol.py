@@ -0,0 +1,113 @@
+# Round trips of the networked mode's binary protocol.
+#
+# Run from the repository root: python -m pytest tests
+import asyncio
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from game_engine import (  # noqa: E402
+    GameEngine, PLAYER_2, REVEAL_TIME, DIFFICULTY_ULTRA,
+    STATE_PLAYING, STATE_GAME_OVER,
+    EVENT_FLIP, EVENT_HIDE, EVENT_MATCH, EVENT_MISMATCH, EVENT_TURN, EVENT_TIMEOUT,
+    EVENT_STATE, EVENT_REVEAL_END,
+)
+from net_protocol import (  # noqa: E402
+    HEADER, PROTOCOL_VERSION, ProtocolError,
+    HELLO, PICK, RESTART, WELCOME, START, REJECT, OPPONENT_LEFT, BUSY,
+    MSG_FLIP, MSG_START,
+    encode_message, encode_hello, encode_pick, encode_restart, encode_welcome, encode_reject,
+    encode_opponent_left, encode_busy, encode_start, encode_events, decode_message, read_message,
+)
+
+
+# Split a byte stream into decoded messages
+def decode_all(data):
+    messages = []
+    offset = 0
+    while offset < len(data):
+        msg_type, length = HEADER.unpack_from(data, offset)
+        offset += HEADER.size
+        messages.append(decode_message(msg_type, data[offset:offset + length]))
+        offset += length
+    return messages
+
+
+class MessageTest(unittest.TestCase):
+    def test_control_messages_round_trip(self):
+        cases = [
+            (encode_hello(), (HELLO, PROTOCOL_VERSION)),
+            (encode_pick(1234), (PICK, 1234)),
+            (encode_restart(), (RESTART,)),
+            (encode_welcome(1), (WELCOME, 1)),
+            (encode_reject(7), (REJECT, 7)),
+            (encode_opponent_left(), (OPPONENT_LEFT,)),
+            (encode_busy(), (BUSY,)),
+        ]
+        for data, expected in cases:
+            self.assertEqual(decode_all(data), [expected])
+
+    def test_events_round_trip(self):
+        events = [
+            (EVENT_FLIP, 3), (EVENT_HIDE, 65535), (EVENT_MATCH, 0, 1, 2), (EVENT_MISMATCH, 1, 4, 9),
+            (EVENT_TURN, 1), (EVENT_TIMEOUT, 0), (EVENT_STATE, STATE_PLAYING),
+            (EVENT_STATE, STATE_GAME_OVER), (EVENT_REVEAL_END,),
+        ]
+        data = encode_events(events)
+        self.assertEqual(decode_all(data), events)
+        self.assertEqual(len(encode_events([(EVENT_FLIP, 3)])), 5)
+
+    def test_board_round_trip(self):
+        engine = GameEngine(DIFFICULTY_ULTRA, ["EC2", "s3", "lambda", "ücard"], seed=5, pairs=20)
+        kind, difficulty, board = decode_all(encode_start(DIFFICULTY_ULTRA, engine.board))[0]
+        self.assertEqual((kind, difficulty), (START, DIFFICULTY_ULTRA))
+        self.assertEqual(board.card_types(), engine.board.card_types())
+        self.assertEqual(list(board.rotations), list(engine.board.rotations))
+
+    def test_malformed_messages_raise(self):
+        with self.assertRaises(ProtocolError):
+            decode_message(MSG_FLIP, b"\x01")  # Slot needs two bytes
+        with self.assertRaises(ProtocolError):
+            decode_message(200, b"")
+        with self.assertRaises(ProtocolError):
+            decode_message(MSG_START, b"\x00\x01\x00\x02\x00")  # Type names missing
+        with self.assertRaises(ProtocolError):
+            encode_message(MSG_START, bytes(0x10000))
+
+    def test_read_message_from_a_stream(self):
+        async def read_two():
+            reader = asyncio.StreamReader()
+            reader.feed_data(encode_pick(5) + encode_restart())
+            return [await read_message(reader), await read_message(reader)]
+        self.assertEqual(asyncio.run(read_two()), [(PICK, 5), (RESTART,)])
+
+
+class MirrorTest(unittest.TestCase):
+    # A client engine fed with the decoded events of the server's engine ends in the same state
+    def test_client_engine_follows_the_server(self):
+        server = GameEngine(DIFFICULTY_ULTRA, seed=11)
+        _, difficulty, board = decode_all(encode_start(DIFFICULTY_ULTRA, server.board))[0]
+        client = GameEngine(difficulty, board=board)
+
+        by_type = {}
+        for slot, type_id in enumerate(server.board.type_ids):
+            by_type.setdefault(type_id, []).append(slot)
+        pairs = list(by_type.values())
+        steps = [(None, server.display_time), (pairs[0][0], 0), (pairs[1][0], 0), (None, REVEAL_TIME)]
+        for first, second in pairs:
+            steps += [(first, 0), (second, 0), (None, REVEAL_TIME)]
+        for action, dt in steps:
+            client.apply_events(decode_all(encode_events(server.step(action, dt))))
+
+        self.assertEqual(client.state, STATE_GAME_OVER)
+        self.assertEqual(client.scores, server.scores)
+        self.assertEqual(client.current_player, PLAYER_2)
+        self.assertEqual(client.matched_cards, server.matched_cards)
+        self.assertEqual(client.board.matched_mask, server.board.matched_mask)
+        self.assertEqual(list(client.board.matched_by), list(server.board.matched_by))
+
+
+if __name__ == "__main__":
+    unittest.main()
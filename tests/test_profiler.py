@@ -0,0 +1,85 @@
+# Frame profiler summaries, timed with a fake clock.
+#
+# Run from the repository root: python -m pytest tests
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import profiler as profiler_module  # noqa: E402
+from profiler import FrameProfiler  # noqa: E402
+
+
+# time.perf_counter() that only moves when advance() is called
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, ms):
+        self.now += ms / 1000
+
+
+class StatsTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch.object(profiler_module.time, "perf_counter", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    # One frame shaped like the game loop's: draw_game wraps card.draw and
+    # display.flip, and only does 1 ms of work of its own
+    def run_frame(self, profiler):
+        profiler.begin_frame()
+        with profiler.phase("events"):
+            self.clock.advance(1)
+        with profiler.phase("draw_game"):
+            self.clock.advance(1)
+            with profiler.phase("card.draw"):
+                self.clock.advance(2)
+            with profiler.phase("display.flip"):
+                self.clock.advance(5)
+        profiler.end_frame()
+        self.clock.advance(7)
+
+    def test_slowest_phase_is_picked_by_self_time(self):
+        profiler = FrameProfiler(enabled=True)
+        for _ in range(3):
+            self.run_frame(profiler)
+
+        stats = profiler.stats()
+        self.assertEqual(stats["slowest"], "display.flip")
+        self.assertAlmostEqual(stats["slowest_ms"], 5)
+        self.assertAlmostEqual(stats["fps"], 1000 / 16)
+        self.assertAlmostEqual(stats["p50_ms"], 9)
+
+    def test_spans_keep_full_and_self_time(self):
+        profiler = FrameProfiler(enabled=True)
+        self.run_frame(profiler)
+        spans = {name: (duration * 1000, self_time * 1000)
+                 for name, _, duration, self_time in profiler.frames[0][2]}
+        for name, expected in {"events": (1, 1), "card.draw": (2, 2), "display.flip": (5, 5),
+                               "draw_game": (8, 1)}.items():
+            self.assertAlmostEqual(spans[name][0], expected[0])
+            self.assertAlmostEqual(spans[name][1], expected[1])
+        self.assertEqual(profiler.open_phases, [])
+
+    def test_container_phase_wins_with_its_own_work(self):
+        profiler = FrameProfiler(enabled=True)
+        for _ in range(2):
+            profiler.begin_frame()
+            with profiler.phase("draw_game"):
+                self.clock.advance(6)
+                with profiler.phase("card.draw"):
+                    self.clock.advance(2)
+            profiler.end_frame()
+        self.assertEqual(profiler.stats()["slowest"], "draw_game")
+        self.assertAlmostEqual(profiler.stats()["slowest_ms"], 6)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,210 @@
+# Replay logs: recording, headless verification and seeking.
+#
+# Games are simulated like the main loop plays them (picks first, then a
+# frame of the clocks) with frame lengths of a few ms up to long idle waits.
+#
+# Run from the repository root: python -m pytest tests
+import os
+import random
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import replay  # noqa: E402
+from game_engine import (  # noqa: E402
+    CARD_TYPES, GameEngine, STATE_GAME_OVER, STATE_PLAYING,
+    DIFFICULTY_EASY, DIFFICULTY_NORMAL, DIFFICULTY_HARD, DIFFICULTY_ULTRA,
+)
+from replay import (  # noqa: E402
+    MAGIC, REC_PICK, KEYFRAME_INTERVAL, ReplayError, ReplayPlayer, ReplayRecorder,
+    decode_replay, load_replay, play_record, verify_replay,
+)
+
+# (difficulty, pairs) of the simulated games; None plays the difficulty's pair count
+GAMES = [(DIFFICULTY_EASY, None), (DIFFICULTY_NORMAL, None), (DIFFICULTY_HARD, None),
+         (DIFFICULTY_ULTRA, None), (DIFFICULTY_NORMAL, 30)]
+GAMES_PER_KIND = 6
+
+# Frame lengths (ms): steady frames, hitches and idle waits
+FRAME_LENGTHS = [1, 7, 16, 16, 17, 33, 100, 250, 1200, 4000]
+
+
+# Record one game to path; returns the final engine. Unless `finish`, the
+# game is left after `stop_after` frames without an END record.
+def record_game(path, difficulty, pairs, seed, finish=True, stop_after=None):
+    rng = random.Random(seed)
+    recorder = ReplayRecorder(path, difficulty, seed, CARD_TYPES, pairs)
+    engine = GameEngine(difficulty, CARD_TYPES, seed, pairs)
+    game_time = 0
+    frames = 0
+    while engine.state != STATE_GAME_OVER and (finish or frames < stop_after):
+        frames += 1
+        if engine.state == STATE_PLAYING and rng.random() < 0.4:
+            slot = pick_slot(engine, rng)
+            if slot is not None:
+                events = engine.step(slot)
+                if events:
+                    recorder.pick(game_time, slot)
+                if engine.state == STATE_GAME_OVER:  # The last pair was found
+                    recorder.end(game_time, engine.scores)
+                    break
+        dt = rng.choice(FRAME_LENGTHS)
+        events = engine.step(None, dt)
+        game_time += dt
+        if events:
+            recorder.timer(game_time, dt)
+    recorder.close()
+    replay._get_writer().submit(lambda: None).result()  # Wait for the writer thread
+    return engine
+
+
+# A random hidden card, or often the partner of the card already picked
+def pick_slot(engine, rng):
+    slots = [slot for slot in range(engine.num_cards) if engine.can_select(slot)]
+    if not slots:
+        return None
+    if engine.selected and rng.random() < 0.5:
+        type_id = engine.board.type_ids[engine.selected[0]]
+        partners = [slot for slot in slots if engine.board.type_ids[slot] == type_id]
+        if partners:
+            return partners[0]
+    return rng.choice(slots)
+
+
+# Everything that decides how the game goes on
+def engine_state(engine):
+    board = engine.board
+    return (engine.state, list(engine.scores), engine.current_player, list(engine.selected),
+            [list(cards) for cards in engine.matched_cards], engine.turns, engine.show_timer, engine.turn_timer, engine.reveal_timer,
+            board.flipped_mask, board.matched_mask, list(board.matched_by))
+
+
+class ReplayTestCase(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+
+    # Record the simulated games; yields (log, engine at the end of the recording)
+    def recorded_games(self, **kwargs):
+        for number, (difficulty, pairs) in enumerate(GAMES * GAMES_PER_KIND):
+            path = os.path.join(self.dir, f"game_{number}.mcr")
+            engine = record_game(path, difficulty, pairs, seed=1000 + number, **kwargs)
+            yield load_replay(path), engine
+
+
+class VerifyTest(ReplayTestCase):
+    def test_verify_reproduces_the_recorded_games(self):
+        for log, engine in self.recorded_games():
+            with self.subTest(seed=log.seed):
+                self.assertTrue(log.finished)
+                self.assertEqual(log.scores, engine.scores)
+                replayed, stats = verify_replay(log)
+                self.assertEqual(engine_state(replayed), engine_state(engine))
+                self.assertEqual(stats["scores"], engine.scores)
+                self.assertEqual(stats["turns"], engine.turns)
+
+    def test_unfinished_games_verify_up_to_their_last_record(self):
+        for log, engine in self.recorded_games(finish=False, stop_after=40):
+            with self.subTest(seed=log.seed):
+                self.assertFalse(log.finished)
+                replayed, stats = verify_replay(log)
+                self.assertFalse(stats["finished"])
+                self.assertEqual(replayed.scores, engine.scores)
+                self.assertEqual(replayed.turns, engine.turns)
+
+
+class SeekTest(ReplayTestCase):
+    def test_seek_to_every_turn_matches_playing_straight_through(self):
+        for log, _ in self.recorded_games():
+            with self.subTest(seed=log.seed):
+                player = ReplayPlayer(log)
+                self.assertGreater(player.turn_count, KEYFRAME_INTERVAL)
+
+                # Engine state at the start of every turn, playing from the first record
+                expected = {}
+                engine = log.new_engine()
+                now = 0
+                for index, record in enumerate(log.records):
+                    if record[1] == REC_PICK and index in player.turn_starts:
+                        expected[player.turn_starts.index(index)] = (engine_state(engine), now)
+                    _, now = play_record(engine, record, now)
+                expected[player.turn_count] = (engine_state(engine), now)
+
+                # Backwards, so every seek has to go back to a keyframe
+                for turn in range(player.turn_count, -1, -1):
+                    player.seek(turn)
+                    self.assertEqual((engine_state(player.engine), player.time), expected[turn])
+                    self.assertEqual(player.current_turn(), turn)
+
+                player.seek(-1)
+                self.assertEqual(engine_state(player.engine), engine_state(log.new_engine()))
+
+    def test_playback_after_a_seek_ends_like_the_game(self):
+        for log, engine in self.recorded_games():
+            with self.subTest(seed=log.seed):
+                player = ReplayPlayer(log)
+                player.seek(player.turn_count // 2)
+                while not player.finished:
+                    player.advance(16.5)
+                self.assertEqual(engine_state(player.engine), engine_state(engine))
+
+
+class CorruptLogTest(ReplayTestCase):
+    def setUp(self):
+        super().setUp()
+        path = os.path.join(self.dir, "game.mcr")
+        record_game(path, DIFFICULTY_HARD, None, seed=7)
+        with open(path, "rb") as f:
+            self.data = f.read()
+        self.log = decode_replay(self.data)
+
+    def test_truncated_logs_raise(self):
+        # Cut inside the header, the card type names and the records
+        for length in (0, 3, 10, 20, len(self.data) - 1, len(self.data) - 3):
+            with self.subTest(length=length):
+                with self.assertRaises(ReplayError):
+                    decode_replay(self.data[:length])
+
+    def test_corrupt_headers_raise(self):
+        with self.assertRaises(ReplayError):
+            decode_replay(b"XXXX" + self.data[len(MAGIC):])
+        with self.assertRaises(ReplayError):
+            decode_replay(self.data[:4] + bytes([99]) + self.data[5:])  # Unknown version
+
+    def test_unknown_record_kind_raises(self):
+        data = bytearray(self.data)
+        data[self.first_record_offset() + 4] = 200
+        with self.assertRaises(ReplayError):
+            decode_replay(bytes(data))
+
+    def test_records_that_do_not_match_the_game_raise(self):
+        records = self.log.records
+        first_pick = next(index for index, record in enumerate(records) if record[1] == REC_PICK)
+
+        # The same slot picked twice in a row
+        self.log.records = records[:first_pick + 1] + [records[first_pick]] + records[first_pick + 1:]
+        with self.assertRaises(ReplayError):
+            verify_replay(self.log)
+        with self.assertRaises(ReplayError):
+            ReplayPlayer(self.log)
+
+        # Records out of order
+        self.log.records = [records[1], records[0]] + records[2:]
+        with self.assertRaises(ReplayError):
+            verify_replay(self.log)
+
+        # A missing record: the scores in the END record do not come out
+        self.log.records = records[:first_pick] + records[first_pick + 2:]
+        with self.assertRaises(ReplayError):
+            verify_replay(self.log)
+
+    # Byte offset of the first record, after the header and the card type names
+    def first_record_offset(self):
+        return replay._HEADER.size + sum(1 + len(name.encode("utf-8")) for name in self.log.card_types)
+
+
+if __name__ == "__main__":
+    unittest.main()
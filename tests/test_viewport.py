@@ -0,0 +1,53 @@
+# Zoom levels of the large-board viewport.
+#
+# Run from the repository root: python -m pytest tests
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from viewport import MAX_ZOOM, ZOOM_STEP, Viewport  # noqa: E402
+
+SCREEN_RECT = (0, 100, 800, 500)
+WORLD_SIZE = (20000, 15000)
+
+
+class ZoomTest(unittest.TestCase):
+    def test_zoom_levels_repeat_after_hitting_max_zoom(self):
+        viewport = Viewport(SCREEN_RECT, WORLD_SIZE, min_zoom=0.05)
+        levels = [min(viewport.min_zoom * ZOOM_STEP ** step, MAX_ZOOM) for step in range(viewport.max_step + 1)]
+        self.assertEqual(levels[-1], MAX_ZOOM)
+
+        zooms = set()
+        for steps in [1] * 30 + [-1] * 30 + [3, -2, 100, -1, -1, -100, 5]:
+            viewport.zoom_at((300, 250), steps)
+            zooms.add(viewport.zoom)
+        self.assertEqual(zooms, set(levels))
+
+    def test_zoom_out_from_max_comes_back_to_the_fit_zoom(self):
+        viewport = Viewport(SCREEN_RECT, WORLD_SIZE, min_zoom=0.05)
+        viewport.zoom_at(viewport.center(), 100)
+        self.assertEqual(viewport.zoom, MAX_ZOOM)
+        self.assertFalse(viewport.zoom_at(viewport.center(), 1))
+        viewport.zoom_at(viewport.center(), -viewport.max_step)
+        self.assertEqual(viewport.zoom, viewport.min_zoom)
+        self.assertFalse(viewport.zoom_at(viewport.center(), -1))
+
+    def test_fit_resets_the_zoom(self):
+        viewport = Viewport(SCREEN_RECT, WORLD_SIZE, min_zoom=0.05)
+        viewport.zoom_at((10, 120), 4)
+        self.assertTrue(viewport.fit())
+        self.assertEqual(viewport.zoom, viewport.min_zoom)
+        viewport.zoom_at(viewport.center(), 1)
+        self.assertEqual(viewport.zoom, viewport.min_zoom * ZOOM_STEP)
+
+    def test_small_board_stays_at_full_size(self):
+        viewport = Viewport(SCREEN_RECT, (400, 300))
+        self.assertEqual(viewport.zoom, MAX_ZOOM)
+        self.assertFalse(viewport.zoom_at(viewport.center(), -1))
+        self.assertEqual(viewport.state(), (MAX_ZOOM, -200.0, -100.0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,167 @@
+# SDL2 Renderer/Texture drawing backend (--renderer texture).
+#
+# Instead of blitting Surfaces onto the display surface, images are uploaded
+# once as textures (card fronts and the card back at the card size, territory
+# thumbnails, text) and every frame is a list of textured quad copies, filled
+# rects and lines, presented at once. Rotated cards are drawn with the copy's
+# angle instead of a rotated copy of the image. With an accelerated renderer
+# the GPU scales, rotates and blends; with SDL's software renderer
+# (--renderer software) the same code runs on machines without a GPU.
+#
+# Screens that are rarely redrawn (the menu, the waiting screen) are still
+# drawn onto an off-screen Surface and presented through one streaming
+# texture (present_surface).
+import pygame
+from collections import OrderedDict
+from pygame._sdl2 import sdl2, video
+
+# SDL_BLENDMODE_BLEND: alpha blending for translucent fills
+BLENDMODE_BLEND = 1
+
+# Maximum number of textures kept (card sizes change while zooming a large board)
+TEXTURE_CACHE_SIZE = 256
+
+
+class TextureRenderer:
+    # software=True uses SDL's software renderer; otherwise an accelerated
+    # renderer is tried first. Raises pygame.error if no renderer can be created.
+    def __init__(self, size, title, software=False):
+        try:
+            self.window = video.Window(title, size, resizable=True)
+        except sdl2.error as e:
+            raise pygame.error(str(e)) from e
+        self.renderer = None
+        if not software:
+            try:
+                self.renderer = video.Renderer(self.window, accelerated=1, vsync=False)
+            except sdl2.error:
+                software = True  # No GPU driver: fall back to the software renderer
+        if self.renderer is None:
+            try:
+                self.renderer = video.Renderer(self.window, accelerated=0, vsync=False)
+            except sdl2.error as e:
+                self.window.destroy()
+                raise pygame.error(str(e)) from e
+        self.software = software
+        self.renderer.draw_blend_mode = BLENDMODE_BLEND
+        self.textures = OrderedDict()  # key -> Texture, least recently used first
+        self.max_textures = TEXTURE_CACHE_SIZE
+        self.hits = 0
+        self.misses = 0
+        self.screen_texture = None  # Streaming texture of present_surface
+        self.area = pygame.Rect((0, 0), size)  # Window area drawing coordinates are relative to
+        self.origin = (0, 0)  # Top left corner of the clip rect (the renderer's viewport), in the area
+
+    # Texture cached under key, uploaded from make_surface() the first time
+    def texture(self, key, make_surface):
+        texture = self.textures.get(key)
+        if texture is not None:
+            self.textures.move_to_end(key)
+            self.hits += 1
+            return texture
+        self.misses += 1
+        texture = video.Texture.from_surface(self.renderer, make_surface())
+        self.textures[key] = texture
+        while len(self.textures) > self.max_textures:
+            self.textures.popitem(last=False)
+        return texture
+
+    def clear(self, color):
+        self.renderer.draw_color = pygame.Color(color)
+        self.renderer.clear()
+
+    # Draw into a part of the window: coordinates are relative to its top
+    # left corner and drawing is clipped to it
+    def set_area(self, rect):
+        self.area = pygame.Rect(rect)
+        self.set_clip(None)
+
+    # Window size after resizing or switching to fullscreen
+    def window_size(self):
+        return self.window.size
+
+    # Fill the desktop, or go back to a window of `size`
+    def set_fullscreen(self, fullscreen, size):
+        if fullscreen:
+            self.window.set_fullscreen(desktop=True)
+        else:
+            self.window.set_windowed()
+            self.window.size = size
+
+    # Restrict drawing to a rect of the area (None: the whole area); coordinates stay area coordinates
+    def set_clip(self, rect):
+        rect = pygame.Rect((0, 0), self.area.size) if rect is None else pygame.Rect(rect)
+        self.renderer.set_viewport(rect.move(self.area.topleft))
+        self.origin = rect.topleft
+
+    def _local(self, rect):
+        return pygame.Rect(rect).move(-self.origin[0], -self.origin[1])
+
+    # Copy a texture into a screen rect; angle rotates clockwise around the rect center
+    def blit(self, texture, rect, angle=0, srcrect=None):
+        texture.draw(srcrect=srcrect, dstrect=self._local(rect), angle=angle)
+
+    # Copy a texture at its own size with its top left corner at pos
+    def blit_at(self, texture, pos):
+        texture.draw(dstrect=self._local((pos[0], pos[1], texture.width, texture.height)))
+
+    # Copy a surface that changes every frame (uploaded each call, not cached)
+    def blit_surface(self, surface, pos):
+        self.blit_at(video.Texture.from_surface(self.renderer, surface), pos)
+
+    def fill(self, color, rect):
+        self.renderer.draw_color = pygame.Color(color)
+        self.renderer.fill_rect(self._local(rect))
+
+    # Rect outline `width` pixels thick, drawn inside the rect like pygame.draw.rect
+    def rect(self, color, rect, width=1):
+        self.renderer.draw_color = pygame.Color(color)
+        rect = self._local(rect)
+        for _ in range(width):
+            if rect.width <= 0 or rect.height <= 0:
+                break
+            self.renderer.draw_rect(rect)
+            rect = rect.inflate(-2, -2)
+
+    def line(self, color, start, end, width=1):
+        self.renderer.draw_color = pygame.Color(color)
+        x, y = self.origin
+        for offset in range(-((width - 1) // 2), width // 2 + 1):  # Same rows as pygame.draw.line
+            self.renderer.draw_line((start[0] - x, start[1] + offset - y), (end[0] - x, end[1] + offset - y))
+
+    def present(self):
+        self.renderer.present()
+
+    # Show a frame drawn in software onto a Surface the size of the area
+    def present_surface(self, surface):
+        if self.screen_texture is None or (self.screen_texture.width, self.screen_texture.height) != surface.get_size():
+            self.screen_texture = video.Texture(self.renderer, surface.get_size(), streaming=True)
+        self.screen_texture.update(surface)
+        self.clear((0, 0, 0))
+        self.set_clip(None)
+        self.screen_texture.draw()
+        self.renderer.present()
+
+    # Copy of the last drawn frame (for tests and screenshots)
+    def to_surface(self):
+        viewport = self.renderer.get_viewport()
+        self.renderer.set_viewport(None)  # Read the whole window, not just the clip rect
+        surface = self.renderer.to_surface()
+        self.renderer.set_viewport(viewport)
+        return surface
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+
+    def clear_textures(self):
+        self.textures.clear()
+        self.reset_stats()
+
+    # Free the textures before the renderer and the renderer before the window
+    # (SDL crashes when they are freed in another order, e.g. after pygame.quit)
+    def close(self):
+        self.clear_textures()
+        self.screen_texture = None
+        self.renderer = None
+        self.window.destroy()
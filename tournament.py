@@ -0,0 +1,256 @@
+# Self-play tournament runner.
+#
+# Plays full games between strategies on every difficulty using the headless
+# GameEngine, spread over all CPU cores with a process pool. Thinking time is
+# simulated, so the 15 second turn limit of Hard and Ultra Hard applies
+# without any real waiting. Every chunk of games gets its own seed derived
+# from the base seed, so a run is reproducible regardless of worker count.
+#
+# Usage:
+#   python tournament.py --strategies random perfect limited:0.3 --games 10000 --out results.json
+import argparse
+import json
+import os
+import random
+import time
+from multiprocessing import Pool
+
+from game_engine import (
+    GameEngine, REVEAL_TIME, STATE_GAME_OVER,
+    EVENT_FLIP, EVENT_TIMEOUT,
+    difficulty_names, difficulty_settings,
+)
+
+# Safety limit on picks per game
+MAX_PICKS = 5000
+
+# Default mean thinking time per pick (ms)
+DEFAULT_THINK_MS = 3000
+
+
+# Strategy that picks any selectable card
+class RandomStrategy:
+    def __init__(self, think_ms=DEFAULT_THINK_MS):
+        self.think_ms = think_ms
+
+    def reset(self, engine, rng):
+        pass
+
+    def observe(self, engine, events, rng):
+        pass
+
+    def choose(self, engine, rng):
+        slots = [slot for slot in range(engine.num_cards) if engine.can_select(slot)]
+        return rng.choice(slots)
+
+    def think_time(self, rng):
+        return rng.expovariate(1.0 / self.think_ms)
+
+
+# Strategy that remembers seen cards; each remembered card is forgotten with
+# probability `forget` per turn (each resolved pair, not each pick), and each
+# card of the initial show-all phase is remembered with probability `recall`.
+class MemoryStrategy(RandomStrategy):
+    def __init__(self, forget=0.0, recall=0.0, think_ms=DEFAULT_THINK_MS):
+        super().__init__(think_ms)
+        self.forget = forget
+        self.recall = recall
+        self.seen = {}  # slot -> card type
+        self.turns = 0  # engine.turns when the memory last decayed
+
+    def reset(self, engine, rng):
+        self.seen = {}
+        self.turns = engine.turns
+        for slot, type_id in enumerate(engine.board.type_ids):
+            if rng.random() < self.recall:
+                self.seen[slot] = type_id
+
+    def observe(self, engine, events, rng):
+        for event in events:
+            if event[0] == EVENT_FLIP:
+                self.seen[event[1]] = engine.board.type_ids[event[1]]
+        # Forget once per turn, when a pair was resolved (observe runs after every pick)
+        if self.forget > 0 and engine.turns != self.turns:
+            self.seen = {slot: card_type for slot, card_type in self.seen.items() if rng.random() >= self.forget}
+        self.turns = engine.turns
+
+    def choose(self, engine, rng):
+        known = {slot: card_type for slot, card_type in self.seen.items() if engine.can_select(slot)}
+
+        if engine.selected:
+            # Second pick: the partner of the first card if it is known
+            first_type = engine.board.type_ids[engine.selected[0]]
+            for slot, card_type in known.items():
+                if card_type == first_type:
+                    return slot
+        else:
+            # First pick: one card of a known pair
+            by_type = {}
+            for slot, card_type in known.items():
+                if card_type in by_type:
+                    return by_type[card_type]
+                by_type[card_type] = slot
+
+        # Otherwise an unseen card, if there is one
+        unseen = [slot for slot in range(engine.num_cards) if engine.can_select(slot) and slot not in known]
+        if unseen:
+            return rng.choice(unseen)
+        return super().choose(engine, rng)
+
+
+# Build a strategy from a spec such as "random", "perfect" or "limited:0.3"
+def make_strategy(spec, think_ms=DEFAULT_THINK_MS, recall=0.5):
+    name, _, arg = spec.partition(":")
+    if name == "random":
+        return RandomStrategy(think_ms)
+    if name == "perfect":
+        return MemoryStrategy(0.0, recall, think_ms)
+    if name == "limited":
+        return MemoryStrategy(float(arg or 0.2), recall, think_ms)
+    raise ValueError(f"unknown strategy: {spec}")
+
+
+# Play one game and return (scores, turns, timeouts per player)
+def play_game(difficulty, strategies, seed):
+    rng = random.Random(seed)
+    engine = GameEngine(difficulty, seed=rng.getrandbits(64))
+    for strategy in strategies:
+        strategy.reset(engine, rng)
+
+    # Memorization phase
+    engine.step(None, engine.display_time)
+
+    timeouts = [0, 0]
+    for _ in range(MAX_PICKS):
+        if engine.state == STATE_GAME_OVER:
+            break
+        player = engine.current_player
+        strategy = strategies[player]
+
+        # Simulated thinking time runs on the turn timer
+        events = engine.step(None, strategy.think_time(rng))
+        if any(event[0] == EVENT_TIMEOUT for event in events):
+            timeouts[player] += 1
+        else:
+            events = engine.step(strategy.choose(engine, rng))
+
+        for observer in strategies:
+            observer.observe(engine, events, rng)
+
+        # Wait for the pair reveal to finish before the next pick
+        if engine.is_revealing:
+            events = engine.step(None, REVEAL_TIME)
+            if any(event[0] == EVENT_TIMEOUT for event in events):
+                timeouts[engine.current_player] += 1
+
+    return engine.scores, engine.turns, timeouts
+
+
+# Empty aggregate for one (difficulty, strategy pair)
+def new_stats():
+    return {"games": 0, "wins": [0, 0], "ties": 0, "turns": 0, "timeouts": [0, 0], "scores": [0, 0]}
+
+
+# Add one chunk's stats into an aggregate
+def merge_stats(total, part):
+    total["games"] += part["games"]
+    total["ties"] += part["ties"]
+    total["turns"] += part["turns"]
+    for p in range(2):
+        total["wins"][p] += part["wins"][p]
+        total["timeouts"][p] += part["timeouts"][p]
+        total["scores"][p] += part["scores"][p]
+
+
+# Worker entry point: play one chunk of games
+def run_chunk(task):
+    key, difficulty, specs, seed, games, think_ms, recall = task
+    strategies = [make_strategy(spec, think_ms, recall) for spec in specs]
+    rng = random.Random(seed)
+    stats = new_stats()
+    for _ in range(games):
+        scores, turns, timeouts = play_game(difficulty, strategies, rng.getrandbits(64))
+        stats["games"] += 1
+        stats["turns"] += turns
+        if scores[0] == scores[1]:
+            stats["ties"] += 1
+        else:
+            stats["wins"][0 if scores[0] > scores[1] else 1] += 1
+        for p in range(2):
+            stats["timeouts"][p] += timeouts[p]
+            stats["scores"][p] += scores[p]
+    return key, stats
+
+
+# Split the run into chunks with reproducible per-chunk seeds
+def make_tasks(difficulties, specs, games, chunk_size, base_seed, think_ms, recall):
+    tasks = []
+    for difficulty in difficulties:
+        for spec_a in specs:
+            for spec_b in specs:
+                key = f"{difficulty_names[difficulty]}|{spec_a}|{spec_b}"
+                for chunk, start in enumerate(range(0, games, chunk_size)):
+                    seed = random.Random(f"{base_seed}|{key}|{chunk}").getrandbits(64)
+                    tasks.append((key, difficulty, (spec_a, spec_b), seed, min(chunk_size, games - start), think_ms, recall))
+    return tasks
+
+
+# Derived rates for the results file
+def summarize(stats):
+    games = max(stats["games"], 1)
+    return dict(stats,
+                win_rates=[stats["wins"][0] / games, stats["wins"][1] / games],
+                average_turns=stats["turns"] / games,
+                timeouts_per_game=[stats["timeouts"][0] / games, stats["timeouts"][1] / games])
+
+
+# Write the results atomically so a crash never leaves a broken file
+def write_results(path, results, config):
+    data = {"config": config, "results": {key: summarize(stats) for key, stats in results.items()}}
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play self-play tournaments between memory card game strategies.")
+    parser.add_argument("--strategies", nargs="+", default=["random", "perfect", "limited:0.2"],
+                        help="strategy specs: random, perfect, limited[:forget] (forget: probability per turn)")
+    parser.add_argument("--difficulty", choices=["all"] + [str(d) for d in difficulty_settings], default="all")
+    parser.add_argument("--games", type=int, default=1000, help="games per difficulty and seat order")
+    parser.add_argument("--chunk-size", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--think-ms", type=float, default=DEFAULT_THINK_MS, help="mean simulated thinking time per pick")
+    parser.add_argument("--recall", type=float, default=0.5, help="chance of remembering each card shown at the start")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="tournament_results.json")
+    args = parser.parse_args(argv)
+
+    for spec in args.strategies:
+        make_strategy(spec)  # Fail early on a bad spec
+    difficulties = list(difficulty_settings) if args.difficulty == "all" else [int(args.difficulty)]
+    tasks = make_tasks(difficulties, args.strategies, args.games, args.chunk_size, args.seed, args.think_ms, args.recall)
+    config = {key: getattr(args, key) for key in ("strategies", "difficulty", "games", "chunk_size", "think_ms", "recall", "seed")}
+
+    results = {}
+    started = time.time()
+    last_write = started
+    with Pool(args.workers) as pool:
+        for done, (key, stats) in enumerate(pool.imap_unordered(run_chunk, tasks), 1):
+            merge_stats(results.setdefault(key, new_stats()), stats)
+            now = time.time()
+            if now - last_write >= 5 or done == len(tasks):
+                write_results(args.out, results, config)
+                last_write = now
+                games = sum(stats["games"] for stats in results.values())
+                print(f"{done}/{len(tasks)} chunks, {games} games, {games / (now - started):.0f} games/s")
+
+    for key, stats in sorted(results.items()):
+        summary = summarize(stats)
+        print(f"{key:40} P1 {summary['win_rates'][0]:.3f}  P2 {summary['win_rates'][1]:.3f}  "
+              f"turns {summary['average_turns']:.1f}  timeouts {summary['timeouts_per_game'][0]:.2f}/{summary['timeouts_per_game'][1]:.2f}")
+
+
+if __name__ == "__main__":
+    main()
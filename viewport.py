@@ -0,0 +1,98 @@
+# Camera over a board that is bigger than the play area.
+#
+# World coordinates are the pixel coordinates of the board layout at full
+# card size; screen coordinates are the game's logical screen coordinates
+# (window pixels when the window is not scaled). The viewport maps between
+# them with an offset and a zoom factor, and keeps the view on the board.
+# The viewport keeps an integer zoom step and the zoom is always
+# min_zoom * ZOOM_STEP ** step (capped at MAX_ZOOM), so zooming in and out
+# again comes back to the same card sizes and scaled card surfaces stay
+# cached.
+# Like layout and spatial_index, this module does not need pygame.
+
+# Zoom factor of one zoom step (mouse wheel notch or key press)
+ZOOM_STEP = 1.25
+
+# Largest zoom: cards at their full layout size
+MAX_ZOOM = 1.0
+
+
+# min_zoom keeps very large boards from zooming out further than a zoom at
+# which the whole board would fit; it bounds the number of cards in the view.
+class Viewport:
+    def __init__(self, screen_rect, world_size, min_zoom=0):
+        self.x, self.y, self.width, self.height = screen_rect
+        self.world_width, self.world_height = world_size
+        fit_zoom = min(self.width / self.world_width, self.height / self.world_height)
+        self.min_zoom = min(MAX_ZOOM, max(min_zoom, fit_zoom))
+        self.max_step = 0  # First step that reaches MAX_ZOOM
+        while self.min_zoom * ZOOM_STEP ** self.max_step < MAX_ZOOM:
+            self.max_step += 1
+        self.step = 0
+        self.zoom = self.min_zoom
+        self.left = 0.0  # World position shown at the top left corner of the view
+        self.top = 0.0
+        self.clamp()
+
+    def state(self):
+        return (self.zoom, self.left, self.top)
+
+    # Keep the zoom step in range and the view on the board (centered when the board is smaller)
+    def clamp(self):
+        self.step = min(max(self.step, 0), self.max_step)
+        self.zoom = min(self.min_zoom * ZOOM_STEP ** self.step, MAX_ZOOM)
+        view_width = self.width / self.zoom
+        view_height = self.height / self.zoom
+        if view_width >= self.world_width:
+            self.left = (self.world_width - view_width) / 2
+        else:
+            self.left = min(max(self.left, 0), self.world_width - view_width)
+        if view_height >= self.world_height:
+            self.top = (self.world_height - view_height) / 2
+        else:
+            self.top = min(max(self.top, 0), self.world_height - view_height)
+
+    # Part of the board inside the view, in world coordinates
+    def visible_world_rect(self):
+        return (self.left, self.top, self.width / self.zoom, self.height / self.zoom)
+
+    # Screen rect (x, y, width, height) of a world rect; scale turns screen
+    # coordinates into the pixels of a scaled window
+    def to_screen(self, rect, scale=1):
+        x, y, w, h = rect
+        zoom = self.zoom * scale
+        return (int((self.x + (x - self.left) * self.zoom) * scale), int((self.y + (y - self.top) * self.zoom) * scale),
+                int(w * zoom), int(h * zoom))
+
+    # World position of a screen position
+    def to_world(self, pos):
+        return (self.left + (pos[0] - self.x) / self.zoom, self.top + (pos[1] - self.y) / self.zoom)
+
+    # Move the view by (dx, dy) screen pixels, like dragging the board; True if it moved
+    def pan(self, dx, dy):
+        before = self.state()
+        self.left -= dx / self.zoom
+        self.top -= dy / self.zoom
+        self.clamp()
+        return self.state() != before
+
+    # Zoom by `steps` zoom steps, keeping the board point under pos in place; True if it changed
+    def zoom_at(self, pos, steps):
+        before = self.state()
+        world_x, world_y = self.to_world(pos)
+        self.step += steps
+        self.clamp()
+        self.left = world_x - (pos[0] - self.x) / self.zoom
+        self.top = world_y - (pos[1] - self.y) / self.zoom
+        self.clamp()
+        return self.state() != before
+
+    # Zoom out as far as possible (the whole board, unless it is very large)
+    def fit(self):
+        before = self.state()
+        self.step = 0
+        self.clamp()
+        return self.state() != before
+
+    def center(self):
+        return (self.x + self.width / 2, self.y + self.height / 2)